@@ -0,0 +1,279 @@
+"""
+Embedded storage in a DuckDB file, answering the subset of the supabase-py query builder used by the
+services: select / insert / upsert / update / delete, the eq, neq, gt, gte, lt, lte and in_ filters,
+not_, order and limit. Records go in and out in the same JSON shape as with PostgREST (dates as ISO
+strings, coordinates as lists), so the services run unchanged without network.
+
+Tables are created on their first write from the columns of the records, day columns as DATE.
+Columns appearing later are added, and the conflict columns of an upsert get a unique index.
+query() runs SQL directly for analytical queries.
+"""
+
+import datetime
+import threading
+from types import SimpleNamespace
+
+import duckdb
+import pandas as pd
+
+from common.schema.schema import DAY_COLUMNS
+
+
+class LocalClient:
+    def __init__(self, path: str = ":memory:") -> None:
+        self.connection = duckdb.connect(path)
+        # DuckDB allows a single writer; the services call the client from worker threads
+        self.lock = threading.Lock()
+
+    def table(self, name: str) -> "LocalQuery":
+        return LocalQuery(self, name)
+
+    def query(self, sql: str, parameters: list | None = None) -> pd.DataFrame:
+        with self.lock:
+            return self.connection.execute(sql, parameters or []).fetchdf()
+
+    def execute(self, sql: str, parameters: list | None = None) -> list[dict]:
+        with self.lock:
+            cursor = self.connection.execute(sql, parameters or [])
+            if cursor.description is None:
+                return []
+            columns = [column[0] for column in cursor.description]
+            return [
+                {c: _to_wire(v) for c, v in zip(columns, row)}
+                for row in cursor.fetchall()
+            ]
+
+    def columns(self, table: str) -> list[str]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+                [table],
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def write(self, table: str, records: list[dict], on_conflict: str | None):
+        """
+        Insert the records (upsert on the 'on_conflict' columns when given) and return them as stored.
+        """
+        if not records:
+            return []
+        df = _frame(records)
+        with self.lock:
+            source = self._register(table, df)
+            try:
+                statement = f'INSERT INTO "{table}" BY NAME {source}'
+                if on_conflict:
+                    keys = [k.strip() for k in on_conflict.split(",")]
+                    index = f"{table}_{'_'.join(keys)}_key"
+                    quoted = ", ".join(f'"{k}"' for k in keys)
+                    _ = self.connection.execute(
+                        f'CREATE UNIQUE INDEX IF NOT EXISTS "{index}" ON "{table}" ({quoted})'
+                    )
+                    updates = ", ".join(
+                        f'"{c}" = EXCLUDED."{c}"' for c in df.columns if c not in keys
+                    )
+                    statement += (
+                        f" ON CONFLICT ({quoted}) DO UPDATE SET {updates}"
+                        if updates
+                        else f" ON CONFLICT ({quoted}) DO NOTHING"
+                    )
+                _ = self.connection.execute(statement)
+            finally:
+                self.connection.unregister("df")
+        return records
+
+    def update(
+        self, table: str, values: dict, where: str, parameters: list
+    ) -> list[dict]:
+        df = _frame([values])
+        with self.lock:
+            _ = self._register(table, df)
+            self.connection.unregister("df")
+        assignments = ", ".join(f'"{c}" = ?' for c in values)
+        return self.execute(
+            f'UPDATE "{table}" SET {assignments}{where} RETURNING *',
+            [_from_wire(v) for v in values.values()] + parameters,
+        )
+
+    def _register(self, table: str, df: pd.DataFrame) -> str:
+        """
+        Register 'df' as the 'df' view, create the table or add it the columns it lacks,
+        and return the SELECT giving the rows of 'df' with the types of the table.
+        """
+        day_columns = [c for c in df.columns if c in DAY_COLUMNS]
+        replace = ", ".join(f'CAST("{c}" AS DATE) AS "{c}"' for c in day_columns)
+        source = (
+            f"SELECT * REPLACE ({replace}) FROM df" if replace else "SELECT * FROM df"
+        )
+        connection = self.connection
+        _ = connection.register("df", df)
+        _ = connection.execute(
+            f'CREATE TABLE IF NOT EXISTS "{table}" AS {source} LIMIT 0'
+        )
+        existing = {
+            row[0]
+            for row in connection.execute(
+                "SELECT column_name FROM information_schema.columns WHERE table_name = ?",
+                [table],
+            ).fetchall()
+        }
+        types = dict(
+            connection.execute(
+                f"SELECT column_name, column_type FROM (DESCRIBE {source})"
+            ).fetchall()
+        )
+        for column in df.columns:
+            if column not in existing:
+                _ = connection.execute(
+                    f'ALTER TABLE "{table}" ADD COLUMN "{column}" {types[column]}'
+                )
+        return source
+
+
+class LocalQuery:
+    """
+    One query on a table, built like a supabase-py request and run by execute().
+    """
+
+    def __init__(self, client: LocalClient, table: str) -> None:
+        self.client = client
+        self.table = table
+        self.action = "select"
+        self.columns = "*"
+        self.values = None
+        self.on_conflict: str | None = None
+        self.conditions: list[str] = []
+        self.parameters: list = []
+        self.negate_next = False
+        self.ordering: list[str] = []
+        self.row_limit: int | None = None
+        self.count_method: str | None = None
+
+    def select(self, columns: str = "*", count: str | None = None, **_):
+        self.columns = columns
+        self.count_method = count
+        return self
+
+    def insert(self, values, **_):
+        self.action, self.values = "insert", values
+        return self
+
+    def upsert(self, values, on_conflict: str = "", **_):
+        self.action, self.values, self.on_conflict = "upsert", values, on_conflict
+        return self
+
+    def update(self, values: dict, **_):
+        self.action, self.values = "update", values
+        return self
+
+    def delete(self, **_):
+        self.action = "delete"
+        return self
+
+    @property
+    def not_(self):
+        self.negate_next = True
+        return self
+
+    def _filter(self, condition: str, parameters: list):
+        if self.negate_next:
+            condition = f"NOT ({condition})"
+            self.negate_next = False
+        self.conditions.append(condition)
+        self.parameters.extend(parameters)
+        return self
+
+    def eq(self, column: str, value):
+        return self._filter(f'"{column}" = ?', [value])
+
+    def neq(self, column: str, value):
+        return self._filter(f'"{column}" <> ?', [value])
+
+    def gt(self, column: str, value):
+        return self._filter(f'"{column}" > ?', [value])
+
+    def gte(self, column: str, value):
+        return self._filter(f'"{column}" >= ?', [value])
+
+    def lt(self, column: str, value):
+        return self._filter(f'"{column}" < ?', [value])
+
+    def lte(self, column: str, value):
+        return self._filter(f'"{column}" <= ?', [value])
+
+    def in_(self, column: str, values):
+        values = list(values)
+        if not values:
+            return self._filter("FALSE", [])
+        placeholders = ", ".join("?" for _ in values)
+        return self._filter(f'"{column}" IN ({placeholders})', values)
+
+    def order(self, column: str, desc: bool = False, **_):
+        self.ordering.append(f'"{column}" {"DESC" if desc else "ASC"}')
+        return self
+
+    def limit(self, size: int, **_):
+        self.row_limit = size
+        return self
+
+    def execute(self):
+        if self.action in ("insert", "upsert"):
+            records = self.values if isinstance(self.values, list) else [self.values]
+            data = self.client.write(self.table, records, self.on_conflict)
+            return SimpleNamespace(data=data, count=None)
+
+        existing = self.client.columns(self.table)
+        if not existing:
+            return SimpleNamespace(data=[], count=None)
+        where = f" WHERE {' AND '.join(self.conditions)}" if self.conditions else ""
+        if self.action == "select":
+            columns = ", ".join(
+                "*" if c.strip() == "*" else f'"{c.strip()}"'
+                for c in self.columns.split(",")
+            )
+            sql = f'SELECT {columns} FROM "{self.table}"{where}'
+            if self.ordering:
+                sql += f" ORDER BY {', '.join(self.ordering)}"
+            if self.row_limit is not None:
+                sql += f" LIMIT {int(self.row_limit)}"
+            data = self.client.execute(sql, self.parameters)
+            if self.count_method is not None:
+                # like PostgREST, the count ignores the limit
+                rows = self.client.execute(
+                    f'SELECT COUNT(*) AS count FROM "{self.table}"{where}',
+                    self.parameters,
+                )
+                return SimpleNamespace(data=data, count=rows[0]["count"])
+        elif self.action == "update":
+            data = self.client.update(self.table, self.values, where, self.parameters)
+        else:
+            sql = f'DELETE FROM "{self.table}"{where} RETURNING *'
+            data = self.client.execute(sql, self.parameters)
+        return SimpleNamespace(data=data, count=None)
+
+
+def _frame(records: list[dict]) -> pd.DataFrame:
+    names = list(dict.fromkeys(k for record in records for k in record))
+    return pd.DataFrame(
+        {name: _column([_from_wire(r.get(name)) for r in records]) for name in names}
+    )
+
+
+def _column(values: list):
+    """
+    Integers with missing values stay integers (pandas would turn them into floats).
+    """
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return pd.array(values, dtype="Int64")
+    return values
+
+
+def _from_wire(value):
+    return list(value) if isinstance(value, tuple) else value
+
+
+def _to_wire(value):
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
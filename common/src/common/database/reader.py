@@ -0,0 +1,155 @@
+"""
+Read whole Supabase tables page by page.
+
+PostgREST caps the rows of a response (1000 on Supabase by default), so a single select("*") silently
+returns the first page only. Tables are read by keyset pagination: each page is ordered on the key and
+starts after the last key of the previous one, which costs the same at any depth, unlike offsets.
+Tables keyed on (counter_id, date) are partitioned per counter: the counter ids are found first by
+skipping from one id to the next, then the pages of several counters are read concurrently.
+"""
+
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from common.schema.schema import compact
+
+# must not exceed the row cap of the server: a shorter page ends a partition
+PAGE_SIZE = 1000
+MAX_WORKERS = 4
+
+
+def iter_table(
+    client,
+    table: str,
+    columns: list[str] | None = None,
+    key: tuple[str, ...] = ("counter_id", "date"),
+    page_size: int = PAGE_SIZE,
+    max_workers: int = MAX_WORKERS,
+    partitions: list | None = None,
+    since=None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Rows of the table as DataFrame chunks of at most page_size rows, in key order, in the wire shape.
+    'key' is a unique key of the table, either one column or (partition column, order column).
+    Only 'columns' are returned when given (the key columns are read anyway).
+    'partitions' restricts the read to these values of the partition column (all of them by default),
+    'since' to the rows whose order column is at least 'since'.
+    """
+    select = "*" if columns is None else ",".join(dict.fromkeys([*key, *columns]))
+    extra_columns = [] if columns is None else [c for c in key if c not in columns]
+
+    if len(key) == 1:
+        for chunk in _pages(client, table, select, key[0], page_size, since):
+            yield chunk.drop(columns=extra_columns)
+        return
+
+    partition_column, order_column = key
+
+    def read_partition(value) -> list[pd.DataFrame]:
+        return list(
+            _pages(
+                client,
+                table,
+                select,
+                order_column,
+                page_size,
+                since,
+                partition=(partition_column, value),
+            )
+        )
+
+    # at most max_workers counters in flight, yielded in counter order
+    values = (
+        iter(partitions)
+        if partitions is not None
+        else _distinct(client, table, partition_column)
+    )
+    with ThreadPoolExecutor(max_workers) as executor:
+        in_flight = deque(
+            executor.submit(read_partition, value)
+            for _, value in zip(range(max_workers), values)
+        )
+        while in_flight:
+            chunks = in_flight.popleft().result()
+            value = next(values, None)
+            if value is not None:
+                in_flight.append(executor.submit(read_partition, value))
+            for chunk in chunks:
+                yield chunk.drop(columns=extra_columns)
+
+
+def read_table(
+    client,
+    table: str,
+    columns: list[str] | None = None,
+    key: tuple[str, ...] = ("counter_id", "date"),
+    page_size: int = PAGE_SIZE,
+    max_workers: int = MAX_WORKERS,
+    partitions: list | None = None,
+    since=None,
+    typed: bool = True,
+) -> pd.DataFrame:
+    """
+    The whole table (see iter_table) as one frame, with the compact dtypes of common.schema unless typed is False.
+    """
+    chunks = list(
+        iter_table(
+            client, table, columns, key, page_size, max_workers, partitions, since
+        )
+    )
+    if not chunks:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(chunks, ignore_index=True)
+    return compact(df) if typed else df
+
+
+def count_rows(client, table: str, column: str = "counter_id") -> int | None:
+    """
+    Number of rows of the table, counted by the server in a single request (None if the client does not count).
+    """
+    return client.table(table).select(column, count="exact").limit(1).execute().count
+
+
+def _pages(
+    client,
+    table: str,
+    select: str,
+    order_column: str,
+    page_size: int,
+    since=None,
+    partition: tuple[str, object] | None = None,
+) -> Iterator[pd.DataFrame]:
+    last = None
+    while True:
+        query = client.table(table).select(select)
+        if partition is not None:
+            query = query.eq(*partition)
+        if last is not None:
+            query = query.gt(order_column, last)
+        elif since is not None:
+            query = query.gte(order_column, since)
+        rows = query.order(order_column).limit(page_size).execute().data or []
+        if rows:
+            yield pd.DataFrame.from_records(rows)
+        if len(rows) < page_size:
+            return
+        last = rows[-1][order_column]
+
+
+def _distinct(client, table: str, column: str) -> Iterator:
+    """
+    Distinct values of an indexed column, one request per value.
+    """
+    last = None
+    while True:
+        query = client.table(table).select(column)
+        if last is not None:
+            query = query.gt(column, last)
+        rows = query.order(column).limit(1).execute().data
+        if not rows:
+            return
+        last = rows[0][column]
+        yield last
@@ -0,0 +1,24 @@
+import os
+
+
+def create_storage_client(backend: str | None = None):
+    """
+    Client of the storage selected by STORAGE_BACKEND: "supabase" (default, needs SUPABASE_URL and SUPABASE_KEY)
+    or "local", a DuckDB file at LOCAL_DATABASE_PATH answering the same query builder calls without network.
+    The environment is read when called, after the services have loaded their .env file.
+    """
+    backend = backend or os.getenv("STORAGE_BACKEND", "supabase")
+    if backend == "local":
+        from common.database.local import LocalClient
+
+        return LocalClient(os.getenv("LOCAL_DATABASE_PATH", "local.duckdb"))
+    if backend != "supabase":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+
+    from supabase import create_client
+
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_KEY")
+    if supabase_url and supabase_key:
+        return create_client(supabase_url, supabase_key)
+    raise ValueError("SUPABASE_URL and/or SUPABASE_KEY not found")
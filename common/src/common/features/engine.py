@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+ROLLING_WINDOWS = [7, 28]
+LAGS = [7, 28]
+
+
+def compute_counter_features(
+    counter_id: np.ndarray, date: np.ndarray, intensity: np.ndarray
+) -> dict[str, np.ndarray]:
+    """
+    Compute the rolling means and lags of every counter in a single pass over contiguous arrays.
+
+    Rows are sorted once by (counter_id, date); each counter is then a segment of the sorted arrays.
+    Rolling means are cumulative-sum differences clipped to the segment start (same result as a
+    per-counter rolling(window, min_periods=1).mean() rounded to 2 decimals). Lags read the value
+    'lag' rows earlier in the segment and fall back to the rolling mean of the same window, truncated to int.
+    Results are returned in the input row order.
+    """
+    codes, _ = pd.factorize(counter_id)
+    order = np.lexsort((date, codes))
+    values = np.asarray(intensity)[order]
+    sorted_codes = codes[order]
+
+    n = len(values)
+    row = np.arange(n)
+    is_start = np.ones(n, dtype=bool)
+    is_start[1:] = sorted_codes[1:] != sorted_codes[:-1]
+    segment_start = np.maximum.accumulate(np.where(is_start, row, 0))
+    position = row - segment_start
+
+    cumsum = np.zeros(n + 1, dtype=values.dtype)
+    np.cumsum(values, out=cumsum[1:])
+
+    features = {}
+    for window in ROLLING_WINDOWS:
+        window_start = np.maximum(row + 1 - window, segment_start)
+        mean = (cumsum[row + 1] - cumsum[window_start]) / (row + 1 - window_start)
+        features[f"rolling_{window}d"] = np.round(mean, 2)
+    for lag in LAGS:
+        lagged = values[np.maximum(row - lag, 0)].astype(np.float64)
+        fallback = features[f"rolling_{lag}d"]
+        features[f"lag_{lag}d"] = np.where(position >= lag, lagged, fallback).astype(
+            int
+        )
+
+    for name, sorted_values in features.items():
+        unsorted = np.empty_like(sorted_values)
+        unsorted[order] = sorted_values
+        features[name] = unsorted
+    return features
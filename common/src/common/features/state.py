@@ -0,0 +1,129 @@
+from typing import final
+
+import numpy as np
+import pandas as pd
+
+from common.features.engine import LAGS, ROLLING_WINDOWS
+
+STATE_SIZE = max(ROLLING_WINDOWS + LAGS)
+
+
+@final
+class CounterFeatureState:
+    """
+    Last STATE_SIZE daily intensities of a counter in a ring buffer, with the running sum of each rolling window.
+    Appending a day updates the rolling means and lags in O(1) and gives the same values as common.features.engine
+    computed over the whole history.
+    """
+
+    def __init__(self, values: list[int] | None = None, last_date: str | None = None):
+        self.buffer = [0] * STATE_SIZE
+        self.start = 0  # index of the oldest value
+        self.count = 0
+        self.sums = {window: 0 for window in ROLLING_WINDOWS}
+        self.last_date = last_date
+        for value in values or []:
+            self._push(int(value))
+
+    def _get(self, lag: int) -> int:
+        """
+        Value appended 'lag' days ago (1 is the latest).
+        """
+        return self.buffer[(self.start + self.count - lag) % STATE_SIZE]
+
+    def _push(self, value: int):
+        for window in ROLLING_WINDOWS:
+            self.sums[window] += value
+            if self.count >= window:
+                self.sums[window] -= self._get(window)
+        if self.count == STATE_SIZE:
+            self.buffer[self.start] = value
+            self.start = (self.start + 1) % STATE_SIZE
+        else:
+            self.buffer[(self.start + self.count) % STATE_SIZE] = value
+            self.count += 1
+
+    def append(self, intensity: int, date: str) -> dict | None:
+        """
+        Add the intensity of a new day and return its features.
+        Days up to the last appended one are ignored (None), so replaying a day is harmless.
+        """
+        if self.last_date is not None and date <= self.last_date:
+            return None
+        intensity = int(intensity)
+        lagged = {lag: self._get(lag) for lag in LAGS if self.count >= lag}
+        self._push(intensity)
+        self.last_date = date
+
+        features = {}
+        for window in ROLLING_WINDOWS:
+            mean = self.sums[window] / min(self.count, window)
+            features[f"rolling_{window}d"] = float(np.round(mean, 2))
+        for lag in LAGS:
+            features[f"lag_{lag}d"] = int(lagged.get(lag, features[f"rolling_{lag}d"]))
+        return features
+
+    def next_features(self) -> dict:
+        """
+        Features of the day after the last appended one, for serving. Its intensity is not known yet:
+        lags are those append() would give, rolling means cover the previous days only. NaN without any value.
+        """
+        features = {}
+        for window in ROLLING_WINDOWS:
+            size = min(self.count, window)
+            mean = self.sums[window] / size if size else np.nan
+            features[f"rolling_{window}d"] = float(np.round(mean, 2))
+        for lag in LAGS:
+            fallback = features[f"rolling_{lag}d"]
+            if self.count >= lag:
+                features[f"lag_{lag}d"] = self._get(lag)
+            else:
+                features[f"lag_{lag}d"] = (
+                    np.nan if np.isnan(fallback) else int(fallback)
+                )
+        return features
+
+    def forecast(self, horizon: int) -> list[dict]:
+        """
+        next_features of the 'horizon' next days, leaving the state unchanged.
+        The days are not observed: each one is filled with its own lag_7d so that the following days read it.
+        """
+        state = CounterFeatureState(self.values(), self.last_date)
+        vectors = []
+        for _ in range(horizon):
+            features = state.next_features()
+            vectors.append(features)
+            if state.count:
+                state._push(int(features["lag_7d"]))
+        return vectors
+
+    def values(self) -> list[int]:
+        """
+        Buffered intensities, oldest first.
+        """
+        return [self._get(lag) for lag in range(self.count, 0, -1)]
+
+    def to_record(self, counter_id: str) -> dict:
+        return {
+            "counter_id": counter_id,
+            "last_date": self.last_date,
+            "intensities": self.values(),
+            **{f"sum_{window}d": self.sums[window] for window in ROLLING_WINDOWS},
+        }
+
+    @classmethod
+    def from_record(cls, record: dict):
+        return cls(record["intensities"], record["last_date"])
+
+
+def states_from_history(df: pd.DataFrame) -> dict[str, CounterFeatureState]:
+    """
+    Build the state of every counter from its last daily rows ('counter_id', 'date' as string, 'intensity').
+    """
+    df = df.sort_values(["counter_id", "date"])
+    return {
+        counter_id: CounterFeatureState(
+            group["intensity"].tail(STATE_SIZE).tolist(), str(group["date"].iloc[-1])
+        )
+        for counter_id, group in df.groupby("counter_id", sort=False)
+    }
@@ -0,0 +1,116 @@
+"""
+Feature store of the daily counter features, defined once in common.features.engine.
+
+The offline view materializes the features of every row of a history, the way the training data is built.
+The online view keeps the feature state of every counter in memory, with the feature vector of its next day
+already computed, and persists them to a local JSON file: serving reads a vector with a dict lookup
+instead of querying the last days of historical_data.
+"""
+
+import json
+import os
+from datetime import date
+from pathlib import Path
+from typing import final
+
+import numpy as np
+import pandas as pd
+
+from common.features.engine import LAGS, ROLLING_WINDOWS, compute_counter_features
+from common.features.state import CounterFeatureState
+
+FEATURE_NAMES = [f"rolling_{w}d" for w in ROLLING_WINDOWS] + [
+    f"lag_{lag}d" for lag in LAGS
+]
+
+
+def materialize(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the features of every row of a daily history ('counter_id', 'date', 'intensity') to the frame.
+    """
+    features = compute_counter_features(
+        df["counter_id"].to_numpy(), df["date"].to_numpy(), df["intensity"].to_numpy()
+    )
+    for name, values in features.items():
+        df[name] = values
+    return df
+
+
+@final
+class OnlineFeatureView:
+    """
+    Feature state and next-day feature vector of every counter, keyed by counter_id.
+    The vector of a counter is recomputed when its state is updated, never when it is read.
+    """
+
+    def __init__(self, path: Path | str | None = None) -> None:
+        self.path = Path(path) if path is not None else None
+        self.states: dict[str, CounterFeatureState] = {}
+        self.vectors: dict[str, dict] = {}
+
+    def __contains__(self, counter_id: str) -> bool:
+        return counter_id in self.states
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def get(self, counter_id: str) -> dict:
+        """
+        Features of the day after the last ingested one, NaN for an unknown counter.
+        """
+        return self.vectors.get(counter_id) or dict.fromkeys(FEATURE_NAMES, np.nan)
+
+    def forecast(
+        self, counter_id: str, horizon: int, start: str | None = None
+    ) -> list[dict]:
+        """
+        Features of the 'horizon' days from 'start' (ISO date, by default the day after the last ingested one).
+        Days not ingested yet before 'start' are estimated like the forecast days (see CounterFeatureState.forecast).
+        """
+        state = self.states.get(counter_id)
+        if state is None:
+            return [dict.fromkeys(FEATURE_NAMES, np.nan) for _ in range(horizon)]
+        skipped = 0
+        if start is not None and state.last_date is not None:
+            last_date = date.fromisoformat(state.last_date[:10])
+            skipped = max(0, (date.fromisoformat(start) - last_date).days - 1)
+        if skipped == 0 and horizon == 1:
+            return [self.vectors[counter_id]]
+        return state.forecast(skipped + horizon)[skipped:]
+
+    def update(self, states: dict[str, CounterFeatureState]):
+        """
+        Replace the state of the given counters and refresh their vectors.
+        """
+        for counter_id, state in states.items():
+            self.states[counter_id] = CounterFeatureState(
+                state.values(), state.last_date
+            )
+            self.vectors[counter_id] = state.next_features()
+        return self
+
+    def save(self, path: Path | str | None = None):
+        """
+        Write the states to the file of the view, atomically.
+        """
+        path = Path(path or self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        records = [state.to_record(c) for c, state in self.states.items()]
+        temporary = path.with_suffix(path.suffix + ".tmp")
+        _ = temporary.write_text(json.dumps(records))
+        os.replace(temporary, path)
+        return self
+
+    @classmethod
+    def load(cls, path: Path | str):
+        """
+        The view saved at 'path', empty if there is none yet.
+        """
+        view = cls(path)
+        path = Path(path)
+        if path.exists():
+            records = json.loads(path.read_text())
+            view.update(
+                {r["counter_id"]: CounterFeatureState.from_record(r) for r in records}
+            )
+        return view
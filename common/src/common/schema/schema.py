@@ -0,0 +1,175 @@
+"""
+Compact in-memory shape of the daily counter data, shared by every service.
+
+Rows travel to and from Supabase as JSON records (ids and dates as strings, coordinates as pairs).
+In memory, compact() turns them into:
+- 'counter_id' as a categorical (one small integer code per row instead of a long URN string),
+- each coordinate pair as two float32 columns (about 0.4 m of resolution around Montpellier),
+- dates as int32 day keys (days since 1970-01-01),
+- features and measures as float32 / small integers.
+expand() and to_records() give back the wire shape, rounded to the decimals stored in the database.
+"""
+
+import numpy as np
+import pandas as pd
+
+CATEGORY_COLUMNS = ["counter_id"]
+DAY_COLUMNS = ["date", "first_date", "last_date", "period_start"]
+COORDINATE_COLUMNS = {
+    "coordinates": ("latitude", "longitude"),
+    "rounded_coordinates": ("rounded_latitude", "rounded_longitude"),
+}
+DTYPES = {
+    "latitude": "float32",
+    "longitude": "float32",
+    "rounded_latitude": "float32",
+    "rounded_longitude": "float32",
+    "year": "int16",
+    "month": "int8",
+    "day": "int8",
+    "weekday": "int8",
+    "hour": "int8",
+    "is_weekend": "int8",
+    "is_rainy": "int8",
+    "rolling_7d": "float32",
+    "rolling_28d": "float32",
+    "lag_7d": "int32",
+    "lag_28d": "int32",
+    "temperature": "float32",
+    "rain": "float32",
+    "intensity": "int32",
+    "forecast": "int32",
+}
+# decimals of the float columns on the wire; float32 keeps them exactly once rounded back
+WIRE_DECIMALS = {
+    "latitude": 6,
+    "longitude": 6,
+    "rounded_latitude": 2,
+    "rounded_longitude": 2,
+    "rolling_7d": 2,
+    "rolling_28d": 2,
+    "temperature": 2,
+    "rain": 2,
+}
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a frame in the wire shape (or already partly compact) to the compact dtypes.
+    Columns unknown to the schema are kept as they are; integer columns with missing values become float32.
+    """
+    columns = {}
+    for name in df.columns:
+        values = df[name]
+        if name in COORDINATE_COLUMNS:
+            pairs = coordinate_pairs(values)
+            for i, column in enumerate(COORDINATE_COLUMNS[name]):
+                columns[column] = pairs[:, i]
+        elif name in CATEGORY_COLUMNS:
+            columns[name] = values.astype("category")
+        elif name in DAY_COLUMNS:
+            columns[name] = to_day_keys(values)
+        elif name in DTYPES:
+            dtype = DTYPES[name]
+            if dtype.startswith("int") and values.isna().any():
+                dtype = "float32"
+            columns[name] = values.astype(dtype)
+        else:
+            columns[name] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def expand(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a compact frame back to the wire shape: string ids and ISO dates, coordinate tuples,
+    float64 rounded to WIRE_DECIMALS and int64.
+    """
+    columns = {}
+    pairs = {pair: name for name, pair in COORDINATE_COLUMNS.items()}
+    for name in df.columns:
+        values = df[name]
+        pair = next((p for p in pairs if name in p), None)
+        if pair is not None:
+            if name == pair[0] and pair[1] in df.columns:
+                latitude, longitude = (
+                    _wire_floats(df[column], WIRE_DECIMALS[column]).tolist()
+                    for column in pair
+                )
+                columns[pairs[pair]] = pd.Series(
+                    list(zip(latitude, longitude)), index=df.index, dtype=object
+                )
+            elif pair[0] not in df.columns:
+                columns[name] = values
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            columns[name] = values.astype(object)
+        elif name in DAY_COLUMNS and pd.api.types.is_integer_dtype(values):
+            columns[name] = pd.Series(day_keys_to_iso(values), index=df.index)
+        elif pd.api.types.is_float_dtype(values):
+            columns[name] = _wire_floats(values, WIRE_DECIMALS.get(name))
+        elif pd.api.types.is_integer_dtype(values):
+            columns[name] = values.astype("int64")
+        else:
+            columns[name] = values
+    return pd.DataFrame(columns, index=df.index)
+
+
+def to_records(df: pd.DataFrame) -> list[dict]:
+    """
+    Records ready to be sent to the database, from a compact (or wire) frame.
+    """
+    return expand(df).to_dict(orient="records")
+
+
+def to_day_keys(values: pd.Series) -> np.ndarray:
+    """
+    int32 day keys from ISO date strings, datetimes or day keys.
+    """
+    if pd.api.types.is_integer_dtype(values):
+        return values.to_numpy().astype(np.int32)
+    dates = pd.to_datetime(values).to_numpy()
+    return dates.astype("datetime64[D]").astype(np.int32)
+
+
+def day_keys_to_datetime(values: pd.Series) -> pd.Series:
+    return pd.Series(
+        values.to_numpy().astype("datetime64[D]").astype("datetime64[ns]"),
+        index=values.index,
+        name=values.name,
+    )
+
+
+def day_keys_to_iso(values) -> np.ndarray:
+    return np.datetime_as_string(np.asarray(values).astype("datetime64[D]"))
+
+
+def coordinate_pairs(values: pd.Series) -> np.ndarray:
+    """
+    (n, 2) float32 array from a column of (latitude, longitude) pairs, given as tuples, lists or "(x, y)" strings.
+    Missing or malformed pairs become (nan, nan), so one bad row does not fail the whole frame.
+    """
+    pairs = [_coordinate_pair(v) for v in values]
+    return np.asarray(pairs, dtype=np.float32).reshape(len(pairs), 2)
+
+
+def _coordinate_pair(value: object) -> list[float]:
+    if isinstance(value, str):
+        value = value.strip("()[] ").split(",")
+    try:
+        pair = [float(part) for part in value]
+    except (TypeError, ValueError):
+        return [np.nan, np.nan]
+    return pair if len(pair) == 2 else [np.nan, np.nan]
+
+
+def memory_per_million_rows(df: pd.DataFrame) -> float:
+    """
+    Memory used by the frame, in MiB per million rows.
+    """
+    if len(df) == 0:
+        return 0.0
+    return df.memory_usage(deep=True).sum() / len(df) * 1_000_000 / 2**20
+
+
+def _wire_floats(values: pd.Series, decimals: int | None) -> pd.Series:
+    values = values.astype("float64")
+    return values if decimals is None else values.round(decimals)
@@ -4,17 +4,17 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import requests
-from datetime import datetime
+from datetime import date, datetime
 import plotly.express as px
 import plotly.graph_objects as go
-from supabase import create_client, Client
+from common.database.reader import read_table
+from common.database.storage import create_storage_client
+from common.schema.schema import compact, day_keys_to_datetime, memory_per_million_rows
 
 # 1. Setup
 dotenv_path = "/home/marwa/prevision-du-Trafic-Cyclable/.env"
 load_dotenv(dotenv_path)
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 API_URL = os.getenv("API_URL", "http://127.0.0.1:8000/predict")
 
 st.set_page_config(
@@ -264,19 +264,24 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# 3. Supabase
+# 3. Stockage : Supabase, ou base DuckDB locale avec STORAGE_BACKEND=local
 @st.cache_resource
-def init_supabase() -> Client:
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        st.error(" Configuration Supabase manquante")
+def init_supabase():
+    try:
+        return create_storage_client()
+    except ValueError as e:
+        st.error(f" Configuration du stockage manquante : {e}")
         st.stop()
-    return create_client(SUPABASE_URL, SUPABASE_KEY)
+
+# Paires inversées (longitude, latitude) remises dans l'ordre
+def lat_lon(df):
+    swapped = df['latitude'].abs() > 90
+    return df['latitude'].where(~swapped, df['longitude']), df['longitude'].where(~swapped, df['latitude'])
 
 @st.cache_data(ttl=600)
 def load_best_counters() -> pd.DataFrame:
     supabase = init_supabase()
-    resp = supabase.table("best_counters").select("*").execute()
-    best_df = pd.DataFrame(resp.data or [])
+    best_df = read_table(supabase, "best_counters", key=("counter_id",))
     if best_df.empty:
         st.warning(" Aucun compteur dans la table best_counters")
     return best_df
@@ -284,29 +289,55 @@ def load_best_counters() -> pd.DataFrame:
 @st.cache_data(ttl=600)
 def load_forecast_data() -> pd.DataFrame:
     supabase = init_supabase()
-    resp = supabase.table("forecast_data").select("*").execute()
-    df = pd.DataFrame(resp.data or [])
+    # Lecture paginée des jours à prévoir seulement, comme prediction/predict.py
+    today = date.today().isoformat()
+    df = read_table(supabase, "forecast_data", key=("counter_id", "date"), since=today)
 
     if df.empty:
         st.warning("Aucune donnée de prévision en base")
         return df
 
-    # Convertir la date si nécessaire
+    # Convertir la date (numéro de jour) si nécessaire
     if "date" in df.columns:
-        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+        df["date"] = day_keys_to_datetime(df["date"])
 
     return df
 
+# Tables d'agrégats tenues à jour par l'ingestion (voir ingestion/src/dashboard_aggregates.py),
+# sauf counter_daily_totals, aussi grande que l'historique et inutile ici
+DASHBOARD_TABLES = {
+    "counter_weekly_totals": "period_start",
+    "counter_monthly_totals": "period_start",
+    "counter_weekday_stats": "weekday",
+    "counter_intensity_bins": "bin_start",
+}
+
 @st.cache_data(ttl=600)
-def load_data_from_supabase(table_name="historical_data") -> pd.DataFrame:
+def load_dashboard_tables() -> dict:
     supabase = init_supabase()
-    resp = supabase.table(table_name).select("*").execute()
-    df = pd.DataFrame(resp.data or [])
+    tables = {}
+    for table, column in DASHBOARD_TABLES.items():
+        df = read_table(supabase, table, key=("counter_id", column))
+        if column == "period_start" and not df.empty:
+            df["period_start"] = day_keys_to_datetime(df["period_start"])
+        tables[table] = df
+    return tables
+
+@st.cache_data(ttl=600)
+def load_data_from_supabase(table_name="historical_data", counter_ids=None) -> pd.DataFrame:
+    supabase = init_supabase()
+    # Lecture paginée et parallèle par compteur (voir common.database.reader)
+    df = read_table(supabase, table_name, partitions=counter_ids, typed=False)
     if df.empty:
         return df
 
+    # Types compacts partagés entre les services (voir common.schema)
+    raw_memory = memory_per_million_rows(df)
+    df = compact(df)
+    print(f"Mémoire : {memory_per_million_rows(df):.0f} Mo par million de lignes ({raw_memory:.0f} avant compactage)")
+
     if 'date' in df.columns:
-        df['time'] = pd.to_datetime(df['date'], errors='coerce')
+        df['time'] = day_keys_to_datetime(df['date'])
     else:
         df['time'] = pd.NaT
 
@@ -320,28 +351,10 @@ def load_data_from_supabase(table_name="historical_data") -> pd.DataFrame:
             else:
                 df[col] = 0
 
-    if 'coordinates' in df.columns and ('lat' not in df.columns or 'lon' not in df.columns):
-        def parse_coord(x):
-            if x is None: 
-                return (np.nan, np.nan)
-            if isinstance(x, (list, tuple)) and len(x) == 2:
-                lat, lon = x
-                if abs(lat) > 90: lat, lon = lon, lat
-                return float(lat), float(lon)
-            try:
-                s = str(x).replace("(", "").replace(")", "").replace("[","").replace("]","").strip()
-                parts = [float(p) for p in s.split(",")]
-                if len(parts) != 2:
-                    return (np.nan, np.nan)
-                lat, lon = parts
-                if abs(lat) > 90: lat, lon = lon, lat
-                return lat, lon
-            except:
-                return (np.nan, np.nan)
-
-        coords = df['coordinates'].apply(parse_coord)
-        df['lat'] = coords.apply(lambda t: t[0])
-        df['lon'] = coords.apply(lambda t: t[1])
+    # Les coordonnées sont déjà séparées en colonnes latitude / longitude
+    # (NaN pour les coordonnées absentes ou illisibles, ignorées par la carte)
+    if 'latitude' in df.columns and ('lat' not in df.columns or 'lon' not in df.columns):
+        df['lat'], df['lon'] = lat_lon(df)
 
     return df
 
@@ -360,13 +373,34 @@ def call_api_single(year, month, day, hour, weekday, counter_id=None, retries=1)
         st.error(f" Erreur API : {e}")
         return None
 
-# 5. Chargement des données
+# 5. Chargement des agrégats (quelques milliers de lignes au lieu de tout l'historique)
 with st.spinner(" Chargement des données..."):
-    df = load_data_from_supabase()
-if df.empty:
+    tables = load_dashboard_tables()
+weekday_stats = tables["counter_weekday_stats"]
+monthly_totals = tables["counter_monthly_totals"]
+if weekday_stats.empty:
     st.error(" Aucune donnée disponible")
     st.stop()
 
+# Moyenne journalière de chaque compteur, avec ses coordonnées
+station_agg = weekday_stats.groupby("counter_id", observed=True)[["days", "intensity_sum"]].sum().reset_index()
+station_agg["avg_value"] = station_agg["intensity_sum"] / station_agg["days"]
+best_counters = load_best_counters()
+if "latitude" in best_counters.columns:
+    lat, lon = lat_lon(best_counters)
+    station_agg = pd.merge(
+        station_agg.astype({"counter_id": str}),
+        pd.DataFrame({"counter_id": best_counters["counter_id"].astype(str), "lat": lat, "lon": lon}),
+        how="left",
+        on="counter_id",
+    )
+else:
+    station_agg["lat"] = np.nan
+    station_agg["lon"] = np.nan
+counter_ids = sorted(station_agg["counter_id"].astype(str).unique())
+mean_value = weekday_stats["intensity_sum"].sum() / weekday_stats["days"].sum()
+weekday_names_short = ["Lun","Mar","Mer","Jeu","Ven","Sam","Dim"]
+
 # 6. Hero Header
 st.markdown('<h1 class="hero-header">🚴 Trafic Cyclable Montpellier</h1>', unsafe_allow_html=True)
 st.markdown('<p class="hero-subtitle">Analyse intelligente et prédictions en temps réel</p>', unsafe_allow_html=True)
@@ -384,7 +418,7 @@ with tab1:
         st.markdown(f"""
         <div class="metric-card">
             <div class="metric-label">Compteurs Actifs</div>
-            <div class="metric-value">{df['id'].nunique()}</div>
+            <div class="metric-value">{len(counter_ids)}</div>
         </div>
         """, unsafe_allow_html=True)
     
@@ -392,7 +426,7 @@ with tab1:
         st.markdown(f"""
         <div class="metric-card">
             <div class="metric-label">Trafic Moyen</div>
-            <div class="metric-value">{df['value'].mean():.0f}</div>
+            <div class="metric-value">{mean_value:.0f}</div>
         </div>
         """, unsafe_allow_html=True)
     
@@ -400,7 +434,7 @@ with tab1:
         st.markdown(f"""
         <div class="metric-card">
             <div class="metric-label">Pic Maximum</div>
-            <div class="metric-value">{df['value'].max():.0f}</div>
+            <div class="metric-value">{weekday_stats['intensity_max'].max():.0f}</div>
         </div>
         """, unsafe_allow_html=True)
     
@@ -408,7 +442,7 @@ with tab1:
         st.markdown(f"""
         <div class="metric-card">
             <div class="metric-label">Période</div>
-            <div class="metric-value">{df['year'].min()}-{df['year'].max()}</div>
+            <div class="metric-value">{monthly_totals['period_start'].dt.year.min()}-{monthly_totals['period_start'].dt.year.max()}</div>
         </div>
         """, unsafe_allow_html=True)
     
@@ -418,16 +452,14 @@ with tab1:
 
     
     # Carte
-    station_agg = df.groupby(['id', 'lat', 'lon']).agg({'value':'mean'}).reset_index()
-    station_agg.rename(columns={"value":"avg_value"}, inplace=True)
-    station_agg.dropna(subset=['lat','lon'], inplace=True)
+    station_map = station_agg.dropna(subset=['lat','lon'])
     
-    if not station_agg.empty:
+    if not station_map.empty:
         fig_map = px.scatter_mapbox(
-            station_agg,
+            station_map,
             lat="lat",
             lon="lon",
-            hover_name="id",
+            hover_name="counter_id",
             hover_data={"avg_value": ":.0f"},
             size="avg_value",
             size_max=25,
@@ -455,11 +487,11 @@ with tab1:
 
     # Top 10 des compteurs
 with col_left:
-    top10 = df.groupby('id')['value'].mean().sort_values(ascending=False).head(10)
+    top10 = station_agg.set_index('counter_id')['avg_value'].rename('value').sort_values(ascending=False).head(10)
     if not top10.empty:
         fig_top = px.bar(
             top10.reset_index(),
-            x='id',
+            x='counter_id',
             y='value',
             text='value',
             color='value',
@@ -483,9 +515,12 @@ with col_left:
 
     # Distribution
     with col_right:
-        fig_dist = go.Figure(go.Histogram(
-            x=df['value'],
-            nbinsx=50,
+        # Histogramme à classes fixes, cumulé sur tous les compteurs
+        bins = tables["counter_intensity_bins"].groupby("bin_start")["days"].sum()
+        fig_dist = go.Figure(go.Bar(
+            x=bins.index,
+            y=bins.values,
+            offset=0,
             marker=dict(
                 color='rgb(102, 126, 234)',
                 line=dict(color='white', width=1)
@@ -497,6 +532,7 @@ with col_left:
             yaxis_title="Nombre de mesures",
             height=400,
             showlegend=False,
+            bargap=0,
             paper_bgcolor='#DCDCDC',
             plot_bgcolor='#DCDCDC',
             font=dict(color='black', size=12),
@@ -531,7 +567,7 @@ with tab2:
         st.warning("Aucune prévision enregistrée pour ce jour.")
     else:
         pred_val = row["forecast"].iloc[0]
-        baseline = df["value"].mean()
+        baseline = mean_value
 
         # Vérification que pred_val est bien un nombre
         if pred_val is not None:
@@ -577,13 +613,20 @@ with tab2:
 with tab3:
     st.markdown('<h2 class="section-header">📈 Analyse Temporelle Avancée</h2>', unsafe_allow_html=True)
     
-    selected_station = st.selectbox("📍 Sélectionner un compteur", ["🌐 Tous"] + sorted(df["id"].unique()))
-    df_filtered = df if selected_station == "🌐 Tous" else df[df["id"]==selected_station]
+    selected_station = st.selectbox("📍 Sélectionner un compteur", ["🌐 Tous"] + counter_ids)
+
+    def for_station(table):
+        df_table = tables[table]
+        return df_table if selected_station == "🌐 Tous" else df_table[df_table["counter_id"] == selected_station]
+
+    weekly = for_station("counter_weekday_stats").groupby("weekday")[["days", "intensity_sum"]].sum().reset_index()
+    weekly["value"] = weekly["intensity_sum"] / weekly["days"]
     
     col1, col2 = st.columns(2)
     
     with col1:
-        hourly = df_filtered.groupby("hour")["value"].mean().reset_index()
+        # Données journalières : une seule heure (0)
+        hourly = pd.DataFrame({"hour": [0], "value": [weekly["intensity_sum"].sum() / weekly["days"].sum()]})
         fig_hour = go.Figure(go.Scatter(
             x=hourly["hour"],
             y=hourly["value"],
@@ -604,8 +647,6 @@ with tab3:
         st.plotly_chart(fig_hour, use_container_width=True)
     
     with col2:
-        weekly = df_filtered.groupby("weekday")["value"].mean().reset_index()
-        weekday_names_short = ["Lun","Mar","Mer","Jeu","Ven","Sam","Dim"]
         weekly["day_name"] = weekly["weekday"].apply(lambda x: weekday_names_short[x])
         fig_week = go.Figure(go.Bar(
             x=weekly["day_name"],
@@ -630,7 +671,7 @@ with tab3:
     
     # Heatmap
     st.markdown('<h2 class="section-header"> Intensité du Trafic  </h2>', unsafe_allow_html=True)
-    heatmap_data = df_filtered.pivot_table(values="value", index="hour", columns="weekday", aggfunc="mean").fillna(0)
+    heatmap_data = weekly.assign(hour=0).pivot_table(values="value", index="hour", columns="weekday", aggfunc="mean").fillna(0)
     fig_heat = go.Figure(go.Heatmap(
         z=heatmap_data.values,
         x=weekday_names_short,
@@ -647,6 +688,26 @@ with tab3:
         plot_bgcolor='rgba(0,0,0,0)'
     )
     st.plotly_chart(fig_heat, use_container_width=True)
+
+    # Totaux hebdomadaires / mensuels
+    period = st.radio("📆 Période", ["Semaine", "Mois"], horizontal=True)
+    totals_table = "counter_weekly_totals" if period == "Semaine" else "counter_monthly_totals"
+    totals = for_station(totals_table).groupby("period_start")["intensity_sum"].sum().reset_index()
+    fig_totals = go.Figure(go.Scatter(
+        x=totals["period_start"],
+        y=totals["intensity_sum"],
+        mode='lines',
+        line=dict(color='rgb(102, 126, 234)', width=2)
+    ))
+    fig_totals.update_layout(
+        title=f"Trafic total par {period.lower()}",
+        xaxis_title=period,
+        yaxis_title="Passages",
+        height=350,
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)'
+    )
+    st.plotly_chart(fig_totals, use_container_width=True)
     
     
 
@@ -654,8 +715,15 @@ with tab3:
 with tab4:
     st.markdown('<h2 class="section-header">💾 Export de Données</h2>', unsafe_allow_html=True)
     
-    export_station = st.selectbox("📍 Sélectionner un compteur", ["🌐 Tous"] + sorted(df["id"].unique()), key="export")
-    df_export = df if export_station == "🌐 Tous" else df[df["id"]==export_station]
+    export_station = st.selectbox("📍 Sélectionner un compteur", ["🌐 Tous"] + counter_ids, key="export")
+    # L'historique brut n'est lu qu'à la demande
+    if not st.checkbox("Charger les données brutes"):
+        st.stop()
+    with st.spinner(" Chargement des données..."):
+        df_export = load_data_from_supabase(counter_ids=None if export_station == "🌐 Tous" else [export_station])
+    if df_export.empty:
+        st.warning("Aucune donnée pour ce compteur")
+        st.stop()
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -0,0 +1,100 @@
+"""
+Compare the former groupby/apply implementation of DataTransformer.add_features with the
+single-pass feature engine, at several multiples of the current data size
+(about 60 counters x 4 years of daily values).
+
+    uv run benchmarks/bench_features.py --scales 1 10 100
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from data_transformer import DataTransformer  # noqa: E402
+
+COUNTERS = 60
+DAYS = 4 * 365
+
+
+def make_daily_df(counters: int, days: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    dates = pd.date_range("2022-01-01", periods=days, freq="D")
+    df = pd.DataFrame(
+        {
+            "counter_id": np.repeat(
+                [f"urn:ngsi-ld:EcoCounter:X2H{i:08d}" for i in range(counters)], days
+            ),
+            "date": np.tile(dates, counters),
+            "intensity": rng.integers(0, 3000, counters * days),
+        }
+    )
+    # counters with missing days, like the real data
+    return df.sample(frac=0.97, random_state=42).sort_index(ignore_index=True)
+
+
+def add_features_legacy(df: pd.DataFrame) -> pd.DataFrame:
+    df["year"] = df["date"].dt.year
+    df["month"] = df["date"].dt.month
+    df["day"] = df["date"].dt.day
+    df["weekday"] = df["date"].dt.day_of_week
+    df["rolling_7d"] = round(
+        df.groupby("counter_id")["intensity"]
+        .rolling(window=7, min_periods=1)
+        .mean()
+        .reset_index(level=0, drop=True),
+        2,
+    )
+    df["rolling_28d"] = round(
+        df.groupby("counter_id")["intensity"]
+        .rolling(28, min_periods=1)
+        .mean()
+        .reset_index(level=0, drop=True),
+        2,
+    )
+    df["lag_7d"] = df.groupby("counter_id")["intensity"].shift(7)
+    df["lag_7d"] = df["lag_7d"].fillna(df["rolling_7d"]).astype(int)
+    df["lag_28d"] = df.groupby("counter_id")["intensity"].shift(28)
+    df["lag_28d"] = df["lag_28d"].fillna(df["rolling_28d"]).astype(int)
+    df["is_weekend"] = df.apply(
+        lambda row: 1 if row["weekday"] in [5, 6] else 0, axis=1
+    )
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    _ = parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    _ = parser.add_argument(
+        "--legacy-max-rows",
+        type=int,
+        default=2_000_000,
+        help="skip the legacy implementation above this size (its row-wise apply needs several GB)",
+    )
+    args = parser.parse_args()
+
+    print(f"{'scale':>6}{'counter-days':>14}{'legacy (s)':>12}{'engine (s)':>12}")
+    for scale in args.scales:
+        df = make_daily_df(COUNTERS * scale, DAYS)
+
+        start = time.perf_counter()
+        engine = DataTransformer().load_historical_df(df.copy()).add_features().df
+        engine_time = time.perf_counter() - start
+
+        if len(df) <= args.legacy_max_rows:
+            start = time.perf_counter()
+            legacy = add_features_legacy(df.copy())
+            legacy_time = f"{time.perf_counter() - start:.2f}"
+            pd.testing.assert_frame_equal(legacy, engine)
+        else:
+            legacy_time = "-"
+        print(f"{scale:>6}{len(df):>14}{legacy_time:>12}{engine_time:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
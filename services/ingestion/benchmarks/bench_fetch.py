@@ -0,0 +1,110 @@
+"""
+Measure APIFetcher throughput and retry behaviour against the local mock APIs, and compare the
+multi-location weather requests with one request per location.
+
+    uv run benchmarks/bench_fetch.py --counters 50 --workers 8 --latency-ms 100 --error-rate 0.05
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from mock_server import MockAPI, MockServer  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    _ = parser.add_argument("--counters", type=int, default=20)
+    _ = parser.add_argument("--workers", type=int, default=8)
+    _ = parser.add_argument("--latency-ms", type=float, default=50)
+    _ = parser.add_argument("--jitter-ms", type=float, default=20)
+    _ = parser.add_argument("--error-rate", type=float, default=0)
+    _ = parser.add_argument(
+        "--rate-limit", type=int, default=0, help="mock server limit (requests/min)"
+    )
+    _ = parser.add_argument(
+        "--no-client-limit",
+        action="store_true",
+        help="disable the client-side Open-Meteo token buckets",
+    )
+    args = parser.parse_args()
+
+    server = MockServer(
+        MockAPI(
+            counters=args.counters,
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            rate_limit=args.rate_limit,
+        )
+    ).start()
+    for name in [
+        "ECOCOUNTER_API_URL",
+        "OPEN_METEO_ARCHIVE_URL",
+        "OPEN_METEO_FORECAST_URL",
+    ]:
+        os.environ[name] = server.url
+    os.environ["INGESTION_CACHE_DIR"] = tempfile.mkdtemp()
+    os.environ["INGESTION_WEATHER_STORE"] = str(
+        Path(tempfile.mkdtemp()) / "weather.sqlite"
+    )
+
+    # imported once the URLs point to the mock server
+    from api_fetcher import APIFetcher
+    from http_client import HTTPClient
+    from rate_limiter import open_meteo_limiter
+    from response_cache import ResponseCache
+    from weather_store import WeatherStore
+
+    if args.no_client_limit:
+        open_meteo_limiter.buckets = []
+
+    fetcher = APIFetcher(
+        HTTPClient(pool_size=args.workers, backoff_factor=0.1, cache=ResponseCache()),
+        max_workers=args.workers,
+    )
+    timings = {}
+    for step in ["fetch_counters", "fetch_historical_data", "fetch_weather_data"]:
+        requests_before = server.api.stats["requests"]
+        start = time.perf_counter()
+        _ = getattr(fetcher, step)()
+        timings[step] = (
+            time.perf_counter() - start,
+            server.api.stats["requests"] - requests_before,
+        )
+    batched_weather = fetcher.weather_data
+
+    # former behaviour: one weather request per location (the cache holds batched URLs only)
+    fetcher.weather_client.max_locations = 1
+    fetcher.weather_store = WeatherStore(Path(tempfile.mkdtemp()) / "weather.sqlite")
+    requests_before = server.api.stats["requests"]
+    start = time.perf_counter()
+    _ = fetcher.fetch_weather_data()
+    timings["fetch_weather_data (1 location/request)"] = (
+        time.perf_counter() - start,
+        server.api.stats["requests"] - requests_before,
+    )
+    pd.testing.assert_frame_equal(fetcher.weather_data, batched_weather)
+    server.stop()
+
+    stats = server.api.stats
+    print(
+        f"\n{stats['requests']} requests served, {stats['errors']} injected errors, "
+        + f"{stats['rate_limited']} rate limited"
+    )
+    print(
+        f"{len(fetcher.historical_data)} timeseries rows, {len(fetcher.weather_data)} weather days"
+    )
+    for step, (elapsed, requests) in timings.items():
+        print(f"{step:<42}{elapsed:>8.2f} s{requests:>8} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Compare the former forecast features of ForecastHandler (28 days of rows per counter, then a per-row apply
+filtering them for each feature) with the online feature view of common.features.store, loaded from its
+file then read with one lookup per counter, at several numbers of counters.
+The online vectors are checked against the training features of common.features.store.materialize:
+the rolling means of the last ingested day and the lags of the day after it.
+
+    uv run benchmarks/bench_forecast.py --counters 100 1000 5000 --legacy-max 1000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from bench_features import make_daily_df  # noqa: E402
+from common.features.engine import LAGS, ROLLING_WINDOWS  # noqa: E402  # pyright: ignore[reportMissingTypeStubs]
+from common.features.state import states_from_history  # noqa: E402  # pyright: ignore[reportMissingTypeStubs]
+from common.features.store import OnlineFeatureView, materialize  # noqa: E402  # pyright: ignore[reportMissingTypeStubs]
+
+DAYS = 60
+FEATURES = ["lag_7d", "lag_28d", "rolling_7d", "rolling_28d"]
+
+
+def forecast_features_legacy(counter_ids: list[str], history: pd.DataFrame):
+    today_ts = history["date"].max() + timedelta(1)
+    last_28_days_df = history[history["date"] > today_ts - timedelta(29)]
+    forecast_df = pd.DataFrame({"counter_id": counter_ids})
+
+    def get_lag_7d(row):
+        counter_data = last_28_days_df[
+            last_28_days_df["counter_id"] == row["counter_id"]
+        ]
+        for offset in [0, 7, 14, 21]:
+            target_date = today_ts - timedelta(days=7 + offset)
+            match = counter_data[counter_data["date"] == target_date]
+            if len(match) > 0:
+                return match.iloc[0]["intensity"]  # pyright: ignore[reportAttributeAccessIssue]
+        return np.nan
+
+    def get_lag_28d(row):
+        counter_data = last_28_days_df[
+            last_28_days_df["counter_id"] == row["counter_id"]
+        ]
+        for offset in [0, 7, 14, 21]:
+            target_date = today_ts - timedelta(days=28 - offset)
+            match = counter_data[counter_data["date"] == target_date]
+            if len(match) > 0:
+                return match.iloc[0]["intensity"]  # pyright: ignore[reportAttributeAccessIssue]
+        return np.nan
+
+    def get_rolling(row, window_days):
+        counter_data = last_28_days_df[
+            last_28_days_df["counter_id"] == row["counter_id"]
+        ]
+        if window_days == 7:
+            for offset in [0, 7, 14, 21]:
+                window_end = today_ts - timedelta(days=1 + offset)
+                window_start = window_end - timedelta(days=6)
+                window_data = counter_data[
+                    (counter_data["date"] >= window_start)
+                    & (counter_data["date"] <= window_end)
+                ]
+                if len(window_data) >= 4:
+                    return round(window_data["intensity"].mean(), 2)
+            return np.nan
+        else:
+            window_end = today_ts - timedelta(days=1)
+            window_start = window_end - timedelta(days=27)
+            window_data = counter_data[
+                (counter_data["date"] >= window_start)
+                & (counter_data["date"] <= window_end)
+            ]
+            if len(window_data) >= 14:
+                return round(window_data["intensity"].mean(), 2)
+            return np.nan
+
+    forecast_df["lag_7d"] = forecast_df.apply(lambda row: get_lag_7d(row), axis=1)
+    forecast_df["lag_28d"] = forecast_df.apply(lambda row: get_lag_28d(row), axis=1)
+    forecast_df["rolling_7d"] = forecast_df.apply(
+        lambda row: get_rolling(row, 7), axis=1
+    )
+    forecast_df["rolling_28d"] = forecast_df.apply(
+        lambda row: get_rolling(row, 28), axis=1
+    )
+    return forecast_df
+
+
+def forecast_features_online(counter_ids: list[str], path: Path) -> pd.DataFrame:
+    view = OnlineFeatureView.load(path)
+    return pd.DataFrame.from_records(
+        [view.get(counter_id) for counter_id in counter_ids], columns=FEATURES
+    )
+
+
+def check_training_parity(history: pd.DataFrame, online: pd.DataFrame):
+    """
+    The online vector of a counter holds the rolling means of its last ingested row and the lags
+    that the training features give to a row appended the day after.
+    """
+    next_day = (
+        history.groupby("counter_id", as_index=False)["date"]
+        .max()
+        .assign(date=lambda d: d["date"] + timedelta(1), intensity=0)
+    )
+    training = materialize(pd.concat([history, next_day], ignore_index=True))
+    training = training.sort_values(["counter_id", "date"])
+    last_rows = training.groupby("counter_id").nth(-2).set_index("counter_id")
+    next_rows = training.groupby("counter_id").nth(-1).set_index("counter_id")
+    online = online.set_index(next_rows.index)
+    for window in ROLLING_WINDOWS:
+        name = f"rolling_{window}d"
+        np.testing.assert_array_equal(online[name], last_rows[name])
+    for lag in LAGS:
+        name = f"lag_{lag}d"
+        np.testing.assert_array_equal(online[name], next_rows[name])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    _ = parser.add_argument(
+        "--counters", type=int, nargs="+", default=[100, 1000, 5000]
+    )
+    _ = parser.add_argument("--legacy-max", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(
+        f"{'counters':>10}{'legacy (s)':>12}{'online (s)':>12}{'lookup (us)':>13}{'speedup':>10}"
+    )
+    for counters in args.counters:
+        history = make_daily_df(counters, DAYS)
+        counter_ids = sorted(history["counter_id"].unique())
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "features.json"
+            _ = OnlineFeatureView(path).update(states_from_history(history)).save()
+
+            start = time.perf_counter()
+            online = forecast_features_online(counter_ids, path)
+            online_time = time.perf_counter() - start
+
+        view = OnlineFeatureView().update(states_from_history(history))
+        start = time.perf_counter()
+        for counter_id in counter_ids:
+            _ = view.get(counter_id)
+        lookup_time = (time.perf_counter() - start) / len(counter_ids) * 1e6
+
+        check_training_parity(history, online)
+        if counters > args.legacy_max:
+            print(
+                f"{counters:>10}{'-':>12}{online_time:>12.3f}{lookup_time:>13.2f}{'-':>10}"
+            )
+            continue
+        start = time.perf_counter()
+        _ = forecast_features_legacy(counter_ids, history)
+        legacy_time = time.perf_counter() - start
+        print(
+            f"{counters:>10}{legacy_time:>12.2f}{online_time:>12.3f}{lookup_time:>13.2f}{legacy_time / online_time:>10.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Read a whole table through common.database.reader against an in-process PostgREST-like table that
+caps its responses at 1000 rows and answers each request after a latency, and compare with the
+former single select("*") (first page only) and with a sequential keyset scan (one worker).
+
+    uv run benchmarks/bench_reader.py --counters 60 --days 1460 --latency-ms 80 --workers 8
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from bench_features import make_daily_df  # noqa: E402
+from common.database.reader import read_table  # noqa: E402  # pyright: ignore[reportMissingTypeStubs]
+from common.schema.schema import compact, to_records  # noqa: E402  # pyright: ignore[reportMissingTypeStubs]
+
+MAX_ROWS = 1000
+
+
+class PagedTable:
+    """
+    The select / eq / gt / order / limit subset of the postgrest client, over a list of records.
+    """
+
+    def __init__(self, records: list[dict], latency: float) -> None:
+        self.records = records
+        self.latency = latency
+        # the (counter_id, date) index of the real table
+        self.by_counter: dict[str, list[dict]] = {}
+        for record in records:
+            self.by_counter.setdefault(record["counter_id"], []).append(record)
+        self.requests = 0
+
+    def table(self, name: str):
+        return PagedQuery(self)
+
+
+class PagedQuery:
+    def __init__(self, table: PagedTable) -> None:
+        self.table = table
+        self.columns: list[str] | None = None
+        self.counter_id: str | None = None
+        self.filters = []
+        self.order_column: str | None = None
+        self.row_limit = MAX_ROWS
+
+    def select(self, columns: str):
+        self.columns = None if columns == "*" else columns.split(",")
+        return self
+
+    def eq(self, column: str, value):
+        if column == "counter_id":
+            self.counter_id = value
+        else:
+            self.filters.append(lambda r: r[column] == value)
+        return self
+
+    def gt(self, column: str, value):
+        self.filters.append(lambda r: r[column] > value)
+        return self
+
+    def order(self, column: str):
+        self.order_column = column
+        return self
+
+    def limit(self, n: int):
+        self.row_limit = min(n, MAX_ROWS)
+        return self
+
+    def execute(self):
+        time.sleep(self.table.latency)
+        self.table.requests += 1
+        if self.counter_id is not None:
+            rows = self.table.by_counter.get(self.counter_id, [])
+        elif self.columns == ["counter_id"]:
+            # index-only scan of the distinct counter ids
+            rows = [{"counter_id": c} for c in sorted(self.table.by_counter)]
+        else:
+            rows = self.table.records
+        rows = [r for r in rows if all(f(r) for f in self.filters)]
+        if self.order_column is not None:
+            rows.sort(key=lambda r: r[self.order_column])
+        rows = rows[: self.row_limit]
+        if self.columns is not None:
+            rows = [{c: r[c] for c in self.columns} for r in rows]
+        return type("Response", (), {"data": rows})()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    _ = parser.add_argument("--counters", type=int, default=60)
+    _ = parser.add_argument("--days", type=int, default=4 * 365)
+    _ = parser.add_argument("--latency-ms", type=float, default=80)
+    _ = parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    records = to_records(compact(make_daily_df(args.counters, args.days)))
+    expected = compact(pd.DataFrame(records)).sort_values(["counter_id", "date"])
+    expected = expected.reset_index(drop=True)
+    latency = args.latency_ms / 1000
+
+    client = PagedTable(records, latency)
+    single = client.table("historical_data").select("*").execute().data
+    print(f"single select: {len(single)}/{len(records)} rows")
+
+    print(f"{'workers':>8}{'requests':>10}{'time (s)':>10}")
+    for workers in dict.fromkeys([1, args.workers]):
+        client = PagedTable(records, latency)
+        start = time.perf_counter()
+        df = read_table(client, "historical_data", max_workers=workers)
+        elapsed = time.perf_counter() - start
+        pd.testing.assert_frame_equal(df, expected, check_categorical=False)
+        print(f"{workers:>8}{client.requests:>10}{elapsed:>10.2f}")
+
+    projected = read_table(
+        PagedTable(records, 0), "historical_data", columns=["date", "intensity"]
+    )
+    assert list(projected.columns) == ["date", "intensity"]
+    assert len(projected) == len(records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Report the memory used per million rows by the transformed daily data, column by column, in the
+shape it used to travel in (string ids and dates, coordinate tuples, int64 / float64) and in the
+compact shape of common.schema. Also check that the records sent to the database round-trip.
+
+    uv run benchmarks/bench_schema.py --counters 60 --days 1460
+"""
+
+import argparse
+import math
+
+import pandas as pd
+from bench_transformer import make_inputs, run_chain
+from common.schema.schema import (  # pyright: ignore[reportMissingTypeStubs]
+    COORDINATE_COLUMNS,
+    compact,
+    memory_per_million_rows,
+    to_records,
+)
+
+from data_transformer import DataTransformer
+
+
+def column_memory(df: pd.DataFrame) -> pd.Series:
+    return df.memory_usage(deep=True, index=False) / len(df) * 1_000_000 / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    _ = parser.add_argument("--counters", type=int, default=60)
+    _ = parser.add_argument("--days", type=int, default=4 * 365)
+    args = parser.parse_args()
+
+    wire, _ = run_chain(DataTransformer(), *make_inputs(args.counters, args.days, 1))
+    compact_df = compact(wire)
+
+    before = column_memory(wire)
+    after = column_memory(compact_df)
+    print(
+        f"{'column':<20}{'dtype':>10}{'MiB/M rows':>12}{'compact':>16}{'MiB/M rows':>12}"
+    )
+    for name in wire.columns:
+        compact_columns = COORDINATE_COLUMNS.get(name, (name,))
+        print(
+            f"{name:<20}{str(wire[name].dtype):>10}{before[name]:>12.1f}"
+            f"{'/'.join(str(compact_df[c].dtype) for c in compact_columns):>16}"
+            f"{sum(after[c] for c in compact_columns):>12.1f}"
+        )
+    print(
+        f"{'total':<20}{'':>10}{memory_per_million_rows(wire):>12.1f}"
+        f"{'':>16}{memory_per_million_rows(compact_df):>12.1f}"
+    )
+
+    # same records on the wire, coordinates within float32 resolution
+    for expected, record in zip(wire.to_dict(orient="records"), to_records(compact_df)):
+        for name, value in expected.items():
+            if name in COORDINATE_COLUMNS:
+                assert all(
+                    math.isclose(a, b, abs_tol=1e-5)
+                    for a, b in zip(value, record[name])
+                )
+            else:
+                assert value == record[name], (name, value, record[name])
+    print(f"{len(wire)} records round-trip")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Compare the former keep_top_counters scoring (groupby.agg with Python lambdas) with the vectorized
+scoring of counter_quality, and time a daily refresh from the running aggregates against a full
+rescan, at several multiples of the current data size (about 60 counters x 4 years of daily values).
+
+    uv run benchmarks/bench_scoring.py --scales 1 10 100
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from bench_features import COUNTERS, DAYS, make_daily_df
+
+from counter_quality import counter_aggregates, score_counters, update_aggregates
+
+
+def score_counters_legacy(df: pd.DataFrame) -> pd.DataFrame:
+    total_days = df["date"].nunique()
+    quality_df = (
+        df.groupby("counter_id")
+        .agg(
+            days_present=("date", "nunique"),
+            missing_days=("date", lambda x: total_days - x.nunique()),
+            zero_ratio=("intensity", lambda x: (x == 0).mean()),
+            std_intensity=("intensity", "std"),
+        )
+        .reset_index()
+    )
+    quality_df["std_capped"] = quality_df["std_intensity"].clip(
+        upper=quality_df["std_intensity"].quantile(0.95)
+    )
+    quality_df["score"] = (
+        (quality_df["days_present"] / total_days) * 0.5
+        + (1 - quality_df["zero_ratio"]) * 0.2
+        + (1 - quality_df["std_capped"] / quality_df["std_capped"].max()) * 0.3
+    )
+    return quality_df.sort_values("score", ascending=False, kind="stable")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    _ = parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    print(
+        f"{'scale':>6}{'counter-days':>14}{'legacy (s)':>12}{'vectorized (s)':>16}{'daily refresh (s)':>19}"
+    )
+    for scale in args.scales:
+        df = make_daily_df(COUNTERS * scale, DAYS)
+        # every counter reports the last day, which comes in as the daily refresh
+        df["intensity"] = df["intensity"].where(df.index % 11 != 0, 0)
+        last_day = df["date"].max()
+        history, new_day = df[df["date"] < last_day], df[df["date"] == last_day]
+
+        start = time.perf_counter()
+        legacy = score_counters_legacy(df)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scores = score_counters(counter_aggregates(df))
+        vectorized_time = time.perf_counter() - start
+
+        aggregates = counter_aggregates(history)
+        start = time.perf_counter()
+        refreshed = score_counters(update_aggregates(aggregates, new_day))
+        refresh_time = time.perf_counter() - start
+
+        expected = legacy.set_index("counter_id")["score"]
+        np.testing.assert_allclose(
+            scores.set_index("counter_id")["score"].loc[expected.index],
+            expected,
+            rtol=1e-12,
+        )
+        pd.testing.assert_frame_equal(refreshed, scores)
+        assert (
+            scores["counter_id"].head(10).tolist()
+            == legacy["counter_id"].head(10).tolist()
+        )
+        print(
+            f"{scale:>6}{len(df):>14}{legacy_time:>12.2f}{vectorized_time:>16.3f}{refresh_time:>19.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
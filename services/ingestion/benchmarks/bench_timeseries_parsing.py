@@ -0,0 +1,90 @@
+"""
+Compare the former per-response DataFrame + concat parsing of ecocounter timeseries
+with TimeseriesBuilder, on synthetic hourly responses.
+
+    uv run benchmarks/bench_timeseries_parsing.py --counters 100 --years 4
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from timeseries_builder import TimeseriesBuilder  # noqa: E402
+
+
+def make_responses(counters: int, years: int) -> list[dict]:
+    rng = np.random.default_rng(42)
+    responses = []
+    for counter in range(counters):
+        for year in range(2022, 2022 + years):
+            index = pd.date_range(f"{year}-01-01", f"{year}-12-31 23:00", freq="h")
+            responses.append(
+                {
+                    "entityId": f"urn:ngsi-ld:EcoCounter:X2H{counter:08d}",
+                    "index": index.strftime("%Y-%m-%dT%H:%M:%S.000Z").tolist(),
+                    "values": rng.integers(0, 500, len(index)).tolist(),
+                }
+            )
+    return responses
+
+
+def parse_with_concat(responses: list[dict]) -> pd.DataFrame:
+    id = [item.get("entityId", {}) for item in responses]
+    datetime = [item.get("index") for item in responses]
+    intensity = [item.get("values") for item in responses]
+
+    dfs = []
+    for i in range(len(id)):
+        temp_df = pd.DataFrame(
+            {"id": id[i], "datetime": datetime[i], "intensity": intensity[i]}
+        )
+        if not temp_df.empty:
+            dfs.append(temp_df)
+    return pd.concat(dfs, ignore_index=True)
+
+
+def parse_with_builder(responses: list[dict]) -> pd.DataFrame:
+    builder = TimeseriesBuilder()
+    for response in responses:
+        _ = builder.append(response)
+    return builder.build()
+
+
+def measure(parse, responses):
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = parse(responses)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    _ = parser.add_argument("--counters", type=int, default=100)
+    _ = parser.add_argument("--years", type=int, default=4)
+    args = parser.parse_args()
+
+    responses = make_responses(args.counters, args.years)
+    rows = sum(len(response["index"]) for response in responses)
+    print(f"{len(responses)} responses, {rows} rows")
+
+    before, before_time, before_peak = measure(parse_with_concat, responses)
+    after, after_time, after_peak = measure(parse_with_builder, responses)
+    pd.testing.assert_frame_equal(before, after)
+
+    print(f"{'':<10}{'time (s)':>12}{'peak (MiB)':>14}")
+    print(f"{'concat':<10}{before_time:>12.2f}{before_peak / 2**20:>14.1f}")
+    print(f"{'builder':<10}{after_time:>12.2f}{after_peak / 2**20:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compare the run time of the pandas DataTransformer and of the Polars lazy engine
+(polars_transformer.LazyDataTransformer) for the backfill chain, at several multiples of the
+current data size (about 60 counters x 4 years of hourly values).
+Both engines must return the same frames, see tests/test_transformer_parity.py.
+
+    uv run --extra polars benchmarks/bench_transformer.py --scales 1 2 4
+
+The synthetic input covers the cases the chain has to handle: duplicated timestamps, missing
+hours and days, zero counts and days without weather.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from data_transformer import DataTransformer  # noqa: E402
+
+COUNTERS = 60
+DAYS = 4 * 365
+
+
+def make_inputs(counters: int, days: int, hours_per_day: int = 24):
+    rng = np.random.default_rng(42)
+    ids = [f"urn:ngsi-ld:EcoCounter:X2H{i:08d}" for i in range(counters)]
+    coordinates = [
+        (
+            float(round(43.61 + rng.uniform(-0.05, 0.05), 6)),
+            float(round(3.88 + rng.uniform(-0.05, 0.05), 6)),
+        )
+        for _ in ids
+    ]
+    counters_df = pd.DataFrame(
+        {
+            "id": ids,
+            "coordinates": coordinates,
+            "rounded_coordinates": [(round(x, 2), round(y, 2)) for x, y in coordinates],
+        }
+    )
+
+    timestamps = pd.date_range(
+        "2022-01-01", periods=days * hours_per_day, freq=f"{24 // hours_per_day}h"
+    )
+    n = counters * len(timestamps)
+    stamps = np.tile(timestamps.strftime("%Y-%m-%dT%H:%M:%S.000Z").to_numpy(), counters)
+    historical_data = pd.DataFrame(
+        {
+            "id": np.repeat(ids, len(timestamps)),
+            "datetime": stamps,
+            "intensity": rng.integers(0, 150, n) * (rng.random(n) > 0.05),
+        }
+    )
+    # missing hours and days, then duplicated rows
+    historical_data = historical_data.sample(frac=0.97, random_state=42).sort_index()
+    historical_data = pd.concat(
+        [historical_data, historical_data.sample(frac=0.01, random_state=43)]
+    ).reset_index(drop=True)
+
+    locations = list(dict.fromkeys(counters_df["rounded_coordinates"]))
+    weather_days = pd.date_range("2022-01-01", periods=days, freq="D")
+    weather_data = pd.DataFrame(
+        {
+            "rounded_latitude": np.repeat([x for x, _ in locations], days),
+            "rounded_longitude": np.repeat([y for _, y in locations], days),
+            "date": np.tile(weather_days, len(locations)),
+            "temperature": rng.normal(15, 8, len(locations) * days).astype(np.float32),
+            "rain": (
+                rng.exponential(2, len(locations) * days)
+                * (rng.random(len(locations) * days) < 0.3)
+            ).astype(np.float32),
+        }
+    )
+    weather_data = weather_data.sample(frac=0.98, random_state=44).sort_index(
+        ignore_index=True
+    )
+    return historical_data, counters_df, weather_data
+
+
+def run_chain(transformer, historical_data, counters_df, weather_data):
+    transformer = (
+        transformer.load_historical_df(historical_data.copy())
+        .load_counters_df(counters_df)
+        .add_coordinates()
+        .apply_basic_transformations()
+        .convert_to_daily_values()
+        .add_features()
+        .load_weather_df(weather_data)
+        .add_weather()
+        .clean()
+        .keep_top_counters()
+        .convert_date_to_string()
+    )
+    return transformer.df, transformer.best_counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    _ = parser.add_argument("--scales", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    from polars_transformer import LazyDataTransformer
+
+    print(f"{'scale':>6}{'input rows':>12}{'pandas (s)':>12}{'polars (s)':>12}")
+    for scale in args.scales:
+        inputs = make_inputs(COUNTERS * scale, DAYS)
+
+        start = time.perf_counter()
+        _ = run_chain(DataTransformer(), *inputs)
+        pandas_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _ = run_chain(LazyDataTransformer(), *inputs)
+        polars_time = time.perf_counter() - start
+
+        print(f"{scale:>6}{len(inputs[0]):>12}{pandas_time:>12.2f}{polars_time:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Compare the former sequential insert by batches of 5000 rows with the BulkWriter upsert, against an
+in-process table that answers each request after a fixed latency plus a time per row, fails a share of
+the requests and keeps one row per (counter_id, date). Also check that an interrupted load resumes
+from its checkpoint and that loading the same records twice leaves the table unchanged.
+
+    uv run benchmarks/bench_upsert.py --counters 60 --days 1460 --latency-ms 150 --error-rate 0.05
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from bench_features import make_daily_df  # noqa: E402
+from common.schema.schema import compact, to_records  # noqa: E402  # pyright: ignore[reportMissingTypeStubs]
+
+
+class SlowTable:
+    """
+    Upsert requests of a postgrest-like client, served with a latency and a random failure rate.
+    """
+
+    def __init__(self, latency: float, row_time: float, error_rate: float) -> None:
+        self.latency = latency
+        self.row_time = row_time
+        self.error_rate = error_rate
+        self.rows: dict[tuple, dict] = {}
+        self.requests = 0
+        self.fail_after: int | None = None
+        self.lock = threading.Lock()
+        self.random = random.Random(42)
+
+    def table(self, name: str):
+        return self
+
+    def insert(self, records):
+        return self.upsert(records)
+
+    def upsert(self, records, on_conflict: str = "counter_id,date"):
+        return SlowRequest(self, records)
+
+
+class SlowRequest:
+    def __init__(self, table: SlowTable, records) -> None:
+        self.table = table
+        self.records = records
+
+    def execute(self):
+        table = self.table
+        time.sleep(table.latency + table.row_time * len(self.records))
+        with table.lock:
+            table.requests += 1
+            if table.fail_after is not None and table.requests > table.fail_after:
+                raise ConnectionError("connection lost")
+            if table.random.random() < table.error_rate:
+                raise ConnectionError("503 Service Unavailable")
+            for record in self.records:
+                table.rows[(record["counter_id"], record["date"])] = record
+
+
+def sequential_insert(client, records, batch_size=5000):
+    for i in range(0, len(records), batch_size):
+        _ = (
+            client.table("historical_data")
+            .insert(records[i : i + batch_size])
+            .execute()
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    _ = parser.add_argument("--counters", type=int, default=60)
+    _ = parser.add_argument("--days", type=int, default=4 * 365)
+    _ = parser.add_argument("--latency-ms", type=float, default=150)
+    _ = parser.add_argument("--row-us", type=float, default=40)
+    _ = parser.add_argument("--error-rate", type=float, default=0.05)
+    _ = parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    os.environ.setdefault("INGESTION_CHECKPOINT_DIR", tempfile.mkdtemp())
+    from bulk_writer import BulkWriter
+    from checkpoint import BackfillCheckpoint
+
+    records = to_records(compact(make_daily_df(args.counters, args.days)))
+    latency, row_time = args.latency_ms / 1000, args.row_us / 1_000_000
+
+    def writer(client):
+        return BulkWriter(
+            client,
+            "historical_data",
+            on_conflict="counter_id,date",
+            max_workers=args.workers,
+            backoff_factor=0.1,
+        )
+
+    table = SlowTable(latency, row_time, error_rate=0)
+    start = time.perf_counter()
+    sequential_insert(table, records)
+    sequential_time = time.perf_counter() - start
+
+    table = SlowTable(latency, row_time, args.error_rate)
+    start = time.perf_counter()
+    _ = writer(table).write(records)
+    bulk_time = time.perf_counter() - start
+    assert len(table.rows) == len(records)
+
+    # interrupted after a few requests, then resumed from the checkpoint
+    checkpoint = BackfillCheckpoint(Path(tempfile.mkdtemp()))
+    resumed = SlowTable(latency, row_time, error_rate=0)
+    resumed.fail_after = 3
+    try:
+        _ = writer(resumed).write(records, checkpoint=checkpoint)
+    except ConnectionError:
+        pass
+    interrupted_rows = len(resumed.rows)
+    assert 0 < interrupted_rows < len(records)
+    resumed.fail_after = None
+    _ = writer(resumed).write(records, checkpoint=checkpoint)
+    assert resumed.rows == table.rows
+
+    # a second full load changes nothing
+    snapshot = dict(table.rows)
+    _ = writer(table).write(records)
+    assert table.rows == snapshot
+
+    print(f"{'rows':>10}{'sequential (s)':>16}{'bulk (s)':>10}{'rows/s':>10}")
+    print(
+        f"{len(records):>10}{sequential_time:>16.2f}{bulk_time:>10.2f}{len(records) / bulk_time:>10.0f}"
+    )
+    print(
+        f"resumed after {interrupted_rows} rows, re-run idempotent ({len(table.rows)} rows)"
+    )
+
+
+if __name__ == "__main__":
+    main()
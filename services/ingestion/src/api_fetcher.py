@@ -1,24 +1,107 @@
-import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
 
+import numpy as np
 import pandas as pd
 import requests
 
+from checkpoint import BackfillCheckpoint
+from config import (
+    ARCHIVE_DELAY_DAYS,
+    ECOCOUNTER_API_URL,
+    HISTORY_YEARS,
+    MAX_WORKERS,
+    OPEN_METEO_ARCHIVE_URL,
+)
+from http_client import HTTPClient
+from timeseries_builder import TimeseriesBuilder
+from weather_client import WeatherClient
+from weather_store import WeatherStore
+
+
+def split_by_year(start_date: date, end_date: date) -> list[tuple[date, date]]:
+    """
+    Split [start_date, end_date] into consecutive ranges that never overlap two calendar years.
+    """
+    chunks = []
+    while start_date <= end_date:
+        chunk_end = min(date(start_date.year, 12, 31), end_date)
+        chunks.append((start_date, chunk_end))
+        start_date = chunk_end + timedelta(1)
+    return chunks
+
+
+def concatenate_hourly(hourly: list[dict], key: str, dtype) -> np.ndarray:
+    """
+    One variable of consecutive 'hourly' blocks of Open-Meteo responses as a single array.
+    """
+    return np.concatenate(
+        [np.array([], dtype=dtype)]
+        + [np.asarray(h.get(key, []), dtype=dtype) for h in hourly]
+    )
+
+
+def aggregate_daily_weather(
+    time: np.ndarray, temperature: np.ndarray, rain: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reduce a sorted hourly series to daily values (UTC days): mean temperature and total rain.
+    Missing hours are ignored; a day without any temperature gets NaN.
+    """
+    day = time.astype("datetime64[D]")
+    if len(day) == 0:
+        return day, temperature, rain
+    starts = np.concatenate([[0], np.flatnonzero(day[1:] != day[:-1]) + 1])
+    has_temperature = ~np.isnan(temperature)
+    temperature_sum = np.add.reduceat(
+        np.where(has_temperature, temperature, 0), starts, dtype=np.float64
+    )
+    temperature_count = np.add.reduceat(has_temperature, starts, dtype=np.int64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        daily_temperature = (temperature_sum / temperature_count).astype(np.float32)
+    daily_rain = np.add.reduceat(np.nan_to_num(rain), starts, dtype=np.float64)
+    return day[starts], daily_temperature, daily_rain.astype(np.float32)
+
 
 class APIFetcher:
-    def __init__(self):
+    def __init__(
+        self,
+        http_client: HTTPClient | None = None,
+        max_workers: int = MAX_WORKERS,
+        weather_store: WeatherStore | None = None,
+    ):
+        self.http_client = http_client or HTTPClient(pool_size=max_workers)
+        self.weather_client = WeatherClient(self.http_client)
+        self.weather_store = weather_store or WeatherStore()
+        self.max_workers = max_workers
+        self.checkpoint: BackfillCheckpoint | None = None
         self.counters_df: pd.DataFrame = pd.DataFrame()
         self.historical_data: pd.DataFrame = pd.DataFrame()
         self.new_historical_data: pd.DataFrame = pd.DataFrame()
+        self.new_historical_start: date = date.today()
+        self.failed_counters: list[str] = []
         self.weather_data: pd.DataFrame = pd.DataFrame()
 
+    def _get_chunk(self, key: str, url: str, **kwargs):
+        """
+        Fetch one unit of the backfill, or reuse it from the checkpoint when one is set.
+        HTTP errors are raised: the unit is not saved, and a resumed backfill fetches it again.
+        """
+        if self.checkpoint is not None:
+            body = self.checkpoint.load_chunk(key)
+            if body is not None:
+                return body
+        body = self.http_client.get_json(url, **kwargs)
+        if self.checkpoint is not None:
+            self.checkpoint.save_chunk(key, body)
+        return body
+
     def fetch_counters(self):
         """
         Fetch all the available counters and store their ids and coordinates in a dataframe
         """
-        url = "https://portail-api-data.montpellier3m.fr/ecocounter?limit=1000"
-        response = requests.get(url)
-        self.counters_df = pd.json_normalize(response.json())
+        url = f"{ECOCOUNTER_API_URL}/ecocounter?limit=1000"
+        self.counters_df = pd.json_normalize(self._get_chunk("counters", url))
         self.counters_df = self.counters_df[["id", "location.value.coordinates"]]  # pyright: ignore[reportAttributeAccessIssue]
         self.counters_df = self.counters_df.rename(
             columns={"location.value.coordinates": "coordinates"}
@@ -35,158 +118,174 @@ class APIFetcher:
         """
         Fetch historical data for every year since made available and for every counter
         """
-        years = ["2022", "2023", "2024", "2025"]
-        response_data = []
+        units = [(id, year) for id in self.counters_df["id"] for year in HISTORY_YEARS]
 
-        loop = 0
-        for id in self.counters_df["id"]:
-            for year in years:
-                print(f"\nLOOP {loop}")
-                loop += 1
-                from_date = f"{year}-01-01"
-                to_date = f"{year}-12-31"
-                print(f"Fetching the year {year} for counter {id}...")
-                response = requests.get(
-                    f"https://portail-api-data.montpellier3m.fr/ecocounter_timeseries/{id}/attrs/intensity?fromDate={from_date}T00%3A00%3A00&toDate={to_date}T00%3A00%3A00"
-                )
-                response_data.append(response.json())
-
-        id = [item.get("entityId", {}) for item in response_data]
-        datetime = [item.get("index") for item in response_data]
-        intensity = [item.get("values") for item in response_data]
-
-        dfs = []
-
-        for i in range(len(id)):
-            temp_df = pd.DataFrame(
-                {
-                    "id": id[i],
-                    "datetime": datetime[i],
-                    "intensity": intensity[i],
-                }
+        def fetch(unit):
+            id, year = unit
+            from_date = f"{year}-01-01"
+            to_date = f"{year}-12-31"
+            print(f"Fetching the year {year} for counter {id}...")
+            return self._get_chunk(
+                f"timeseries/{id}/{year}",
+                f"{ECOCOUNTER_API_URL}/ecocounter_timeseries/{id}/attrs/intensity?fromDate={from_date}T00%3A00%3A00&toDate={to_date}T00%3A00%3A00",
+                immutable=date.fromisoformat(to_date) < date.today(),
             )
-            if not temp_df.empty:
-                dfs.append(temp_df)
 
-        self.historical_data = pd.concat(dfs, ignore_index=True)
+        # map() keeps the (counter, year) order so the resulting dataframe is the same as a sequential fetch
+        builder = TimeseriesBuilder()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for response in executor.map(fetch, units):
+                _ = builder.append(response)
+
+        self.historical_data = builder.build()
         return self
 
-    def fetch_new_historical_data(self):
+    def fetch_new_historical_data(self, watermarks: dict[str, str] | None = None):
         """
-        Fetch yesterday's historical data
+        Fetch the data published since the last ingested day of every counter.
+        Counters without a watermark are fetched from the beginning of the history.
+        The first day requested is kept in 'new_historical_start', for the weather of the same days.
+        Counters whose request fails are skipped and listed in 'failed_counters'.
         """
         today = date.today()
-        last_date_in_db = "2025-11-30"  # temporaire
-
-        response_data = []
+        watermarks = watermarks or {}
+        first_day = date.fromisoformat(f"{HISTORY_YEARS[0]}-01-01")
 
+        units = []
         for id in self.counters_df["id"]:
-            response = requests.get(
-                f"https://portail-api-data.montpellier3m.fr/ecocounter_timeseries/{id}/attrs/intensity?fromDate={str(last_date_in_db)}T00%3A00%3A00&toDate={str(today)}T00%3A00%3A00"
-            )
-            print(response.json())
-            response_data.append(response.json())
-
-        id = [item.get("entityId", {}) for item in response_data]
-        datetime = [item.get("index") for item in response_data]
-        intensity = [item.get("values") for item in response_data]
-
-        dfs = []
-
-        for i in range(len(id)):
-            temp_df = pd.DataFrame(
-                {
-                    "id": id[i],
-                    "datetime": datetime[i],
-                    "intensity": intensity[i],
-                }
-            )
-            if not temp_df.empty:
-                dfs.append(temp_df)
+            if id in watermarks:
+                from_date = date.fromisoformat(str(watermarks[id])[:10]) + timedelta(1)
+            else:
+                from_date = first_day
+            if from_date < today:
+                units.append((id, from_date))
+        self.new_historical_start = min(
+            (from_date for _, from_date in units), default=today
+        )
+
+        failed_counters = []
+
+        def fetch(unit):
+            id, from_date = unit
+            print(f"Fetching counter {id} from {from_date}...")
+            try:
+                return self.http_client.get_json(
+                    f"{ECOCOUNTER_API_URL}/ecocounter_timeseries/{id}/attrs/intensity?fromDate={str(from_date)}T00%3A00%3A00&toDate={str(today)}T00%3A00%3A00"
+                )
+            except requests.HTTPError as e:
+                print(f"Failed to fetch counter {id}: {e}")
+                failed_counters.append(id)
+                return {}
 
-        self.new_historical_data = pd.concat(dfs, ignore_index=True)
+        builder = TimeseriesBuilder()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for response in executor.map(fetch, units):
+                _ = builder.append(response)
+
+        self.new_historical_data = builder.build()
+        self.failed_counters: list[str] = failed_counters
         return self
 
-    def fetch_weather_data(self):
+    def fetch_weather_data(self, start_date: str = f"{HISTORY_YEARS[0]}-01-01"):
         """
-        Fetch hourly weather data for every counter's location
+        Fetch hourly weather data for every counter's location and reduce it to daily values.
+        The date range is split into yearly chunks; the locations of a chunk are packed into multi-location
+        requests (see WeatherClient), fetched concurrently within the Open-Meteo rate limit.
+        Days already in the weather store are not fetched again and fetched days are added to it;
+        the daily values are then read from the store.
+        With a checkpoint, the response of each location is kept so that a resumed backfill skips it.
         """
-        start_date = "2022-01-01"
         end_date = date.today() - timedelta(1)
+        locations = list(dict.fromkeys(self.counters_df["rounded_coordinates"]))
+        chunks = split_by_year(date.fromisoformat(start_date), end_date)
 
-        response_data = []
-        known_coordinates = []
+        def key(location, chunk):
+            return f"weather/{location[0]}_{location[1]}/{chunk[0]}_{chunk[1]}"
 
-        loop = 0
-        max_calls_per_minute = 25
-        call_count = 0
-        start_time = time.time()
+        def url(chunk):
+            return f"{OPEN_METEO_ARCHIVE_URL}/v1/archive?start_date={chunk[0]}&end_date={chunk[1]}&hourly=temperature_2m,rain&timeformat=unixtime"
 
-        for id in self.counters_df["id"]:
-            print(f"\nLOOP {loop}")
-            latitude, longitude = self.counters_df.loc[
-                self.counters_df["id"] == id, "rounded_coordinates"
-            ].values[0]
-
-            if [latitude, longitude] not in known_coordinates:
-                known_coordinates.append([latitude, longitude])
-
-                if call_count >= max_calls_per_minute:
-                    elapsed = time.time() - start_time
-                    if elapsed < 60:
-                        sleep_time = 60 - elapsed
-                        print(f" Pausing for {int(sleep_time)} seconds (API limit)")
-                        time.sleep(sleep_time)
-                    call_count = 0
-                    start_time = time.time()
-
-                print(
-                    f"API CALL ({call_count}) FOR {id} LOCATED AT ({latitude}, {longitude})"
-                )
-                response = requests.get(
-                    f"https://archive-api.open-meteo.com/v1/archive?latitude={latitude}&longitude={longitude}&start_date={start_date}&end_date={end_date}&hourly=temperature_2m,rain"
-                )
-                print(f"{response.json()}"[:500])
-                response_data.append(
-                    {
-                        "rounded_coordinates": (latitude, longitude),
-                        "response": response.json(),
-                    }
+        responses = {}
+        units = []
+        for chunk in chunks:
+            stored = self.weather_store.covered(locations, *chunk, archive_only=True)
+            pending = []
+            for location in locations:
+                if location in stored:
+                    continue
+                body = (
+                    self.checkpoint.load_chunk(key(location, chunk))
+                    if self.checkpoint is not None
+                    else None
                 )
-                call_count += 1
-            else:
-                print("Coordinates have already been covered")
-            loop += 1
-
-        rounded_coordinates = [
-            item.get("rounded_coordinates", {}) for item in response_data
-        ]
-        datetime = [
-            item.get("response", {}).get("hourly", {}).get("time", {})
-            for item in response_data
-        ]
-        temperature = [
-            item.get("response", {}).get("hourly", {}).get("temperature_2m", {})
-            for item in response_data
-        ]
-        rain = [
-            item.get("response", {}).get("hourly", {}).get("rain", {})
-            for item in response_data
-        ]
-
-        self.weather_data = pd.DataFrame(
-            {
-                "rounded_coordinates": rounded_coordinates,
-                "datetime": datetime,
-                "temperature": temperature,
-                "rain": rain,
-            }
-        )
-        self.weather_data = self.weather_data.explode(
-            ["datetime", "temperature", "rain"], ignore_index=True
+                if body is None:
+                    pending.append(location)
+                else:
+                    responses[location, chunk] = body
+            days = (chunk[1] - chunk[0]).days + 1
+            units += [
+                (batch, chunk)
+                for batch in self.weather_client.batches(url(chunk), pending, days, 2)
+            ]
+
+        def fetch(unit):
+            batch, (chunk_start, chunk_end) = unit
+            print(
+                f"API CALL FOR {len(batch)} LOCATIONS FROM {chunk_start} TO {chunk_end}"
+            )
+            bodies = self.weather_client.get(
+                url((chunk_start, chunk_end)),
+                batch,
+                (chunk_end - chunk_start).days + 1,
+                2,
+                immutable=chunk_end < date.today() - timedelta(ARCHIVE_DELAY_DAYS),
+            )
+            if self.checkpoint is not None:
+                for location, body in zip(batch, bodies):
+                    if not body.get("error"):
+                        self.checkpoint.save_chunk(
+                            key(location, (chunk_start, chunk_end)), body
+                        )
+            return bodies
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for (batch, chunk), bodies in zip(units, executor.map(fetch, units)):
+                for location, body in zip(batch, bodies):
+                    responses[location, chunk] = body
+
+        # merge the fetched yearly chunks of each location back into a single hourly series, then into daily values
+        columns = {
+            "rounded_latitude": [np.array([], dtype=np.float64)],
+            "rounded_longitude": [np.array([], dtype=np.float64)],
+            "date": [np.array([], dtype="datetime64[ns]")],
+            "temperature": [np.array([], dtype=np.float32)],
+            "rain": [np.array([], dtype=np.float32)],
+        }
+        for latitude, longitude in locations:
+            hourly = [
+                responses[(latitude, longitude), chunk].get("hourly", {})
+                for chunk in chunks
+                if ((latitude, longitude), chunk) in responses
+            ]
+            day, temperature, rain = aggregate_daily_weather(
+                concatenate_hourly(hourly, "time", "datetime64[s]"),
+                concatenate_hourly(hourly, "temperature_2m", np.float32),
+                concatenate_hourly(hourly, "rain", np.float32),
+            )
+            columns["rounded_latitude"].append(np.full(len(day), latitude))
+            columns["rounded_longitude"].append(np.full(len(day), longitude))
+            columns["date"].append(day.astype("datetime64[ns]"))
+            columns["temperature"].append(temperature)
+            columns["rain"].append(rain)
+
+        self.weather_store.put(
+            pd.DataFrame(
+                {name: np.concatenate(arrays) for name, arrays in columns.items()}
+            ),
+            "archive",
         )
-        self.weather_data["datetime"] = pd.to_datetime(
-            self.weather_data["datetime"], utc=True
+        self.weather_data = self.weather_store.get(
+            locations, date.fromisoformat(start_date), end_date
         )
         print(self.weather_data)
         return self
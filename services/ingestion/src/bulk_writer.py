@@ -0,0 +1,164 @@
+import json
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import final
+
+from checkpoint import BackfillCheckpoint
+from config import (
+    DB_BACKOFF_FACTOR,
+    DB_BATCH_SIZE,
+    DB_MAX_BATCH_SIZE,
+    DB_MAX_RETRIES,
+    DB_MAX_WORKERS,
+    DB_MIN_BATCH_SIZE,
+    DB_TARGET_BATCH_BYTES,
+    DB_TARGET_BATCH_SECONDS,
+)
+
+
+@final
+class BulkWriter:
+    """
+    Upsert records into a table by batches sent concurrently from a bounded pool of workers.
+
+    Rows are upserted on their conflict key, so writing the same records twice leaves the table unchanged.
+    The batch size is first capped so that a request stays under DB_TARGET_BATCH_BYTES, then follows the
+    latency of the completed batches: halved when a batch takes longer than DB_TARGET_BATCH_SECONDS or fails,
+    increased by half when it takes less than half of it. A failed batch is retried with exponential backoff.
+    With a checkpoint, the row ranges already written by an interrupted run are skipped.
+    """
+
+    def __init__(
+        self,
+        client,
+        table: str,
+        on_conflict: str,
+        max_workers: int = DB_MAX_WORKERS,
+        max_retries: int = DB_MAX_RETRIES,
+        backoff_factor: float = DB_BACKOFF_FACTOR,
+        batch_size: int = DB_BATCH_SIZE,
+        min_batch_size: int = DB_MIN_BATCH_SIZE,
+        max_batch_size: int = DB_MAX_BATCH_SIZE,
+        target_batch_bytes: int = DB_TARGET_BATCH_BYTES,
+        target_batch_seconds: float = DB_TARGET_BATCH_SECONDS,
+    ) -> None:
+        self.client = client
+        self.table = table
+        self.on_conflict = on_conflict
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.batch_size = batch_size
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.target_batch_bytes = target_batch_bytes
+        self.target_batch_seconds = target_batch_seconds
+        self.lock = threading.Lock()
+
+    def write(self, records: list[dict], checkpoint: BackfillCheckpoint | None = None):
+        """
+        Upsert all the records and return the number of rows per second.
+        Raise the error of the first batch that still fails after its retries, once the batches in flight are done.
+        """
+        step_prefix = f"upsert/{self.table}/"
+        pending = self._pending_ranges(len(records), checkpoint, step_prefix)
+        total = sum(end - start for start, end in pending)
+        if total == 0:
+            return 0.0
+        self._cap_batch_size(records)
+
+        written = 0
+        error = None
+        started = time.perf_counter()
+        in_flight: dict[Future, tuple[int, int]] = {}
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            while (pending and error is None) or in_flight:
+                while pending and error is None and len(in_flight) < self.max_workers:
+                    start, end = pending[0]
+                    batch_end = min(start + self.batch_size, end)
+                    if batch_end == end:
+                        _ = pending.pop(0)
+                    else:
+                        pending[0] = (batch_end, end)
+                    future = executor.submit(self._send, records[start:batch_end])
+                    in_flight[future] = (start, batch_end)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start, end = in_flight.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        error = error or e
+                        continue
+                    written += end - start
+                    if checkpoint is not None:
+                        checkpoint.mark_done(f"{step_prefix}{start}-{end}")
+                    sys.stdout.write(f"\rUpserting... : {written}/{total}")
+                    sys.stdout.flush()
+        sys.stdout.write("\n")
+        if error is not None:
+            raise error
+        return written / (time.perf_counter() - started)
+
+    def _send(self, batch: list[dict]):
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                _ = (
+                    self.client.table(self.table)
+                    .upsert(batch, on_conflict=self.on_conflict)
+                    .execute()
+                )
+            except Exception as e:
+                self._adapt(None)
+                if attempt == self.max_retries:
+                    raise
+                print(f"\nBatch of {len(batch)} rows failed ({e}), retrying...")
+                time.sleep(self.backoff_factor * 2**attempt)
+                continue
+            self._adapt(time.perf_counter() - started)
+            return
+
+    def _adapt(self, duration: float | None):
+        """
+        Adjust the size of the next batches to the duration of the last one (None if it failed).
+        """
+        with self.lock:
+            if duration is None or duration > self.target_batch_seconds:
+                self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            elif duration < self.target_batch_seconds / 2:
+                self.batch_size = min(self.max_batch_size, self.batch_size * 3 // 2)
+
+    def _cap_batch_size(self, records: list[dict]):
+        sample = records[:100]
+        row_bytes = len(json.dumps(sample, default=str)) / len(sample)
+        self.batch_size = max(
+            self.min_batch_size,
+            min(self.batch_size, int(self.target_batch_bytes / row_bytes)),
+        )
+
+    @staticmethod
+    def _pending_ranges(
+        n: int, checkpoint: BackfillCheckpoint | None, step_prefix: str
+    ) -> list[tuple[int, int]]:
+        """
+        Row ranges of [0, n) not yet written according to the checkpoint.
+        """
+        written = []
+        if checkpoint is not None:
+            for step in checkpoint.done:
+                if step.startswith(step_prefix):
+                    start, end = step[len(step_prefix) :].split("-")
+                    written.append((int(start), int(end)))
+        pending = []
+        position = 0
+        for start, end in sorted(written):
+            if start > position:
+                pending.append((position, start))
+            position = max(position, end)
+        if position < n:
+            pending.append((position, n))
+        return pending
@@ -0,0 +1,149 @@
+import json
+import os
+import shutil
+import time
+from datetime import date
+from pathlib import Path
+from typing import final
+
+import pandas as pd
+from common.features.store import FEATURE_NAMES  # pyright: ignore[reportMissingTypeStubs]
+
+from config import (
+    BEST_COUNTERS_COUNT,
+    CHECKPOINT_DIR,
+    CHECKPOINT_MAX_AGE_DAYS,
+    HISTORY_YEARS,
+    MAX_ZERO_RATIO,
+    MIN_PRESENCE_RATIO,
+    QUALITY_WEIGHTS,
+    STD_CAP_QUANTILE,
+)
+
+
+def run_parameters() -> dict:
+    """
+    Settings the checkpointed chunks and frames depend on; a checkpoint written with other settings is discarded.
+    """
+    return {
+        "history_years": HISTORY_YEARS,
+        "features": FEATURE_NAMES,
+        "best_counters_count": BEST_COUNTERS_COUNT,
+        "quality_weights": QUALITY_WEIGHTS,
+        "std_cap_quantile": STD_CAP_QUANTILE,
+        "min_presence_ratio": MIN_PRESENCE_RATIO,
+        "max_zero_ratio": MAX_ZERO_RATIO,
+    }
+
+
+@final
+class BackfillCheckpoint:
+    """
+    Persist the progress of a backfill so that a restarted run resumes from the last completed unit:
+    fetched chunks (one file per counter/year or location/year), transformed dataframes and completed steps
+    such as insert batches. Everything is removed once the backfill succeeds.
+    progress.json records the creation date and the run parameters: a checkpoint older than 'max_age_days'
+    (its open date ranges have moved on) or written with other parameters is discarded instead of resumed.
+    """
+
+    def __init__(
+        self,
+        checkpoint_dir: Path = CHECKPOINT_DIR,
+        parameters: dict | None = None,
+        max_age_days: int = CHECKPOINT_MAX_AGE_DAYS,
+    ) -> None:
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.progress_path = self.checkpoint_dir / "progress.json"
+        # compared with the JSON read back, so tuples and lists must not differ
+        self.parameters = json.loads(
+            json.dumps(run_parameters() if parameters is None else parameters)
+        )
+        self.created = date.today().isoformat()
+        self.done: set[str] = set()
+
+        progress = self._read_progress()
+        reason = self._stale_reason(progress, max_age_days)
+        if reason is None:
+            self.created = progress["created"]
+            self.done = set(progress["done"])
+            return
+        if self.checkpoint_dir.exists():
+            print(f"Discarding the backfill checkpoint: {reason}")
+        self.clear()
+        self._write_progress()
+
+    def _read_progress(self):
+        try:
+            with open(self.progress_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _stale_reason(self, progress, max_age_days: int) -> str | None:
+        if not isinstance(progress, dict):
+            return "no creation date or run parameters"
+        if progress.get("parameters") != self.parameters:
+            return "the run parameters changed"
+        age = (date.today() - date.fromisoformat(progress["created"])).days
+        if age > max_age_days:
+            return f"created {age} days ago"
+        return None
+
+    def _write_progress(self):
+        progress = {
+            "created": self.created,
+            "parameters": self.parameters,
+            "done": sorted(self.done),
+        }
+
+        def write(path):
+            with open(path, "w") as f:
+                json.dump(progress, f)
+
+        self._write_atomically(self.progress_path, write)
+
+    @staticmethod
+    def _write_atomically(path: Path, write):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{time.monotonic_ns()}.tmp")
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _chunk_path(self, key: str) -> Path:
+        return self.checkpoint_dir / "chunks" / f"{key.replace('/', '__')}.json"
+
+    def load_chunk(self, key: str):
+        try:
+            with open(self._chunk_path(key)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save_chunk(self, key: str, body):
+        def write(path):
+            with open(path, "w") as f:
+                json.dump(body, f)
+
+        self._write_atomically(self._chunk_path(key), write)
+
+    def load_frame(self, name: str) -> pd.DataFrame | None:
+        path = self.checkpoint_dir / f"{name}.pkl"
+        if not path.exists():
+            return None
+        return pd.read_pickle(path)
+
+    def save_frame(self, name: str, df: pd.DataFrame):
+        self._write_atomically(
+            self.checkpoint_dir / f"{name}.pkl", lambda path: df.to_pickle(path)
+        )
+
+    def is_done(self, step: str) -> bool:
+        return step in self.done
+
+    def mark_done(self, step: str):
+        self.done.add(step)
+        self._write_progress()
+
+    def clear(self):
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+        self.done = set()
@@ -0,0 +1,88 @@
+import os
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# URLs des API (surchargeables, par exemple pour pointer vers mock_server.py)
+ECOCOUNTER_API_URL = os.getenv(
+    "ECOCOUNTER_API_URL", "https://portail-api-data.montpellier3m.fr"
+)
+OPEN_METEO_ARCHIVE_URL = os.getenv(
+    "OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com"
+)
+OPEN_METEO_FORECAST_URL = os.getenv(
+    "OPEN_METEO_FORECAST_URL", "https://api.open-meteo.com"
+)
+
+# HTTP
+MAX_WORKERS = 8  # requêtes simultanées vers les API
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 1.0  # 1s, 2s, 4s, ... entre deux tentatives
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+REQUEST_TIMEOUT = 60  # secondes
+
+# Limites de l'API Open-Meteo (offre gratuite), en "appels" au sens d'Open-Meteo :
+# une requête de plus de 2 semaines, de plus de 10 variables ou sur plusieurs lieux compte pour plusieurs appels
+OPEN_METEO_RATE_LIMITS = [(600, 60), (5000, 60 * 60)]  # (appels, période en secondes)
+# Plusieurs lieux par requête (latitudes et longitudes séparées par des virgules),
+# sans dépasser non plus la plus petite des limites ci-dessus
+OPEN_METEO_MAX_LOCATIONS = 50
+OPEN_METEO_MAX_URL_LENGTH = 2000  # caractères
+ARCHIVE_DELAY_DAYS = 7  # les derniers jours de l'archive peuvent encore être corrigés
+
+# Écriture en base (upsert sur counter_id, date : relancer un import ne duplique rien)
+DB_MAX_WORKERS = 4  # lots envoyés simultanément
+DB_MAX_RETRIES = 5
+DB_BACKOFF_FACTOR = 1.0  # 1s, 2s, 4s, ... entre deux tentatives d'un lot
+DB_BATCH_SIZE = 5000  # taille initiale des lots, en lignes
+DB_MIN_BATCH_SIZE = 500
+DB_MAX_BATCH_SIZE = 20000
+DB_TARGET_BATCH_BYTES = 4 * 1024 * 1024  # taille maximale visée d'une requête
+DB_TARGET_BATCH_SECONDS = (
+    3.0  # durée visée d'une requête, la taille des lots s'y adapte
+)
+
+# Cache des réponses API
+CACHE_DIR = Path(os.getenv("INGESTION_CACHE_DIR", BASE_DIR / ".cache" / "responses"))
+CACHE_TTL = 6 * 60 * 60  # secondes, pour les plages de dates encore ouvertes
+
+# Météo journalière par lieu arrondi, partagée par l'import et les prévisions (voir weather_store)
+WEATHER_STORE_PATH = Path(
+    os.getenv("INGESTION_WEATHER_STORE", BASE_DIR / ".cache" / "weather.sqlite")
+)
+WEATHER_FORECAST_TTL = 3 * 60 * 60  # secondes, avant de redemander une prévision
+
+# Vue en ligne des variables de chaque compteur, lue par les prévisions (voir common.features.store)
+FEATURE_STORE_PATH = Path(
+    os.getenv("INGESTION_FEATURE_STORE", BASE_DIR / ".cache" / "features.json")
+)
+
+# Reprise de l'import complet après une interruption
+CHECKPOINT_DIR = Path(
+    os.getenv("INGESTION_CHECKPOINT_DIR", BASE_DIR / ".cache" / "backfill")
+)
+# au-delà, la reprise est abandonnée : les données de l'année en cours ont changé depuis
+CHECKPOINT_MAX_AGE_DAYS = 2
+
+# Moteur des transformations de l'import complet : "pandas" ou "polars" (requête paresseuse,
+# nécessite l'extra "polars" ; résultat identique, voir benchmarks/bench_transformer.py)
+TRANSFORMER_ENGINE = os.getenv("INGESTION_TRANSFORMER_ENGINE", "pandas")
+
+# Sélection des meilleurs compteurs (voir counter_quality.score_counters)
+BEST_COUNTERS_COUNT = 10
+QUALITY_WEIGHTS = {"presence": 0.5, "non_zero": 0.2, "stability": 0.3}
+STD_CAP_QUANTILE = 0.95  # l'écart-type est plafonné à ce quantile avant normalisation
+MIN_PRESENCE_RATIO = 0.0  # part minimale de jours présents (0 : aucun compteur écarté)
+MAX_ZERO_RATIO = 1.0  # part maximale de jours à zéro (1 : aucun compteur écarté)
+
+# Agrégats du tableau de bord (voir dashboard_aggregates)
+INTENSITY_BIN_WIDTH = (
+    100  # largeur des classes de l'histogramme des intensités journalières
+)
+
+# Prévisions : nombre de jours produits à chaque exécution à partir d'aujourd'hui
+# (1 à 16, limite de l'API de prévision d'Open-Meteo)
+FORECAST_HORIZON_DAYS = int(os.getenv("FORECAST_HORIZON_DAYS", "1"))
+
+# Données historiques
+HISTORY_YEARS = ["2022", "2023", "2024", "2025"]
@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+from common.schema.schema import to_day_keys  # pyright: ignore[reportMissingTypeStubs]
+
+from config import (
+    BEST_COUNTERS_COUNT,
+    MAX_ZERO_RATIO,
+    MIN_PRESENCE_RATIO,
+    QUALITY_WEIGHTS,
+    STD_CAP_QUANTILE,
+)
+
+AGGREGATE_COLUMNS = [
+    "counter_id",
+    "first_date",
+    "last_date",
+    "days_present",
+    "zero_count",
+    "intensity_sum",
+    "intensity_sum_sq",
+]
+
+
+def counter_aggregates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Running aggregates of every counter of a daily frame ('counter_id', 'date', 'intensity'; one row per counter and day).
+    Dates are int32 day keys. Adding the aggregates of disjoint periods gives the aggregates of their union.
+    """
+    intensity = df["intensity"].to_numpy().astype(np.int64)
+    grouped = pd.DataFrame(
+        {
+            "counter_id": df["counter_id"].to_numpy(),
+            "date": to_day_keys(df["date"]),
+            "is_zero": intensity == 0,
+            "intensity": intensity,
+            "intensity_sq": intensity * intensity,
+        }
+    ).groupby("counter_id", sort=True)
+    aggregates = grouped.agg(
+        first_date=("date", "min"),
+        last_date=("date", "max"),
+        days_present=("date", "size"),
+        zero_count=("is_zero", "sum"),
+        intensity_sum=("intensity", "sum"),
+        intensity_sum_sq=("intensity_sq", "sum"),
+    ).reset_index()
+    return aggregates.astype({"zero_count": "int64"})[AGGREGATE_COLUMNS]
+
+
+def update_aggregates(aggregates: pd.DataFrame, df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the days of the daily frame 'df' to the persisted aggregates.
+    Days up to a counter's 'last_date' are already counted and ignored, so replaying a day is harmless.
+    """
+    last_dates = aggregates.set_index("counter_id")["last_date"]
+    dates = to_day_keys(df["date"])
+    known = df["counter_id"].astype(object).map(last_dates).to_numpy(dtype=np.float64)
+    # a counter without aggregates yet has a NaN last date, which keeps all its rows
+    new_days = counter_aggregates(df[~(dates <= known)])
+
+    merged = pd.concat([aggregates[AGGREGATE_COLUMNS], new_days], ignore_index=True)
+    merged = merged.astype({"counter_id": object}).groupby("counter_id", sort=True)
+    return (
+        merged.agg(
+            first_date=("first_date", "min"),
+            last_date=("last_date", "max"),
+            days_present=("days_present", "sum"),
+            zero_count=("zero_count", "sum"),
+            intensity_sum=("intensity_sum", "sum"),
+            intensity_sum_sq=("intensity_sum_sq", "sum"),
+        )
+        .reset_index()
+        .astype({"first_date": "int32", "last_date": "int32"})
+    )
+
+
+def score_counters(aggregates: pd.DataFrame) -> pd.DataFrame:
+    """
+    Score every counter from its aggregates, best first.
+
+    score = presence * w_presence + (1 - zero_ratio) * w_non_zero + (1 - std / max std) * w_stability
+    where presence is the share of the days of the whole history (first to last day, all counters) the counter
+    reported, and the standard deviation is capped at its STD_CAP_QUANTILE quantile across counters.
+    Counters below MIN_PRESENCE_RATIO or above MAX_ZERO_RATIO are left out.
+    """
+    n = aggregates["days_present"].to_numpy().astype(np.int64)
+    total = aggregates["intensity_sum"].to_numpy().astype(np.int64)
+    total_sq = aggregates["intensity_sum_sq"].to_numpy().astype(np.int64)
+    total_days = (
+        int(aggregates["last_date"].max()) - int(aggregates["first_date"].min()) + 1
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # exact in integers, then a single rounding: no cancellation from the sums of squares
+        std = np.sqrt((n * total_sq - total * total) / (n * (n - 1)))
+    std = np.where(n > 1, std, np.nan)
+    std_capped = np.minimum(std, np.nanquantile(std, STD_CAP_QUANTILE))
+
+    scores = aggregates.assign(
+        presence=n / total_days,
+        zero_ratio=aggregates["zero_count"].to_numpy() / n,
+        std_intensity=std,
+    )
+    scores["score"] = (
+        scores["presence"] * QUALITY_WEIGHTS["presence"]
+        + (1 - scores["zero_ratio"]) * QUALITY_WEIGHTS["non_zero"]
+        + (1 - std_capped / np.nanmax(std_capped)) * QUALITY_WEIGHTS["stability"]
+    )
+    is_eligible = (scores["presence"] >= MIN_PRESENCE_RATIO) & (
+        scores["zero_ratio"] <= MAX_ZERO_RATIO
+    )
+    return scores[is_eligible].sort_values(
+        "score", ascending=False, kind="stable", ignore_index=True
+    )
+
+
+def select_best_counters(
+    aggregates: pd.DataFrame,
+    counters_df: pd.DataFrame,
+    number_of_counters: int = BEST_COUNTERS_COUNT,
+) -> pd.DataFrame:
+    """
+    The best scored counters with their coordinates.
+    """
+    best_counters = score_counters(aggregates).head(number_of_counters)
+    print(
+        f"Selected {len(best_counters)} of {len(aggregates)} counters"
+        f" (lowest score {best_counters['score'].min():.3f})"
+    )
+    return pd.merge(
+        best_counters[["counter_id"]].astype(object),
+        counters_df,
+        how="left",
+        left_on="counter_id",
+        right_on="id",
+    ).drop(columns="id")
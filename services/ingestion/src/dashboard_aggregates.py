@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+from common.schema.schema import to_day_keys  # pyright: ignore[reportMissingTypeStubs]
+
+from config import INTENSITY_BIN_WIDTH
+
+# table -> column identifying a row within a counter
+DASHBOARD_TABLES = {
+    "counter_daily_totals": "period_start",
+    "counter_weekly_totals": "period_start",
+    "counter_monthly_totals": "period_start",
+    "counter_weekday_stats": "weekday",
+    "counter_intensity_bins": "bin_start",
+}
+VALUE_COLUMNS = ["days", "intensity_sum", "intensity_max", "last_date"]
+
+
+def _day_rows(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """
+    Row of every dashboard table each day of the daily frame counts in.
+    """
+    dates = to_day_keys(df["date"])
+    # day key 0 (1970-01-01) is a Thursday
+    weekday = (dates + 3) % 7
+    base = {
+        "counter_id": df["counter_id"].to_numpy(dtype=object),
+        "date": dates,
+        "intensity": df["intensity"].to_numpy().astype(np.int64),
+    }
+    months = dates.astype("datetime64[D]").astype("datetime64[M]")
+    columns = {
+        "counter_daily_totals": dates,
+        "counter_weekly_totals": dates - weekday,
+        "counter_monthly_totals": months.astype("datetime64[D]").astype(np.int32),
+        "counter_weekday_stats": weekday,
+        "counter_intensity_bins": base["intensity"]
+        // INTENSITY_BIN_WIDTH
+        * INTENSITY_BIN_WIDTH,
+    }
+    return {
+        table: pd.DataFrame({**base, DASHBOARD_TABLES[table]: values})
+        for table, values in columns.items()
+    }
+
+
+def _aggregate(rows: pd.DataFrame, column: str) -> pd.DataFrame:
+    return (
+        rows.groupby(["counter_id", column], sort=True)
+        .agg(
+            days=("date", "size"),
+            intensity_sum=("intensity", "sum"),
+            intensity_max=("intensity", "max"),
+            last_date=("date", "max"),
+        )
+        .reset_index()
+    )
+
+
+def dashboard_aggregates(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """
+    Every dashboard table built from a daily frame ('counter_id', 'date', 'intensity'; one row per counter and day):
+    daily, weekly (from Monday) and monthly totals, weekday sums and the intensity histogram (INTENSITY_BIN_WIDTH wide bins)
+    of each counter. Rows hold the number of days, the sum and maximum of their intensities and the last day counted.
+    """
+    return {
+        table: _aggregate(rows, DASHBOARD_TABLES[table])
+        for table, rows in _day_rows(df).items()
+    }
+
+
+def first_period_start(df: pd.DataFrame) -> int:
+    """
+    Day key of the first day of the earliest daily, weekly or monthly period the days of the daily frame fall in.
+    """
+    return int(
+        min(
+            rows["period_start"].min()
+            for table, rows in _day_rows(df).items()
+            if DASHBOARD_TABLES[table] == "period_start"
+        )
+    )
+
+
+def update_dashboard_aggregates(
+    existing: dict[str, pd.DataFrame], df: pd.DataFrame
+) -> dict[str, pd.DataFrame]:
+    """
+    Add the days of the daily frame 'df' to the existing rows of the dashboard tables and return the rows that changed.
+    'existing' must hold the rows the new days fall in. A row ignores the days up to its 'last_date', so
+    replaying a day is harmless: days of a counter arrive in order, so a row only ever sees later days.
+    """
+    updated = {}
+    for table, rows in _day_rows(df).items():
+        column = DASHBOARD_TABLES[table]
+        keys = ["counter_id", column]
+        current = existing[table][keys + VALUE_COLUMNS].astype({"counter_id": object})
+        last_dates = pd.merge(
+            rows[keys], current[keys + ["last_date"]], how="left", on=keys
+        )["last_date"].to_numpy(dtype=np.float64)
+        # rows without a last date yet are NaN, which keeps them
+        new = _aggregate(rows[~(rows["date"].to_numpy() <= last_dates)], column)
+        if new.empty:
+            continue
+        merged = pd.concat(
+            [pd.merge(current, new[keys], on=keys), new], ignore_index=True
+        )
+        updated[table] = (
+            merged.groupby(keys, sort=True)
+            .agg(
+                days=("days", "sum"),
+                intensity_sum=("intensity_sum", "sum"),
+                intensity_max=("intensity_max", "max"),
+                last_date=("last_date", "max"),
+            )
+            .reset_index()
+        )
+    return updated
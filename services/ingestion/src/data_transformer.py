@@ -1,4 +1,29 @@
 import pandas as pd
+from common.features.engine import LAGS, ROLLING_WINDOWS  # pyright: ignore[reportMissingTypeStubs]
+from common.features.state import CounterFeatureState  # pyright: ignore[reportMissingTypeStubs]
+from common.features.store import materialize  # pyright: ignore[reportMissingTypeStubs]
+
+from counter_quality import counter_aggregates, select_best_counters
+
+CLEAN_COLUMNS = [
+    "counter_id",
+    "coordinates",
+    "rounded_coordinates",
+    "date",
+    "year",
+    "month",
+    "day",
+    "weekday",
+    "is_weekend",
+    "rolling_7d",
+    "rolling_28d",
+    "lag_7d",
+    "lag_28d",
+    "temperature",
+    "rain",
+    "is_rainy",
+    "intensity",
+]
 
 
 class DataTransformer:
@@ -20,22 +45,20 @@ class DataTransformer:
         return self
 
     def add_weather(self):
-        self.weather_df["date"] = self.weather_df["datetime"].dt.date  # pyright: ignore[reportAttributeAccessIssue, reportIndexIssue]
-        self.weather_df["date"] = pd.to_datetime(self.df["date"])  # pyright: ignore[reportIndexIssue]
-
-        self.weather_df = self.weather_df.groupby(
-            ["rounded_coordinates", "date"], as_index=False
-        ).agg({"temperature": "mean", "rain": "sum"})
-
+        """
+        Join the daily weather of each counter's rounded location.
+        """
+        self.df["rounded_latitude"] = self.df["rounded_coordinates"].str[0]
+        self.df["rounded_longitude"] = self.df["rounded_coordinates"].str[1]
         self.df = pd.merge(
             self.df,
-            self.weather_df,  # pyright: ignore[reportArgumentType]
-            on=["rounded_coordinates", "date"],
+            self.weather_df,
+            on=["rounded_latitude", "rounded_longitude", "date"],
             how="left",
-        )
-        self.df["is_rainy"] = self.df.apply(
-            lambda row: 1 if row["rain"] >= 0.1 else 0, axis=1
-        )
+        ).drop(columns=["rounded_latitude", "rounded_longitude"])
+        for col in ["temperature", "rain"]:
+            self.df[col] = self.df[col].astype("float64").round(2)
+        self.df["is_rainy"] = (self.df["rain"] >= 0.1).astype(int)
         return self
 
     def apply_basic_transformations(self):
@@ -55,34 +78,43 @@ class DataTransformer:
     def add_features(self):
         """
         Use existing columns to create new features.
+        Lags and rolling means are computed for every counter at once, see common.features.store.
         """
+        self.add_calendar_features()
+        self.df = materialize(self.df)
+        self.df["is_weekend"] = (self.df["weekday"] >= 5).astype(int)
+        return self
+
+    def add_features_from_state(self, states: dict[str, CounterFeatureState]):
+        """
+        Create the same features as add_features for new days only, from each counter's feature state.
+        The states are advanced in place; days they already contain are dropped (already ingested).
+        """
+        self.df = self.df.sort_values(["counter_id", "date"], ignore_index=True)
+        self.add_calendar_features()
+        features = []
+        for counter_id, date, intensity in zip(
+            self.df["counter_id"], self.df["date"], self.df["intensity"]
+        ):
+            state = states.setdefault(counter_id, CounterFeatureState())
+            features.append(state.append(intensity, str(date.date())))
+        is_new = [f is not None for f in features]
+        self.df = self.df[is_new].reset_index(drop=True)  # pyright: ignore[reportAttributeAccessIssue]
+        features = pd.DataFrame.from_records(
+            [f for f in features if f is not None],
+            columns=[f"rolling_{w}d" for w in ROLLING_WINDOWS]
+            + [f"lag_{lag}d" for lag in LAGS],
+        )
+        for name in features.columns:
+            self.df[name] = features[name].to_numpy()
+        self.df["is_weekend"] = (self.df["weekday"] >= 5).astype(int)
+        return self
+
+    def add_calendar_features(self):
         self.df["year"] = self.df["date"].dt.year
         self.df["month"] = self.df["date"].dt.month
         self.df["day"] = self.df["date"].dt.day
         self.df["weekday"] = self.df["date"].dt.day_of_week
-        self.df["rolling_7d"] = round(
-            self.df.groupby("counter_id")["intensity"]
-            .rolling(window=7, min_periods=1)
-            .mean()
-            .reset_index(level=0, drop=True),
-            2,
-        )
-        self.df["rolling_28d"] = round(
-            self.df.groupby("counter_id")["intensity"]
-            .rolling(28, min_periods=1)
-            .mean()
-            .reset_index(level=0, drop=True),
-            2,
-        )
-        self.df["lag_7d"] = self.df.groupby("counter_id")["intensity"].shift(7)
-        self.df["lag_7d"] = self.df["lag_7d"].fillna(self.df["rolling_7d"]).astype(int)
-        self.df["lag_28d"] = self.df.groupby("counter_id")["intensity"].shift(28)
-        self.df["lag_28d"] = (
-            self.df["lag_28d"].fillna(self.df["rolling_28d"]).astype(int)
-        )
-        self.df["is_weekend"] = self.df.apply(
-            lambda row: 1 if row["weekday"] in [5, 6] else 0, axis=1
-        )
         return self
 
     def convert_to_daily_values(self):
@@ -100,6 +132,16 @@ class DataTransformer:
             self.df = self.df.drop(columns="datetime")
         return self
 
+    def keep_new_days(self, watermarks: dict[str, str], until: str):
+        """
+        Keep the rows strictly after each counter's watermark and strictly before 'until' (the current, incomplete day).
+        """
+        last_dates = pd.to_datetime(self.df["counter_id"].map(watermarks))
+        is_new = last_dates.isna() | (self.df["date"] > last_dates)
+        self.df = self.df[is_new & (self.df["date"] < pd.Timestamp(until))]  # pyright: ignore[reportAttributeAccessIssue]
+        self.df = self.df.reset_index(drop=True)
+        return self
+
     def convert_date_to_string(self):
         """
         Convert 'date' column to string before database insertion.
@@ -108,68 +150,18 @@ class DataTransformer:
         return self
 
     def keep_top_counters(self):
-        number_of_counters_to_keep = 10
-        total_days = self.df["date"].nunique()
-        quality_df = (
-            self.df.groupby("counter_id")
-            .agg(
-                days_present=("date", "nunique"),
-                missing_days=("date", lambda x: total_days - x.nunique()),
-                zero_ratio=("intensity", lambda x: (x == 0).mean()),
-                std_intensity=("intensity", "std"),
-            )
-            .reset_index()
-        )
-        quality_df["std_capped"] = quality_df["std_intensity"].clip(
-            upper=quality_df["std_intensity"].quantile(0.95)
-        )
-        quality_df["score"] = (
-            (quality_df["days_present"] / total_days) * 0.5
-            + (1 - quality_df["zero_ratio"]) * 0.2
-            + (1 - quality_df["std_capped"] / quality_df["std_capped"].max()) * 0.3
+        """
+        Compute the running aggregates of every counter and keep the best scored ones, see counter_quality.
+        """
+        self.counter_aggregates = counter_aggregates(self.df)
+        self.best_counters: pd.DataFrame = select_best_counters(
+            self.counter_aggregates, self.counters_df
         )
-
-        self.best_counters: pd.DataFrame = quality_df.sort_values(
-            "score", ascending=False
-        ).head(number_of_counters_to_keep)
-
-        print(self.best_counters)
-
-        self.best_counters = self.best_counters["counter_id"]  # pyright: ignore[reportAttributeAccessIssue]
-        self.best_counters = pd.merge(
-            self.best_counters,
-            self.counters_df,
-            how="left",
-            left_on="counter_id",
-            right_on="id",
-        ).drop(columns="id")
-
-        print(self.best_counters)
         return self
 
     def clean(self):
         """ """
         self.df["temperature"] = self.df["temperature"].ffill()
         self.df["rain"] = self.df["rain"].fillna(0)
-        self.df = self.df[  # pyright: ignore[reportAttributeAccessIssue]
-            [
-                "counter_id",
-                "coordinates",
-                "rounded_coordinates",
-                "date",
-                "year",
-                "month",
-                "day",
-                "weekday",
-                "is_weekend",
-                "rolling_7d",
-                "rolling_28d",
-                "lag_7d",
-                "lag_28d",
-                "temperature",
-                "rain",
-                "is_rainy",
-                "intensity",
-            ]
-        ]
+        self.df = self.df[CLEAN_COLUMNS]  # pyright: ignore[reportAttributeAccessIssue]
         return self
@@ -1,61 +1,264 @@
-import datetime
-import sys
 from typing import final
 
 import pandas as pd
-from common.database.database import supabase  # pyright: ignore[reportMissingTypeStubs]
+from common.database.database import client  # pyright: ignore[reportMissingTypeStubs]
+from common.database.reader import (  # pyright: ignore[reportMissingTypeStubs]
+    PAGE_SIZE,
+    read_table,
+)
+from common.features.state import (  # pyright: ignore[reportMissingTypeStubs]
+    CounterFeatureState,
+    states_from_history,
+)
+from common.schema.schema import compact  # pyright: ignore[reportMissingTypeStubs]
+
+from bulk_writer import BulkWriter
+from checkpoint import BackfillCheckpoint
+from dashboard_aggregates import DASHBOARD_TABLES, VALUE_COLUMNS
 
 
 @final
 class DBHandler:
     def __init__(self) -> None:
-        self.client = supabase
+        self.client = client
         self.historical_table: str = "historical_data"
         self.forecast_table: str = "forecast_data"
         self.best_counters_table: str = "best_counters"
-        self.last_28_days_df: pd.DataFrame = pd.DataFrame()
+        self.watermark_table: str = "counter_watermarks"
+        self.feature_state_table: str = "counter_feature_state"
+        self.counter_aggregates_table: str = "counter_aggregates"
 
-    def insert(self, records, batch_size: int = 5000):
+    def upsert(self, records, checkpoint: BackfillCheckpoint | None = None):
+        """
+        Upsert records on (counter_id, date) by concurrent batches, see BulkWriter.
+        The table needs a unique constraint on (counter_id, date); rows already there are overwritten,
+        so a load interrupted or run twice does not duplicate anything.
+        With a checkpoint, batches already written by an interrupted run are skipped.
+        """
         try:
-            for i in range(0, len(records), batch_size):
-                batch = records[i : i + batch_size]
-                sys.stdout.write(
-                    f"\rInserting... : {min(i + batch_size, len(records))}/{len(records)}"
-                )
-                sys.stdout.flush()
-                _ = self.client.table(self.historical_table).insert(batch).execute()
-
-            sys.stdout.write("\n")
+            rows_per_second = BulkWriter(
+                self.client, self.historical_table, on_conflict="counter_id,date"
+            ).write(records, checkpoint=checkpoint)
         except Exception as e:
             return e
-        print(f"Successfully inserted : {len(records)}/{len(records)}")
+        print(
+            f"Successfully upserted : {len(records)}/{len(records)} ({rows_per_second:.0f} rows/s)"
+        )
+        return self
 
-    def check_content(self):
+    def check_content(self, table: str | None = None):
         try:
             response = (
-                self.client.table(self.historical_table).select("*").limit(10).execute()
+                self.client.table(table or self.historical_table)
+                .select("*")
+                .limit(10)
+                .execute()
             )
             is_table_filled = response.data != []
             return is_table_filled
         except Exception as e:
             return e
 
-    def select_last_28_days(self, best_counters_df: pd.DataFrame):
-        date_28_days_ago = (
-            datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(28)
-        ).strftime("%Y-%m-%d")
+    def select_feature_states(self, counter_ids: list[str]):
+        """
+        Get the persisted feature state of every counter.
+        Counters without one are rebuilt from their latest rows in the historical table.
+        """
         try:
             response = (
-                self.client.table(self.historical_table)
+                self.client.table(self.feature_state_table)
                 .select("*")
-                .in_("counter_id", best_counters_df["counter_id"].tolist())
-                .gte("date", date_28_days_ago)
+                .in_("counter_id", counter_ids)
+                .execute()
+            )
+            self.feature_states: dict[str, CounterFeatureState] = {
+                record["counter_id"]: CounterFeatureState.from_record(record)
+                for record in response.data
+            }
+            missing = [c for c in counter_ids if c not in self.feature_states]
+            if missing:
+                history = read_table(
+                    self.client,
+                    self.historical_table,
+                    columns=["counter_id", "date", "intensity"],
+                    partitions=missing,
+                    typed=False,
+                )
+                self.feature_states.update(states_from_history(history))
+        except Exception as e:
+            print(e)
+            return e
+        return self
+
+    def upsert_feature_states(self, records):
+        try:
+            _ = (
+                self.client.table(self.feature_state_table)
+                .upsert(records, on_conflict="counter_id")
+                .execute()
+            )
+        except Exception as e:
+            print(e)
+            return e
+        print(f"Successfully updated {len(records)} feature states")
+        return self
+
+    def select_watermarks(self, counter_ids: list[str]):
+        """
+        Get the last ingested date of every counter.
+        Counters missing from the watermark table fall back to their latest row in the historical table.
+        """
+        try:
+            response = (
+                self.client.table(self.watermark_table)
+                .select("counter_id, last_date")
+                .in_("counter_id", counter_ids)
                 .execute()
             )
-            self.last_28_days_df = pd.DataFrame.from_records(response.data)
+            self.watermarks: dict[str, str] = {
+                record["counter_id"]: record["last_date"] for record in response.data
+            }
+            # newest rows first, each page asking only for the counters not seen yet: the rows of a counter
+            # in a page are its latest ones, and every page adds at least one counter
+            missing = [c for c in counter_ids if c not in self.watermarks]
+            while missing:
+                response = (
+                    self.client.table(self.historical_table)
+                    .select("counter_id, date")
+                    .in_("counter_id", missing)
+                    .order("date", desc=True)
+                    .limit(PAGE_SIZE)
+                    .execute()
+                )
+                if not response.data:
+                    break
+                last_dates = (
+                    pd.DataFrame.from_records(response.data)
+                    .groupby("counter_id")["date"]
+                    .max()
+                )
+                self.watermarks.update(last_dates.to_dict())
+                missing = [c for c in missing if c not in self.watermarks]
+        except Exception as e:
+            print(e)
+            return e
+        return self
+
+    def upsert_watermarks(self, records):
+        """
+        Advance the watermarks of every counter in a single statement, so they either all move or none do.
+        """
+        try:
+            _ = (
+                self.client.table(self.watermark_table)
+                .upsert(records, on_conflict="counter_id")
+                .execute()
+            )
+        except Exception as e:
+            print(e)
+            return e
+        print(f"Successfully updated {len(records)} watermarks")
+        return self
+
+    def select_counter_aggregates(self):
+        try:
+            response = (
+                self.client.table(self.counter_aggregates_table).select("*").execute()
+            )
+            self.counter_aggregates_df: pd.DataFrame = pd.DataFrame.from_records(
+                response.data
+            )
+        except Exception as e:
+            print(e)
+            return e
+        return self
+
+    def upsert_counter_aggregates(self, records):
+        try:
+            _ = (
+                self.client.table(self.counter_aggregates_table)
+                .upsert(records, on_conflict="counter_id")
+                .execute()
+            )
+        except Exception as e:
+            print(e)
+            return e
+        print(f"Successfully updated the aggregates of {len(records)} counters")
+        return self
+
+    def select_dashboard_aggregates(self, counter_ids: list[str], since: str):
+        """
+        Rows of the dashboard tables for these counters, from 'since' on for the daily, weekly and monthly totals.
+        """
+        try:
+            self.dashboard_aggregates: dict[str, pd.DataFrame] = {}
+            for table, column in DASHBOARD_TABLES.items():
+                df = read_table(
+                    self.client,
+                    table,
+                    key=("counter_id", column),
+                    partitions=counter_ids,
+                    since=since if column == "period_start" else None,
+                    typed=False,
+                )
+                self.dashboard_aggregates[table] = compact(
+                    df.reindex(columns=["counter_id", column, *VALUE_COLUMNS]).astype(
+                        {
+                            "days": "int64",
+                            "intensity_sum": "int64",
+                            "intensity_max": "int64",
+                        }
+                    )
+                )
+        except Exception as e:
+            print(e)
+            return e
+        return self
+
+    def upsert_dashboard_aggregates(self, tables: dict[str, list[dict]]):
+        try:
+            for table, records in tables.items():
+                _ = BulkWriter(
+                    self.client,
+                    table,
+                    on_conflict=f"counter_id,{DASHBOARD_TABLES[table]}",
+                ).write(records)
+        except Exception as e:
+            print(e)
+            return e
+        print(
+            f"Successfully updated {sum(len(r) for r in tables.values())} dashboard aggregate rows"
+        )
+        return self
+
+    def replace_best_counters(self, records):
+        """
+        Make the best counters table hold exactly 'records'.
+        The selection is upserted on counter_id first, then the counters left out of it are deleted,
+        so a reader between the two requests sees the new counters plus some of the old ones.
+        Needs a unique constraint on counter_id. An empty selection leaves the table unchanged.
+        """
+        if not records:
+            print("No best counters selected, the table is left unchanged")
             return self
+        counter_ids = [record["counter_id"] for record in records]
+        try:
+            _ = (
+                self.client.table(self.best_counters_table)
+                .upsert(records, on_conflict="counter_id")
+                .execute()
+            )
+            _ = (
+                self.client.table(self.best_counters_table)
+                .delete()
+                .not_.in_("counter_id", counter_ids)
+                .execute()
+            )
         except Exception as e:
+            print(e)
             return e
+        print(f"Successfully refreshed the {len(records)} best counters")
+        return self
 
     def insert_best_counters(self, records):
         try:
@@ -69,19 +272,24 @@ class DBHandler:
 
     def select_best_counters(self):
         try:
-            response = self.client.table(self.best_counters_table).select("*").execute()
-            self.best_counters_df: pd.DataFrame = pd.DataFrame.from_records(
-                response.data
+            self.best_counters_df: pd.DataFrame = read_table(
+                self.client, self.best_counters_table, key=("counter_id",), typed=False
             )
         except Exception as e:
             print(e)
             return e
         return self
 
-    def insert_forecast_data(self, records):
+    def upsert_forecast_data(self, records):
+        """
+        Write the feature rows of the whole forecast horizon at once, upserted on (counter_id, date):
+        the days already forecast by an earlier run get their features refreshed and keep their forecast.
+        """
         try:
-            _ = self.client.table(self.forecast_table).insert(records).execute()
-            print("Successfully inserted forecast data")
+            _ = BulkWriter(
+                self.client, self.forecast_table, on_conflict="counter_id,date"
+            ).write(records)
+            print(f"Successfully upserted {len(records)} forecast rows")
         except Exception as e:
             print(e)
             return e
@@ -1,27 +1,63 @@
-from datetime import date, timedelta
+from datetime import date
 
-import numpy as np
 import pandas as pd
-import requests
+from common.features.store import (  # pyright: ignore[reportMissingTypeStubs]
+    FEATURE_NAMES,
+    OnlineFeatureView,
+)
+
+from config import FEATURE_STORE_PATH, FORECAST_HORIZON_DAYS, OPEN_METEO_FORECAST_URL
 from db_handler import DBHandler
+from http_client import HTTPClient
+from weather_client import WeatherClient
+from weather_store import WeatherStore
+
+# days covered by the Open-Meteo forecast API
+MAX_FORECAST_DAYS = 16
 
 
 class ForecastHandler:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        http_client: HTTPClient | None = None,
+        weather_store: WeatherStore | None = None,
+        feature_view: OnlineFeatureView | None = None,
+    ) -> None:
+        self.http_client = http_client or HTTPClient()
+        self.weather_client = WeatherClient(self.http_client)
+        self.weather_store = weather_store or WeatherStore()
+        self.feature_view = feature_view or OnlineFeatureView.load(FEATURE_STORE_PATH)
         self.db_handler = DBHandler()
         self.df: pd.DataFrame = pd.DataFrame()
 
-    def provide_forecast_features(self, best_counters_df):
+    def provide_forecast_features(
+        self, best_counters_df, horizon: int = FORECAST_HORIZON_DAYS
+    ):
+        """
+        Feature rows of every best counter for the 'horizon' days from today, with the daily weather
+        forecast of all the days fetched in a single request per location,
+        unless the weather store already holds all of them.
+        Lags and rolling means are read from the online feature view; counters missing from it are
+        loaded once from their persisted feature state.
+        """
+        if not 1 <= horizon <= MAX_FORECAST_DAYS:
+            raise ValueError(f"horizon must be between 1 and {MAX_FORECAST_DAYS} days")
         today = date.today()
-        self.forecast_df = best_counters_df.copy()
-        last_28_days_df = self.db_handler.select_last_28_days(
-            self.forecast_df
-        ).last_28_days_df.copy()  # pyright: ignore[reportAttributeAccessIssue]
-        last_28_days_df["date"] = pd.to_datetime(last_28_days_df["date"])
-        self.forecast_df["rounded_coordinates"] = self.forecast_df[
-            "rounded_coordinates"
-        ].apply(lambda x: (x[0], x[1]))
-        self.forecast_df["date"] = pd.to_datetime(today)
+        dates = pd.date_range(today, periods=horizon, freq="D")
+        counters_df = best_counters_df.copy()
+        counter_ids = counters_df["counter_id"].tolist()
+        missing = [c for c in counter_ids if c not in self.feature_view]
+        if missing:
+            result = self.db_handler.select_feature_states(missing)
+            if isinstance(result, Exception):
+                return result
+            _ = self.feature_view.update(result.feature_states).save()
+        counters_df["rounded_coordinates"] = counters_df["rounded_coordinates"].apply(
+            lambda x: (x[0], x[1])
+        )
+        self.forecast_df = pd.concat(
+            [counters_df.assign(date=day) for day in dates], ignore_index=True
+        )
         self.forecast_df["year"] = self.forecast_df["date"].dt.year
         self.forecast_df["month"] = self.forecast_df["date"].dt.month
         self.forecast_df["day"] = self.forecast_df["date"].dt.day
@@ -30,94 +66,60 @@ class ForecastHandler:
             self.forecast_df["weekday"].isin([5, 6]).astype(int)
         )
 
-        today_ts = pd.Timestamp(today)
-
-        def get_lag_7d(row):
-            counter_data = last_28_days_df[
-                last_28_days_df["counter_id"] == row["counter_id"]
-            ]
-            for offset in [0, 7, 14, 21]:
-                target_date = today_ts - timedelta(days=7 + offset)
-                match = counter_data[counter_data["date"] == target_date]
-                if len(match) > 0:
-                    return match.iloc[0]["intensity"]  # pyright: ignore[reportAttributeAccessIssue]
-            return np.nan
-
-        def get_lag_28d(row):
-            counter_data = last_28_days_df[
-                last_28_days_df["counter_id"] == row["counter_id"]
-            ]
-            for offset in [0, 7, 14, 21]:
-                target_date = today_ts - timedelta(days=28 - offset)
-                match = counter_data[counter_data["date"] == target_date]
-                if len(match) > 0:
-                    return match.iloc[0]["intensity"]  # pyright: ignore[reportAttributeAccessIssue]
-            return np.nan
-
-        def get_rolling(row, window_days):
-            counter_data = last_28_days_df[
-                last_28_days_df["counter_id"] == row["counter_id"]
-            ]
-            if window_days == 7:
-                for offset in [0, 7, 14, 21]:
-                    window_end = today_ts - timedelta(days=1 + offset)
-                    window_start = window_end - timedelta(days=6)
-                    window_data = counter_data[
-                        (counter_data["date"] >= window_start)
-                        & (counter_data["date"] <= window_end)
-                    ]
-                    if len(window_data) >= 4:
-                        return round(window_data["intensity"].mean(), 2)
-                return np.nan
-            else:
-                window_end = today_ts - timedelta(days=1)
-                window_start = window_end - timedelta(days=27)
-                window_data = counter_data[
-                    (counter_data["date"] >= window_start)
-                    & (counter_data["date"] <= window_end)
-                ]
-                if len(window_data) >= 14:
-                    return round(window_data["intensity"].mean(), 2)
-                return np.nan
-
-        self.forecast_df["lag_7d"] = self.forecast_df.apply(
-            lambda row: get_lag_7d(row), axis=1
-        )
-        self.forecast_df["lag_28d"] = self.forecast_df.apply(
-            lambda row: get_lag_28d(row), axis=1
-        )
-        self.forecast_df["rolling_7d"] = self.forecast_df.apply(
-            lambda row: get_rolling(row, 7), axis=1
-        )
-        self.forecast_df["rolling_28d"] = self.forecast_df.apply(
-            lambda row: get_rolling(row, 28), axis=1
+        vectors = [
+            self.feature_view.forecast(counter_id, horizon, start=str(today))
+            for counter_id in counter_ids
+        ]
+        # rows are day-major, like forecast_df
+        features = pd.DataFrame.from_records(
+            [vectors[i][d] for d in range(horizon) for i in range(len(counter_ids))],
+            columns=FEATURE_NAMES,
         )
+        for name in FEATURE_NAMES:
+            self.forecast_df[name] = features[name].to_numpy()
         self.forecast_df["date"] = self.forecast_df["date"].astype(str)
+        locations = list(counters_df["rounded_coordinates"].unique())
+        stored = self.weather_store.covered(locations, today, dates[-1].date())
         response_data = []
-        for i in self.forecast_df["rounded_coordinates"].unique():
-            latitude, longitude = i[0], i[1]
-            try:
-                response = requests.get(
-                    f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&daily=rain_sum,temperature_2m_mean&forecast_days=1"
-                )
-                response_data.append(
-                    {
-                        "rounded_coordinates": i,
-                        "rain": response.json().get("daily", {}).get("rain_sum")[0],
-                        "temperature": response.json()
-                        .get("daily", {})
-                        .get("temperature_2m_mean")[0],
-                    }
-                )
-            except Exception as e:
-                print(e)
-                return e
-        temp_df = pd.DataFrame(response_data)
-        self.forecast_df = pd.merge(
-            self.forecast_df, temp_df, how="left", on="rounded_coordinates"
+        try:
+            responses = self.weather_client.get_all(
+                f"{OPEN_METEO_FORECAST_URL}/v1/forecast?daily=rain_sum,temperature_2m_mean&forecast_days={horizon}",
+                [location for location in locations if location not in stored],
+                horizon,
+                2,
+            )
+            for i, response in responses.items():
+                if response.get("error"):
+                    print(f"No weather forecast for {i}: {response.get('reason')}")
+                    continue
+                daily = response.get("daily", {})
+                for day, rain, temperature in zip(
+                    dates,
+                    daily.get("rain_sum"),
+                    daily.get("temperature_2m_mean"),
+                ):
+                    response_data.append(
+                        {
+                            "rounded_latitude": i[0],
+                            "rounded_longitude": i[1],
+                            "date": day,
+                            "temperature": temperature,
+                            "rain": rain,
+                        }
+                    )
+        except Exception as e:
+            print(e)
+            return e
+        self.weather_store.put(pd.DataFrame(response_data), "forecast")
+        temp_df = self.weather_store.get(locations, today, dates[-1].date())
+        temp_df["rounded_coordinates"] = list(
+            zip(temp_df["rounded_latitude"], temp_df["rounded_longitude"])
         )
-        self.forecast_df["is_rainy"] = self.forecast_df.apply(
-            lambda row: 1 if row["rain"] >= 0.1 else 0, axis=1
+        temp_df["date"] = temp_df["date"].astype(str)
+        temp_df = temp_df[["rounded_coordinates", "date", "rain", "temperature"]]
+        self.forecast_df = pd.merge(
+            self.forecast_df, temp_df, how="left", on=["rounded_coordinates", "date"]
         )
+        self.forecast_df["is_rainy"] = (self.forecast_df["rain"] >= 0.1).astype(int)
 
         return self
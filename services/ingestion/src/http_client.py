@@ -0,0 +1,83 @@
+from typing import final
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    BACKOFF_FACTOR,
+    MAX_RETRIES,
+    MAX_WORKERS,
+    REQUEST_TIMEOUT,
+    RETRY_STATUS_CODES,
+)
+from rate_limiter import RateLimiter
+from response_cache import CacheMissError, ResponseCache
+
+
+@final
+class HTTPClient:
+    """
+    Thin wrapper around a pooled keep-alive requests session.
+    Failed requests (connection errors, 429 and 5xx responses) are retried with an exponential backoff.
+    The session is thread-safe for GET requests and can be shared by concurrent workers.
+    With a cache, responses are read from disk first; in replay mode the network is never used.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = MAX_WORKERS,
+        max_retries: int = MAX_RETRIES,
+        backoff_factor: float = BACKOFF_FACTOR,
+        timeout: float = REQUEST_TIMEOUT,
+        cache: ResponseCache | None = None,
+        replay: bool = False,
+    ) -> None:
+        if replay and cache is None:
+            raise ValueError("Replay mode needs a response cache")
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.timeout = timeout
+        self.cache = cache
+        self.replay = replay
+
+    def get_json(
+        self,
+        url: str,
+        params: dict | None = None,
+        immutable: bool = False,
+        rate_limiter: RateLimiter | None = None,
+        cost: float = 1,
+    ):
+        """
+        'immutable' marks responses that will never change (closed date ranges) so that they are cached forever.
+        'cost' tokens are taken from 'rate_limiter' before going to the network; cache hits are free.
+        Error statuses left after the retries raise requests.HTTPError, whatever their body.
+        """
+        if self.cache is not None:
+            body = self.cache.get(url, params, allow_stale=self.replay)
+            if body is not None:
+                return body
+        if self.replay:
+            raise CacheMissError(f"No cached response for {url}")
+        if rate_limiter is not None:
+            rate_limiter.acquire(cost)
+
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        body = response.json()
+        if self.cache is not None:
+            self.cache.put(url, params, body, immutable=immutable)
+        return body
@@ -1,9 +1,19 @@
+import argparse
+
 from pipeline import IngestionPipeline
 
 
 def main():
-    pipeline = IngestionPipeline()
-    pipeline.run()
+    parser = argparse.ArgumentParser(description="Bike traffic ingestion pipeline")
+    _ = parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="run the backfill from cached API responses only, without network calls nor database writes",
+    )
+    args = parser.parse_args()
+
+    pipeline = IngestionPipeline(replay=args.replay)
+    _ = pipeline.run()
 
 
 if __name__ == "__main__":
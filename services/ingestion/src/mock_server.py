@@ -0,0 +1,348 @@
+"""
+Deterministic local stand-in for the Montpellier ecocounter API and the Open-Meteo archive and forecast APIs
+(including their multi-location requests).
+
+    uv run src/mock_server.py --port 8080 --counters 50 --latency-ms 80 --error-rate 0.02
+
+then point the ingestion at it with ECOCOUNTER_API_URL, OPEN_METEO_ARCHIVE_URL and
+OPEN_METEO_FORECAST_URL set to http://127.0.0.1:8080 (see benchmarks/bench_fetch.py).
+
+Every value is derived from the seed and the request itself, so two runs serve exactly the same data.
+GET /stats returns the number of requests served, failed on purpose and rate limited.
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import final
+from urllib.parse import parse_qs, urlsplit
+
+# around the center of Montpellier
+BASE_LATITUDE = 43.61
+BASE_LONGITUDE = 3.88
+
+
+@final
+class MockAPI:
+    """
+    Synthetic data and failure behaviour shared by every request handler thread.
+    """
+
+    def __init__(
+        self,
+        counters: int = 20,
+        seed: int = 0,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        error_rate: float = 0,
+        rate_limit: int = 0,
+    ) -> None:
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit  # requests per minute, 0 for unlimited
+        self.lock = threading.Lock()
+        self.recent_requests: deque[float] = deque()
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+        rng = random.Random(f"{seed}:counters")
+        self.counters = [
+            {
+                "id": f"urn:ngsi-ld:EcoCounter:MOCK{i:06d}",
+                "type": "EcoCounter",
+                "location": {
+                    "type": "GeoProperty",
+                    "value": {
+                        "type": "Point",
+                        "coordinates": [
+                            round(BASE_LATITUDE + rng.uniform(-0.05, 0.05), 6),
+                            round(BASE_LONGITUDE + rng.uniform(-0.05, 0.05), 6),
+                        ],
+                    },
+                },
+            }
+            for i in range(counters)
+        ]
+
+    def admit(self) -> int:
+        """
+        Apply latency, rate limiting and error injection; return the HTTP status to answer with.
+        """
+        with self.lock:
+            self.stats["requests"] += 1
+            delay = max(
+                0, self.latency_ms + self.random.uniform(-1, 1) * self.jitter_ms
+            )
+            is_error = self.random.random() < self.error_rate
+            now = time.monotonic()
+            while self.recent_requests and now - self.recent_requests[0] > 60:
+                _ = self.recent_requests.popleft()
+            is_limited = 0 < self.rate_limit <= len(self.recent_requests)
+            if is_limited:
+                self.stats["rate_limited"] += 1
+            else:
+                self.recent_requests.append(now)
+                if is_error:
+                    self.stats["errors"] += 1
+        time.sleep(delay / 1000)
+        if is_limited:
+            return 429
+        if is_error:
+            return 500
+        return 200
+
+    def list_counters(self, limit: int):
+        return self.counters[:limit]
+
+    def timeseries(self, counter_id: str, from_date: date, to_date: date):
+        """
+        One daily intensity per day in [from_date, to_date], with a weekly pattern and a seasonal trend.
+        """
+        base = random.Random(f"{self.seed}:{counter_id}").randint(200, 3000)
+        index, values = [], []
+        day = from_date
+        while day <= to_date:
+            rng = random.Random(f"{self.seed}:{counter_id}:{day}")
+            weekly = 0.55 if day.weekday() >= 5 else 1.0
+            seasonal = 1 + 0.3 * math.sin(
+                2 * math.pi * (day.timetuple().tm_yday - 100) / 365
+            )
+            index.append(f"{day}T00:00:00.000Z")
+            values.append(max(0, round(base * weekly * seasonal * rng.gauss(1, 0.15))))
+            day += timedelta(1)
+        return {"entityId": counter_id, "index": index, "values": values}
+
+    def _hourly_weather(self, latitude: float, longitude: float, day: date):
+        rng = random.Random(f"{self.seed}:{latitude}:{longitude}:{day}")
+        mean = 15 + 9 * math.sin(2 * math.pi * (day.timetuple().tm_yday - 110) / 365)
+        is_rainy_day = rng.random() < 0.25
+        temperature = [
+            round(
+                mean + 5 * math.sin(2 * math.pi * (hour - 9) / 24) + rng.gauss(0, 1), 1
+            )
+            for hour in range(24)
+        ]
+        rain = [
+            round(rng.expovariate(2), 1) if is_rainy_day and rng.random() < 0.4 else 0.0
+            for _ in range(24)
+        ]
+        return temperature, rain
+
+    def archive(
+        self,
+        latitude: float,
+        longitude: float,
+        start_date: date,
+        end_date: date,
+        unixtime: bool,
+    ):
+        time_, temperature, rain = [], [], []
+        day = start_date
+        while day <= end_date:
+            day_temperature, day_rain = self._hourly_weather(latitude, longitude, day)
+            midnight = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+            for hour in range(24):
+                timestamp = midnight + timedelta(hours=hour)
+                time_.append(
+                    int(timestamp.timestamp())
+                    if unixtime
+                    else timestamp.strftime("%Y-%m-%dT%H:%M")
+                )
+            temperature += day_temperature
+            rain += day_rain
+            day += timedelta(1)
+        return {
+            "latitude": latitude,
+            "longitude": longitude,
+            "timezone": "GMT",
+            "hourly_units": {
+                "time": "unixtime" if unixtime else "iso8601",
+                "temperature_2m": "°C",
+                "rain": "mm",
+            },
+            "hourly": {"time": time_, "temperature_2m": temperature, "rain": rain},
+        }
+
+    def forecast(self, latitude: float, longitude: float, forecast_days: int):
+        today = date.today()
+        days = [today + timedelta(i) for i in range(forecast_days)]
+        rain_sum, temperature_mean = [], []
+        for day in days:
+            temperature, rain = self._hourly_weather(latitude, longitude, day)
+            temperature_mean.append(round(sum(temperature) / 24, 1))
+            rain_sum.append(round(sum(rain), 1))
+        return {
+            "latitude": latitude,
+            "longitude": longitude,
+            "timezone": "GMT",
+            "daily_units": {
+                "time": "iso8601",
+                "rain_sum": "mm",
+                "temperature_2m_mean": "°C",
+            },
+            "daily": {
+                "time": [str(day) for day in days],
+                "rain_sum": rain_sum,
+                "temperature_2m_mean": temperature_mean,
+            },
+        }
+
+
+def for_locations(query: dict, answer):
+    """
+    Open-Meteo answers comma-separated coordinates with a list of results, a single location with one result.
+    """
+    latitudes = [float(value) for value in query["latitude"].split(",")]
+    longitudes = [float(value) for value in query["longitude"].split(",")]
+    if len(latitudes) != len(longitudes):
+        raise ValueError(
+            "Parameter 'latitude' and 'longitude' must have the same number of elements"
+        )
+    bodies = [answer(*location) for location in zip(latitudes, longitudes)]
+    return bodies if len(bodies) > 1 else bodies[0]
+
+
+def make_handler(api: MockAPI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status: int, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            self.end_headers()
+            _ = self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            parts = url.path.strip("/").split("/")
+
+            if parts == ["stats"]:
+                return self.send_json(200, api.stats)
+
+            status = api.admit()
+            if status == 429:
+                return self.send_json(
+                    429,
+                    {"error": True, "reason": "Minutely API request limit exceeded"},
+                )
+            if status != 200:
+                return self.send_json(
+                    status, {"error": True, "reason": "Injected failure"}
+                )
+
+            try:
+                if parts == ["ecocounter"]:
+                    body = api.list_counters(int(query.get("limit", 1000)))
+                elif len(parts) == 4 and parts[0] == "ecocounter_timeseries":
+                    body = api.timeseries(
+                        parts[1],
+                        date.fromisoformat(query["fromDate"][:10]),
+                        date.fromisoformat(query["toDate"][:10]),
+                    )
+                elif parts == ["v1", "archive"]:
+                    body = for_locations(
+                        query,
+                        lambda latitude, longitude: api.archive(
+                            latitude,
+                            longitude,
+                            date.fromisoformat(query["start_date"]),
+                            date.fromisoformat(query["end_date"]),
+                            query.get("timeformat") == "unixtime",
+                        ),
+                    )
+                elif parts == ["v1", "forecast"]:
+                    body = for_locations(
+                        query,
+                        lambda latitude, longitude: api.forecast(
+                            latitude, longitude, int(query.get("forecast_days", 7))
+                        ),
+                    )
+                else:
+                    return self.send_json(404, {"error": True, "reason": "Not found"})
+            except (KeyError, ValueError) as e:
+                return self.send_json(400, {"error": True, "reason": str(e)})
+            self.send_json(200, body)
+
+    return Handler
+
+
+@final
+class MockServer:
+    """
+    Serve a MockAPI from a background thread, e.g. inside a benchmark.
+    """
+
+    def __init__(self, api: MockAPI, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.api = api
+        self.server = ThreadingHTTPServer((host, port), make_handler(api))
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    _ = parser.add_argument("--host", default="127.0.0.1")
+    _ = parser.add_argument("--port", type=int, default=8080)
+    _ = parser.add_argument("--counters", type=int, default=20)
+    _ = parser.add_argument("--seed", type=int, default=0)
+    _ = parser.add_argument("--latency-ms", type=float, default=0)
+    _ = parser.add_argument("--jitter-ms", type=float, default=0)
+    _ = parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="share of requests answered with a 500",
+    )
+    _ = parser.add_argument(
+        "--rate-limit",
+        type=int,
+        default=0,
+        help="requests per minute before answering 429, 0 to disable",
+    )
+    args = parser.parse_args()
+
+    api = MockAPI(
+        counters=args.counters,
+        seed=args.seed,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+    )
+    server = MockServer(api, args.host, args.port)
+    print(f"Mock APIs listening on {server.url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,109 @@
+from datetime import date, timedelta
 from typing import final
 
+import pandas as pd
+from common.features.state import (  # pyright: ignore[reportMissingTypeStubs]
+    states_from_history,
+)
+from common.features.store import (  # pyright: ignore[reportMissingTypeStubs]
+    OnlineFeatureView,
+)
+from common.schema.schema import (  # pyright: ignore[reportMissingTypeStubs]
+    compact,
+    day_keys_to_iso,
+    expand,
+    memory_per_million_rows,
+    to_records,
+)
+
 from api_fetcher import APIFetcher
+from checkpoint import BackfillCheckpoint
+from config import FEATURE_STORE_PATH, TRANSFORMER_ENGINE
+from counter_quality import counter_aggregates, select_best_counters, update_aggregates
+from dashboard_aggregates import (
+    dashboard_aggregates,
+    first_period_start,
+    update_dashboard_aggregates,
+)
 from data_transformer import DataTransformer
 from db_handler import DBHandler
 from forecast_handler import ForecastHandler
+from http_client import HTTPClient
+from response_cache import ResponseCache
+from weather_store import WeatherStore
 
 
 @final
 class IngestionPipeline:
-    def __init__(self):
-        self.api_fetcher = APIFetcher()
+    def __init__(self, replay: bool = False):
+        self.replay = replay
+        self.http_client = HTTPClient(cache=ResponseCache(), replay=replay)
+        # the weather fetched for the history is reused by the forecast, and across runs
+        self.weather_store = WeatherStore()
+        self.api_fetcher = APIFetcher(
+            self.http_client, weather_store=self.weather_store
+        )
         self.data_transformer = DataTransformer()
+        self.backfill_transformer = self.data_transformer
+        if TRANSFORMER_ENGINE == "polars":
+            from polars_transformer import LazyDataTransformer
+
+            self.backfill_transformer = LazyDataTransformer()
         self.db_handler = DBHandler()
-        self.forecast_handler = ForecastHandler()
+        # features of the next days of every counter, kept up to date by each ingestion
+        self.feature_view = OnlineFeatureView.load(FEATURE_STORE_PATH)
+        self.forecast_handler = ForecastHandler(
+            self.http_client, self.weather_store, self.feature_view
+        )
 
     def run(self):
+        if self.replay:
+            print("Replaying the backfill from cached API responses...")
+            return self.backfill()
+
         is_table_filled = self.db_handler.check_content()
         if is_table_filled:
-            print("Inserting daily forecast data")
+            print("Fetching new data...")
+            _ = self.update_historical_data()
+
+            print("Upserting forecast data")
             self.forecast_handler.provide_forecast_features(
                 self.db_handler.select_best_counters().best_counters_df  # pyright: ignore[reportAttributeAccessIssue]
             )
-            _ = self.db_handler.insert_forecast_data(
-                self.forecast_handler.forecast_df.to_dict(orient="records")
+            _ = self.db_handler.upsert_forecast_data(
+                to_records(compact(self.forecast_handler.forecast_df))
             )
         else:
+            _ = self.backfill()
+        stats = self.weather_store.stats
+        print(f"Weather store: {stats['hits']} hits, {stats['misses']} misses")
+
+    def backfill(self):
+        """
+        Fetch and transform the whole history, then insert it with the best counters.
+        Progress is checkpointed so that an interrupted backfill resumes where it stopped.
+        In replay mode the database and the checkpoint are left untouched.
+        """
+        checkpoint = None if self.replay else BackfillCheckpoint()
+        historical_data = (
+            checkpoint.load_frame("historical_data") if checkpoint else None
+        )
+        best_counters = checkpoint.load_frame("best_counters") if checkpoint else None
+
+        if historical_data is None or best_counters is None:
             print("Fetching data...")
+            self.api_fetcher.checkpoint = checkpoint
             _ = (
                 self.api_fetcher.fetch_counters()
                 .fetch_historical_data()
                 .fetch_weather_data()
             )
+            self.api_fetcher.checkpoint = None
             print("Successfully fetched data")
 
             print("Applying transformation methods to data...")
-            self.api_fetcher.historical_data = (
-                self.data_transformer.load_historical_df(
+            transformed_data = (
+                self.backfill_transformer.load_historical_df(
                     self.api_fetcher.historical_data
                 )
                 .load_counters_df(self.api_fetcher.counters_df)
@@ -47,17 +115,213 @@ class IngestionPipeline:
                 .add_weather()
                 .clean()
                 .keep_top_counters()
-                .convert_date_to_string()
                 .df
             )
-            print("Successfully transformed data")
-            print(self.api_fetcher.historical_data)
+            best_counters = self.backfill_transformer.best_counters
+            historical_data = compact(transformed_data)
+            print(
+                f"Successfully transformed data ({memory_per_million_rows(historical_data):.0f} MiB per million rows,"
+                f" {memory_per_million_rows(transformed_data):.0f} before compaction)"
+            )
+            del transformed_data
+            if checkpoint is not None:
+                checkpoint.save_frame("historical_data", historical_data)
+                checkpoint.save_frame("best_counters", best_counters)
+        else:
+            print("Resuming from the transformed data of the interrupted backfill")
+        self.api_fetcher.historical_data = historical_data
+        self.data_transformer.best_counters = best_counters
+        print(historical_data)
+        if checkpoint is None:
+            return self
 
+        if not checkpoint.is_done("best_counters"):
             print("Inserting best counters in db...")
-            _ = self.db_handler.insert_best_counters(
-                self.data_transformer.best_counters.to_dict(orient="records")
+            result = self.db_handler.insert_best_counters(
+                to_records(compact(best_counters))
+            )
+            if isinstance(result, Exception):
+                return self
+            checkpoint.mark_done("best_counters")
+
+        result = self.db_handler.upsert(
+            to_records(historical_data), checkpoint=checkpoint
+        )
+        if isinstance(result, Exception):
+            print(f"Backfill interrupted, run again to resume: {result}")
+            return self
+        if not checkpoint.is_done("feature_states"):
+            feature_states = states_from_history(
+                expand(historical_data[["counter_id", "date", "intensity"]])
             )
+            result = self.db_handler.upsert_feature_states(
+                [state.to_record(c) for c, state in feature_states.items()]
+            )
+            if isinstance(result, Exception):
+                return self
+            _ = self.feature_view.update(feature_states).save()
+            checkpoint.mark_done("feature_states")
+        if not checkpoint.is_done("counter_aggregates"):
+            result = self.db_handler.upsert_counter_aggregates(
+                to_records(counter_aggregates(historical_data))
+            )
+            if isinstance(result, Exception):
+                return self
+            checkpoint.mark_done("counter_aggregates")
+        if not checkpoint.is_done("dashboard_aggregates"):
+            result = self.db_handler.upsert_dashboard_aggregates(
+                {
+                    table: to_records(df)
+                    for table, df in dashboard_aggregates(historical_data).items()
+                }
+            )
+            if isinstance(result, Exception):
+                return self
+            checkpoint.mark_done("dashboard_aggregates")
+        if isinstance(self.advance_watermarks(historical_data), Exception):
+            return self
+        checkpoint.clear()
+        return self
+
+    def update_historical_data(self):
+        """
+        Fetch, transform and insert the days published since each counter's watermark.
+        Features of the new days come from the persisted per-counter feature states, without reloading history.
+        The best counters are rescored from running per-counter aggregates the same way.
+        """
+        _ = self.api_fetcher.fetch_counters()
+        counter_ids = self.api_fetcher.counters_df["id"].tolist()
+        watermarks = self.db_handler.select_watermarks(counter_ids).watermarks  # pyright: ignore[reportAttributeAccessIssue]
+        # counters without a watermark are fetched from the beginning of the history: when they still have
+        # no complete day, their watermark moves to the end of the fetched window so the next run does not refetch it
+        new_data = self.api_fetcher.fetch_new_historical_data(
+            watermarks
+        ).new_historical_data
+        # a counter whose request failed is left as it is, and fetched again by the next run
+        never_ingested = [
+            c
+            for c in counter_ids
+            if c not in watermarks and c not in self.api_fetcher.failed_counters
+        ]
+        if new_data.empty:
+            print("No new data to insert")
+            _ = self.advance_watermarks(None, never_ingested)
+            return self
+
+        today = date.today()
+        # the weather covers every fetched day, back to the beginning of the history for new counters
+        first_new_day = self.api_fetcher.new_historical_start
+        feature_states = self.db_handler.select_feature_states(counter_ids)
+        if isinstance(feature_states, Exception):
+            return self
+        feature_states = feature_states.feature_states
+        _ = self.api_fetcher.fetch_weather_data(start_date=str(first_new_day))
 
-            _ = self.db_handler.insert(
-                self.api_fetcher.historical_data.to_dict(orient="records")
+        new_data = (
+            self.data_transformer.load_historical_df(new_data)
+            .load_counters_df(self.api_fetcher.counters_df)
+            .add_coordinates()
+            .apply_basic_transformations()
+            .convert_to_daily_values()
+            .keep_new_days(watermarks, str(today))
+            .add_features_from_state(feature_states)
+            .load_weather_df(self.api_fetcher.weather_data)
+            .add_weather()
+            .clean()
+            .df
+        )
+        new_data = compact(new_data)
+        if new_data.empty:
+            print("No complete new day to insert")
+            _ = self.advance_watermarks(None, never_ingested)
+            return self
+
+        result = self.db_handler.upsert(to_records(new_data))
+        if isinstance(result, Exception):
+            return self
+        updated_counters = new_data["counter_id"].unique()
+        result = self.db_handler.upsert_feature_states(
+            [feature_states[c].to_record(c) for c in updated_counters]
+        )
+        if isinstance(result, Exception):
+            return self
+        _ = self.feature_view.update(
+            {c: feature_states[c] for c in updated_counters}
+        ).save()
+        if isinstance(self.refresh_dashboard_aggregates(new_data), Exception):
+            return self
+        if isinstance(self.refresh_best_counters(new_data), Exception):
+            return self
+        _ = self.advance_watermarks(new_data, never_ingested)
+        return self
+
+    def refresh_dashboard_aggregates(self, new_data: pd.DataFrame):
+        """
+        Add the new days to the dashboard tables, reading only the rows they fall in.
+        """
+        is_built = self.db_handler.check_content("counter_weekday_stats")
+        if isinstance(is_built, Exception):
+            return is_built
+        if not is_built:
+            print("No dashboard aggregates yet (built by the backfill), skipping them")
+            return self
+        existing = self.db_handler.select_dashboard_aggregates(
+            new_data["counter_id"].unique().tolist(),
+            day_keys_to_iso([first_period_start(new_data)])[0],
+        )
+        if isinstance(existing, Exception):
+            return existing
+        updated = update_dashboard_aggregates(
+            existing.dashboard_aggregates,  # pyright: ignore[reportAttributeAccessIssue]
+            new_data,
+        )
+        return self.db_handler.upsert_dashboard_aggregates(
+            {table: to_records(df) for table, df in updated.items()}
+        )
+
+    def refresh_best_counters(self, new_data: pd.DataFrame):
+        """
+        Add the new days to the running aggregates of every counter and rescore them, without reading the history.
+        """
+        aggregates = self.db_handler.select_counter_aggregates()
+        if isinstance(aggregates, Exception):
+            return aggregates
+        aggregates = aggregates.counter_aggregates_df
+        if aggregates.empty:
+            print(
+                "No counter aggregates yet (built by the backfill), keeping the best counters"
             )
+            return self
+        aggregates = update_aggregates(compact(aggregates), new_data)
+        result = self.db_handler.upsert_counter_aggregates(to_records(aggregates))
+        if isinstance(result, Exception):
+            return result
+        best_counters = select_best_counters(aggregates, self.api_fetcher.counters_df)
+        return self.db_handler.replace_best_counters(to_records(compact(best_counters)))
+
+    def advance_watermarks(
+        self, df: pd.DataFrame | None, empty_counters: list[str] | None = None
+    ):
+        """
+        Move the watermark of every counter of the compact frame 'df' to its last date.
+        Counters of 'empty_counters' without a row in 'df' move to yesterday, the end of the fetched window.
+        """
+        records = []
+        if df is not None and not df.empty:
+            last_dates = df.groupby("counter_id", observed=True)["date"].max()
+            records = [
+                {"counter_id": counter_id, "last_date": last_date}
+                for counter_id, last_date in zip(
+                    last_dates.index, day_keys_to_iso(last_dates).tolist()
+                )
+            ]
+        seen = {record["counter_id"] for record in records}
+        window_end = str(date.today() - timedelta(1))
+        records += [
+            {"counter_id": counter_id, "last_date": window_end}
+            for counter_id in empty_counters or []
+            if counter_id not in seen
+        ]
+        if not records:
+            return self
+        return self.db_handler.upsert_watermarks(records)
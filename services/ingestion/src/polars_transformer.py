@@ -0,0 +1,252 @@
+from typing import final
+
+import pandas as pd
+import polars as pl
+from common.features.engine import LAGS, ROLLING_WINDOWS  # pyright: ignore[reportMissingTypeStubs]
+
+from counter_quality import AGGREGATE_COLUMNS, select_best_counters
+from data_transformer import CLEAN_COLUMNS
+
+COORDINATE_COLUMNS = {
+    "coordinates": ("latitude", "longitude"),
+    "rounded_coordinates": ("rounded_latitude", "rounded_longitude"),
+}
+
+
+@final
+class LazyDataTransformer:
+    """
+    Same fluent chain as DataTransformer, expressed as a single Polars lazy query.
+
+    Each step only extends the query plan; nothing is computed until .df (or .best_counters) is read,
+    then the plan is optimized and executed on all cores. The collected frames are identical to the ones
+    of the pandas chain: same rows, order, columns, dtypes and values (see benchmarks/bench_transformer.py).
+    Coordinate tuples cannot be stored in Polars, so they travel as one float column per component and
+    are rebuilt when collecting.
+    """
+
+    def __init__(self) -> None:
+        self.plan: pl.LazyFrame | None = None
+        self.quality_plan: pl.LazyFrame | None = None
+        self._df: pd.DataFrame | None = None
+        self._best_counters: pd.DataFrame | None = None
+
+    def load_historical_df(self, df: pd.DataFrame):
+        self.plan = self._from_pandas(df).lazy()
+        self.quality_plan = None
+        self._df = None
+        self._best_counters = None
+        return self
+
+    def load_counters_df(self, df: pd.DataFrame):
+        self.counters_df = df
+        self.counters_plan = self._from_pandas(df).lazy()
+        return self
+
+    def load_weather_df(self, df: pd.DataFrame):
+        self.weather_plan = (
+            pl.from_pandas(df).lazy().with_columns(pl.col("date").cast(pl.Date))
+        )
+        return self
+
+    def add_coordinates(self):
+        if "latitude" not in self.plan.collect_schema().names():
+            self.plan = (
+                self.plan.with_row_index("_row")
+                .join(self.counters_plan, on="id")
+                .sort("_row")
+                .drop("_row")
+            )
+        return self
+
+    def apply_basic_transformations(self):
+        self.plan = (
+            self.plan.rename({"id": "counter_id"})
+            .with_columns(
+                pl.col("datetime").str.to_datetime(time_unit="ns", time_zone="UTC"),
+                pl.col("intensity").cast(pl.Int64),
+            )
+            .unique(
+                subset=["counter_id", "datetime"], keep="first", maintain_order=True
+            )
+        )
+        return self
+
+    def convert_to_daily_values(self):
+        keys = ["counter_id", "date", *self._coordinate_columns()]
+        self.plan = (
+            self.plan.with_columns(pl.col("datetime").dt.date().alias("date"))
+            .group_by(keys)
+            .agg(pl.col("intensity").sum())
+            .sort(keys)
+        )
+        return self
+
+    def add_features(self):
+        """
+        Rows are sorted by (counter_id, date) after convert_to_daily_values, so the windows of
+        common.features.engine are plain per-counter expressions here.
+        """
+        date = pl.col("date")
+        cumsum = pl.col("_cumsum")
+        rolling = {
+            window: (
+                (cumsum - cumsum.shift(window).over("counter_id").fill_null(0))
+                / pl.min_horizontal(pl.col("_position") + 1, window)
+            ).round(2, mode="half_to_even")
+            for window in ROLLING_WINDOWS
+        }
+        self.plan = (
+            self.plan.with_columns(
+                pl.col("intensity").cum_sum().over("counter_id").alias("_cumsum"),
+                pl.int_range(pl.len()).over("counter_id").alias("_position"),
+            )
+            .with_columns(
+                date.dt.year().cast(pl.Int32).alias("year"),
+                date.dt.month().cast(pl.Int32).alias("month"),
+                date.dt.day().cast(pl.Int32).alias("day"),
+                (date.dt.weekday() - 1).cast(pl.Int32).alias("weekday"),
+                *[
+                    rolling[window].alias(f"rolling_{window}d")
+                    for window in ROLLING_WINDOWS
+                ],
+            )
+            .with_columns(
+                *[
+                    pl.col("intensity")
+                    .shift(lag)
+                    .over("counter_id")
+                    .cast(pl.Float64)
+                    .fill_null(pl.col(f"rolling_{lag}d"))
+                    .cast(pl.Int64)
+                    .alias(f"lag_{lag}d")
+                    for lag in LAGS
+                ],
+                (pl.col("weekday") >= 5).cast(pl.Int64).alias("is_weekend"),
+            )
+            .drop("_cumsum", "_position")
+        )
+        return self
+
+    def add_weather(self):
+        self.plan = (
+            self.plan.with_row_index("_row")
+            .join(
+                self.weather_plan,
+                on=["rounded_latitude", "rounded_longitude", "date"],
+                how="left",
+            )
+            .sort("_row")
+            .drop("_row")
+            .with_columns(
+                pl.col(["temperature", "rain"])
+                .cast(pl.Float64)
+                .round(2, mode="half_to_even")
+            )
+            .with_columns(
+                (pl.col("rain") >= 0.1)
+                .fill_null(False)
+                .cast(pl.Int64)
+                .alias("is_rainy"),
+            )
+        )
+        return self
+
+    def clean(self):
+        self.plan = self.plan.with_columns(
+            pl.col("temperature").forward_fill(), pl.col("rain").fill_null(0)
+        ).select(
+            [
+                column
+                for name in CLEAN_COLUMNS
+                for column in COORDINATE_COLUMNS.get(name, [name])
+            ]
+        )
+        return self
+
+    def keep_top_counters(self):
+        """
+        The running aggregates of every counter are part of the lazy query, the scoring of the
+        aggregated rows is the one of counter_quality.
+        """
+        day_key = pl.col("date").cast(pl.Int32)
+        intensity = pl.col("intensity").cast(pl.Int64)
+        self.quality_plan = (
+            self.plan.group_by("counter_id")
+            .agg(
+                first_date=day_key.min(),
+                last_date=day_key.max(),
+                days_present=pl.len().cast(pl.Int64),
+                zero_count=(intensity == 0).sum().cast(pl.Int64),
+                intensity_sum=intensity.sum(),
+                intensity_sum_sq=(intensity * intensity).sum(),
+            )
+            .sort("counter_id")
+            .select(AGGREGATE_COLUMNS)
+        )
+        return self
+
+    def convert_date_to_string(self):
+        self.plan = self.plan.with_columns(pl.col("date").dt.strftime("%Y-%m-%d"))
+        return self
+
+    @property
+    def df(self) -> pd.DataFrame:
+        if self._df is None:
+            self.collect()
+        return self._df  # pyright: ignore[reportReturnType]
+
+    @property
+    def best_counters(self) -> pd.DataFrame:
+        if self._df is None:
+            self.collect()
+        return self._best_counters  # pyright: ignore[reportReturnType]
+
+    @best_counters.setter
+    def best_counters(self, value: pd.DataFrame):
+        self._best_counters = value
+
+    def collect(self):
+        """
+        Execute the plan (and the counter ranking plan, sharing their common part) and convert to pandas.
+        """
+        plans = (
+            [self.plan] if self.quality_plan is None else [self.plan, self.quality_plan]
+        )
+        frames = pl.collect_all(plans)
+        self._df = self._to_pandas(frames[0])
+        if len(frames) > 1:
+            self.counter_aggregates = frames[1].to_pandas()
+            self._best_counters = select_best_counters(
+                self.counter_aggregates, self.counters_df
+            )
+        return self
+
+    def _coordinate_columns(self) -> list[str]:
+        return [column for pair in COORDINATE_COLUMNS.values() for column in pair]
+
+    @staticmethod
+    def _from_pandas(df: pd.DataFrame) -> pl.DataFrame:
+        columns = {}
+        for name in df.columns:
+            if name in COORDINATE_COLUMNS:
+                for i, column in enumerate(COORDINATE_COLUMNS[name]):
+                    columns[column] = pl.Series(df[name].str[i], dtype=pl.Float64)
+            else:
+                columns[name] = pl.from_pandas(df[name])
+        return pl.DataFrame(columns)
+
+    @staticmethod
+    def _to_pandas(frame: pl.DataFrame) -> pd.DataFrame:
+        date = frame.schema.get("date")
+        if date == pl.Date:
+            frame = frame.with_columns(pl.col("date").cast(pl.Datetime("ns")))
+        df = frame.to_pandas()
+        for name, (latitude, longitude) in COORDINATE_COLUMNS.items():
+            if latitude in df.columns:
+                position = df.columns.get_loc(latitude)
+                coordinates = list(
+                    zip(df.pop(latitude).tolist(), df.pop(longitude).tolist())
+                )
+                df.insert(position, name, coordinates)  # pyright: ignore[reportArgumentType]
+        return df
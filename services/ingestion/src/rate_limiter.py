@@ -0,0 +1,66 @@
+import math
+import threading
+import time
+from typing import final
+
+from config import OPEN_METEO_RATE_LIMITS
+
+
+@final
+class TokenBucket:
+    """
+    Thread-safe token bucket: holds up to 'capacity' tokens and refills at 'rate' tokens per second.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def acquire(self, tokens: float = 1):
+        """
+        Block until 'tokens' are available, then take them.
+        """
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+@final
+class RateLimiter:
+    """
+    Enforce several (calls, period) limits at once, e.g. a per-minute and a per-hour quota.
+    """
+
+    def __init__(self, limits: list[tuple[int, float]]) -> None:
+        self.buckets = [TokenBucket(calls / period, calls) for calls, period in limits]
+
+    def acquire(self, cost: float = 1):
+        for bucket in self.buckets:
+            bucket.acquire(cost)
+
+
+def open_meteo_cost(days: int, variables: int, locations: int = 1) -> int:
+    """
+    Number of calls Open-Meteo counts for a request: one per location, started block of 2 weeks and of 10 variables.
+    """
+    return locations * max(1, math.ceil(days / 14)) * max(1, math.ceil(variables / 10))
+
+
+# shared by every Open-Meteo caller of the process
+open_meteo_limiter = RateLimiter(OPEN_METEO_RATE_LIMITS)
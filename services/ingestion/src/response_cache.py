@@ -0,0 +1,70 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import final
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from config import CACHE_DIR, CACHE_TTL
+
+
+class CacheMissError(Exception):
+    pass
+
+
+@final
+class ResponseCache:
+    """
+    On-disk cache of JSON API responses, addressed by the hash of the endpoint and its sorted query parameters.
+    Entries covering a closed date range are immutable, the others expire after 'ttl' seconds.
+    """
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, ttl: float = CACHE_TTL) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+
+    @staticmethod
+    def key(url: str, params: dict | None = None) -> str:
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query) + list((params or {}).items())
+        canonical = (
+            f"{parts.scheme}://{parts.netloc}{parts.path}?{urlencode(sorted(query))}"
+        )
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, url: str, params: dict | None = None, allow_stale: bool = False):
+        """
+        Return the cached body, or None when there is no entry or it has expired.
+        """
+        path = self._path(self.key(url, params))
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        is_expired = (
+            not entry["immutable"] and time.time() - entry["fetched_at"] > self.ttl
+        )
+        if is_expired and not allow_stale:
+            return None
+        return entry["body"]
+
+    def put(self, url: str, params: dict | None, body, immutable: bool = False):
+        path = self._path(self.key(url, params))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "url": url,
+            "params": params,
+            "fetched_at": time.time(),
+            "immutable": immutable,
+            "body": body,
+        }
+        # write then rename so that concurrent readers never see a partial file
+        tmp_path = path.with_suffix(f".{os.getpid()}.{time.monotonic_ns()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,73 @@
+from typing import final
+
+import numpy as np
+import pandas as pd
+
+
+@final
+class TimeseriesBuilder:
+    """
+    Accumulate ecocounter timeseries responses into growable NumPy buffers as they arrive,
+    then build a single (id, datetime, intensity) dataframe at the end.
+    Entity ids are stored once and referenced by an int32 code per row.
+    """
+
+    def __init__(self, initial_capacity: int = 1 << 16) -> None:
+        self.size = 0
+        self.ids: list[str] = []
+        self.id_codes: dict[str, int] = {}
+        self.codes = np.empty(initial_capacity, dtype=np.int32)
+        self.datetimes = np.empty(initial_capacity, dtype=object)
+        # intensities are counts: stay int64 until a non-integer value shows up
+        self.values = np.empty(initial_capacity, dtype=np.int64)
+
+    def _reserve(self, n: int):
+        capacity = len(self.codes)
+        if self.size + n <= capacity:
+            return
+        while capacity < self.size + n:
+            capacity *= 2
+        for name in ["codes", "datetimes", "values"]:
+            buffer = getattr(self, name)
+            grown = np.empty(capacity, dtype=buffer.dtype)
+            grown[: self.size] = buffer[: self.size]
+            setattr(self, name, grown)
+
+    def append(self, response: dict):
+        index = response.get("index") or []
+        n = len(index)
+        if n == 0:
+            return self
+        id = response.get("entityId", {})
+        if id not in self.id_codes:
+            self.id_codes[id] = len(self.ids)
+            self.ids.append(id)
+
+        self._reserve(n)
+        end = self.size + n
+        self.codes[self.size : end] = self.id_codes[id]
+        self.datetimes[self.size : end] = index
+        values = np.asarray(response.get("values"), dtype=np.float64)
+        if self.values.dtype == np.int64 and not np.all(np.trunc(values) == values):
+            self.values = self.values.astype(np.float64)
+        self.values[self.size : end] = values
+        self.size = end
+        return self
+
+    def build(self) -> pd.DataFrame:
+        values = self.values[: self.size]
+        # explicit Series dtypes skip pandas' type inference on the object buffers, which would copy them
+        return pd.DataFrame(
+            {
+                "id": pd.Series(
+                    np.array(self.ids, dtype=object)[self.codes[: self.size]],
+                    dtype=object,
+                    copy=False,
+                ),
+                "datetime": pd.Series(
+                    self.datetimes[: self.size], dtype=object, copy=False
+                ),
+                "intensity": pd.Series(values, copy=False),
+            },
+            copy=False,
+        )
@@ -0,0 +1,123 @@
+from typing import final
+
+import requests
+
+from config import (
+    OPEN_METEO_MAX_LOCATIONS,
+    OPEN_METEO_MAX_URL_LENGTH,
+    OPEN_METEO_RATE_LIMITS,
+)
+from http_client import HTTPClient
+from rate_limiter import open_meteo_cost, open_meteo_limiter
+
+
+@final
+class WeatherClient:
+    """
+    Open-Meteo requests covering many locations at once.
+
+    Open-Meteo takes comma-separated latitude and longitude lists and answers with a list holding one result
+    per location, in the same order (a single object for a single location). Locations are packed into
+    batches of at most max_locations whose URL stays under max_url_length, and the answers are split back
+    per location. Open-Meteo still counts one call per location: batching saves requests and round trips,
+    the rate limiter is charged for every location of a batch, and a batch never costs more calls than
+    the smallest of the OPEN_METEO_RATE_LIMITS allows.
+    """
+
+    def __init__(
+        self,
+        http_client: HTTPClient,
+        max_locations: int = OPEN_METEO_MAX_LOCATIONS,
+        max_url_length: int = OPEN_METEO_MAX_URL_LENGTH,
+        max_cost: int = min(calls for calls, _ in OPEN_METEO_RATE_LIMITS),
+    ) -> None:
+        self.http_client = http_client
+        self.max_locations = max_locations
+        self.max_url_length = max_url_length
+        self.max_cost = max_cost
+
+    def batches(
+        self, url: str, locations: list[tuple[float, float]], days: int, variables: int
+    ) -> list[list[tuple[float, float]]]:
+        """
+        Consecutive groups of 'locations' that each fit in one request to 'url' (the query without coordinates)
+        for 'days' days of 'variables' variables.
+        """
+        max_locations = max(
+            1,
+            min(self.max_locations, self.max_cost // open_meteo_cost(days, variables)),
+        )
+        batches = []
+        batch: list[tuple[float, float]] = []
+        length = len(self._url(url, []))
+        for location in locations:
+            location_length = len(f"{location[0]},{location[1]},")
+            if batch and (
+                len(batch) == max_locations
+                or length + location_length > self.max_url_length
+            ):
+                batches.append(batch)
+                batch, length = [], len(self._url(url, []))
+            batch.append(location)
+            length += location_length
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def get(
+        self,
+        url: str,
+        locations: list[tuple[float, float]],
+        days: int,
+        variables: int,
+        **kwargs,
+    ) -> list:
+        """
+        The response of every location of one batch, in order.
+        An error response (or any response that is not one result per location) is returned for each location.
+        Other keyword arguments go to HTTPClient.get_json.
+        """
+        try:
+            body = self.http_client.get_json(
+                self._url(url, locations),
+                rate_limiter=open_meteo_limiter,
+                cost=open_meteo_cost(days, variables, len(locations)),
+                **kwargs,
+            )
+        except requests.HTTPError as e:
+            body = {"error": True, "reason": str(e)}
+        if isinstance(body, list) and len(body) == len(locations):
+            return body
+        if isinstance(body, dict) and len(locations) == 1:
+            return [body]
+        if not (isinstance(body, dict) and body.get("error")):
+            body = {
+                "error": True,
+                "reason": f"Expected {len(locations)} results from Open-Meteo",
+            }
+        return [body] * len(locations)
+
+    def get_all(
+        self,
+        url: str,
+        locations: list[tuple[float, float]],
+        days: int,
+        variables: int,
+        **kwargs,
+    ) -> dict[tuple[float, float], dict]:
+        """
+        The response of every location, fetched batch after batch.
+        """
+        responses = {}
+        for batch in self.batches(url, locations, days, variables):
+            responses.update(
+                zip(batch, self.get(url, batch, days, variables, **kwargs))
+            )
+        return responses
+
+    @staticmethod
+    def _url(url: str, locations: list[tuple[float, float]]) -> str:
+        latitudes = ",".join(str(location[0]) for location in locations)
+        longitudes = ",".join(str(location[1]) for location in locations)
+        separator = "&" if "?" in url else "?"
+        return f"{url}{separator}latitude={latitudes}&longitude={longitudes}"
@@ -0,0 +1,179 @@
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import final
+
+import numpy as np
+import pandas as pd
+
+from config import (
+    ARCHIVE_DELAY_DAYS,
+    CACHE_TTL,
+    WEATHER_FORECAST_TTL,
+    WEATHER_STORE_PATH,
+)
+
+
+@final
+class WeatherStore:
+    """
+    Daily weather of every rounded location, persisted in a local SQLite file and shared by the archive
+    backfill and the forecast, which check it before any request to Open-Meteo.
+
+    Rows are keyed on (rounded latitude, rounded longitude, date) and remember their source. Archive days are
+    kept forever, except the last ARCHIVE_DELAY_DAYS days of the archive that may still be corrected and expire
+    after CACHE_TTL seconds; forecast days expire after WEATHER_FORECAST_TTL seconds. An archive value replaces
+    the forecast of the same day, a forecast never replaces an archive value.
+    'stats' counts the (location, date range) lookups served by the store (hits) or left to fetch (misses).
+    """
+
+    def __init__(
+        self,
+        path: Path = WEATHER_STORE_PATH,
+        forecast_ttl: float = WEATHER_FORECAST_TTL,
+        archive_ttl: float = CACHE_TTL,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.forecast_ttl = forecast_ttl
+        self.archive_ttl = archive_ttl
+        self.stats = {"hits": 0, "misses": 0}
+        # the fetchers write from their worker threads
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.connection:
+            _ = self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS weather (
+                    latitude REAL NOT NULL,
+                    longitude REAL NOT NULL,
+                    date TEXT NOT NULL,
+                    temperature REAL,
+                    rain REAL,
+                    source TEXT NOT NULL,
+                    expires_at REAL,
+                    PRIMARY KEY (latitude, longitude, date)
+                )
+                """
+            )
+
+    def covered(
+        self,
+        locations: list[tuple[float, float]],
+        start: date,
+        end: date,
+        archive_only: bool = False,
+    ) -> set[tuple[float, float]]:
+        """
+        The locations having an unexpired row for every day of [start, end] (archive rows only if 'archive_only').
+        """
+        days = (end - start).days + 1
+        if days <= 0 or not locations:
+            return set()
+        sql = """
+            SELECT latitude, longitude FROM weather
+            WHERE date BETWEEN ? AND ? AND (expires_at IS NULL OR expires_at > ?)
+        """
+        if archive_only:
+            sql += " AND source = 'archive'"
+        sql += " GROUP BY latitude, longitude HAVING COUNT(*) = ?"
+        with self.lock:
+            rows = self.connection.execute(
+                sql, [str(start), str(end), time.time(), days]
+            ).fetchall()
+        complete = {(latitude, longitude) for latitude, longitude in rows}
+        hits = {location for location in locations if tuple(location) in complete}
+        with self.lock:
+            self.stats["hits"] += len(hits)
+            self.stats["misses"] += len(locations) - len(hits)
+        return hits
+
+    def get(
+        self, locations: list[tuple[float, float]], start: date, end: date
+    ) -> pd.DataFrame:
+        """
+        The stored days of [start, end] of the locations, in the order of 'locations' then by date.
+        Expired forecast rows are left out; archive rows are returned until an update replaces them.
+        """
+        with self.lock:
+            df = pd.read_sql_query(
+                """
+                SELECT latitude AS rounded_latitude, longitude AS rounded_longitude, date, temperature, rain
+                FROM weather
+                WHERE date BETWEEN ? AND ? AND (source <> 'forecast' OR expires_at > ?)
+                """,
+                self.connection,
+                params=[str(start), str(end), time.time()],
+            )
+        order = {tuple(location): i for i, location in enumerate(locations)}
+        position = pd.Series(
+            list(zip(df["rounded_latitude"], df["rounded_longitude"])), dtype=object
+        ).map(order)
+        df = df[position.notna().to_numpy()].assign(
+            position=position.dropna().to_numpy()
+        )
+        df = df.sort_values(["position", "date"], ignore_index=True)
+        return pd.DataFrame(
+            {
+                "rounded_latitude": df["rounded_latitude"].astype(np.float64),
+                "rounded_longitude": df["rounded_longitude"].astype(np.float64),
+                "date": pd.to_datetime(df["date"]).astype("datetime64[ns]"),
+                "temperature": df["temperature"].astype(np.float32),
+                "rain": df["rain"].astype(np.float32),
+            }
+        )
+
+    def put(self, df: pd.DataFrame, source: str):
+        """
+        Store daily weather rows (rounded_latitude, rounded_longitude, date, temperature, rain)
+        coming from the "archive" or the "forecast".
+        """
+        if df.empty:
+            return
+        now = time.time()
+        days = pd.to_datetime(df["date"]).dt.date
+        if source == "archive":
+            settled = days < date.today() - timedelta(ARCHIVE_DELAY_DAYS)
+            expires_at = np.where(settled, np.nan, now + self.archive_ttl)
+        else:
+            expires_at = np.full(len(df), now + self.forecast_ttl)
+        rows = [
+            (
+                float(latitude),
+                float(longitude),
+                str(day),
+                _optional(temperature),
+                _optional(rain),
+                source,
+                _optional(expiry),
+            )
+            for latitude, longitude, day, temperature, rain, expiry in zip(
+                df["rounded_latitude"],
+                df["rounded_longitude"],
+                days,
+                df["temperature"],
+                df["rain"],
+                expires_at,
+            )
+        ]
+        # a forecast never overwrites an archive value
+        guard = "" if source == "archive" else " WHERE weather.source <> 'archive'"
+        with self.lock, self.connection:
+            _ = self.connection.executemany(
+                f"""
+                INSERT INTO weather VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (latitude, longitude, date) DO UPDATE SET
+                    temperature = excluded.temperature,
+                    rain = excluded.rain,
+                    source = excluded.source,
+                    expires_at = excluded.expires_at
+                {guard}
+                """,
+                rows,
+            )
+
+
+def _optional(value) -> float | None:
+    return None if pd.isna(value) else float(value)
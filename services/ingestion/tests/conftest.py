@@ -0,0 +1,17 @@
+"""
+The storage client and the cache locations are read at import: the tests run on a local DuckDB
+database and temporary directories, never on the configured ones.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+_CACHE = Path(tempfile.mkdtemp(prefix="ingestion-tests-"))
+
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["LOCAL_DATABASE_PATH"] = ":memory:"
+os.environ["INGESTION_CACHE_DIR"] = str(_CACHE / "responses")
+os.environ["INGESTION_WEATHER_STORE"] = str(_CACHE / "weather.sqlite")
+os.environ["INGESTION_FEATURE_STORE"] = str(_CACHE / "features.json")
+os.environ["INGESTION_CHECKPOINT_DIR"] = str(_CACHE / "backfill")
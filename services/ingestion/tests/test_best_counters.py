@@ -0,0 +1,105 @@
+"""
+Best counters: scores kept up to date from running aggregates, and refreshing the table with a new selection.
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from common.database.local import LocalClient
+
+from counter_quality import counter_aggregates, score_counters, update_aggregates
+from db_handler import DBHandler
+
+DAYS = 90
+# no counter reported on this day
+GLOBAL_GAP_DAY = "2024-02-10"
+LATE_COUNTER = "urn:ngsi-ld:EcoCounter:X2H00000005"
+
+
+def make_history() -> pd.DataFrame:
+    rng = np.random.default_rng(11)
+    dates = pd.date_range("2024-01-01", periods=DAYS, freq="D")
+    frames = []
+    for i in range(6):
+        counter_id = f"urn:ngsi-ld:EcoCounter:X2H{i:08d}"
+        intensity = rng.integers(0, 2000, DAYS) * (rng.random(DAYS) > 0.1 * i)
+        # days missing for this counter only
+        kept = rng.random(DAYS) > 0.05 * i
+        if counter_id == LATE_COUNTER:
+            kept &= dates >= pd.Timestamp("2024-03-01")
+        frames.append(
+            pd.DataFrame(
+                {"counter_id": counter_id, "date": dates, "intensity": intensity}
+            )[kept]
+        )
+    df = pd.concat(frames, ignore_index=True)
+    return df[df["date"] != pd.Timestamp(GLOBAL_GAP_DAY)].reset_index(drop=True)
+
+
+def running_scores(df: pd.DataFrame, cuts: list[str]) -> pd.DataFrame:
+    bounds = [pd.Timestamp(cut) for cut in cuts]
+    aggregates = counter_aggregates(df[df["date"] < bounds[0]])
+    for start, end in zip(bounds, bounds[1:] + [df["date"].max() + timedelta(1)]):
+        # each update replays its previous day, as a rerun of the ingestion would
+        update = df[(df["date"] >= start - timedelta(1)) & (df["date"] < end)]
+        aggregates = update_aggregates(aggregates, update)
+    return score_counters(aggregates)
+
+
+def test_running_scores_match_the_full_history():
+    df = make_history()
+    expected = score_counters(counter_aggregates(df))
+    # the late counter first appears in the second update
+    result = running_scores(df, ["2024-01-20", "2024-02-15", "2024-03-10"])
+
+    assert len(expected) == 6
+    pd.testing.assert_frame_equal(
+        result.astype({"counter_id": object}),
+        expected.astype({"counter_id": object}),
+        check_dtype=False,
+        check_exact=True,
+    )
+
+
+def test_presence_counts_the_days_without_any_counter():
+    df = make_history()
+    scores = score_counters(counter_aggregates(df)).set_index("counter_id")
+    full_counter = "urn:ngsi-ld:EcoCounter:X2H00000000"
+    # the day without any row is a missing day: presence is over the calendar span
+    assert df["date"].nunique() == DAYS - 1
+    assert scores.loc[full_counter, "presence"] == (DAYS - 1) / DAYS
+
+
+def best_counters(db_handler):
+    return {
+        record["counter_id"]: record["rank"]
+        for record in db_handler.client.table("best_counters")
+        .select("*")
+        .execute()
+        .data
+    }
+
+
+def make_db_handler(records):
+    db_handler = DBHandler()
+    db_handler.client = LocalClient()
+    _ = db_handler.insert_best_counters(records)
+    return db_handler
+
+
+def test_replace_keeps_exactly_the_new_selection():
+    db_handler = make_db_handler(
+        [{"counter_id": c, "rank": i} for i, c in enumerate(["a", "b", "c"])]
+    )
+    _ = db_handler.replace_best_counters(
+        [{"counter_id": c, "rank": i} for i, c in enumerate(["c", "d", "b"])]
+    )
+    # counters kept in the selection are updated, not duplicated
+    assert best_counters(db_handler) == {"c": 0, "d": 1, "b": 2}
+
+
+def test_empty_selection_leaves_the_table_unchanged():
+    db_handler = make_db_handler([{"counter_id": "a", "rank": 0}])
+    _ = db_handler.replace_best_counters([])
+    assert best_counters(db_handler) == {"a": 0}
@@ -0,0 +1,135 @@
+"""
+BulkWriter against a fake client: resume from a checkpoint, adaptive batch size and recorded progress.
+"""
+
+import json
+import threading
+from collections import Counter
+
+import pytest
+
+from bulk_writer import BulkWriter
+from checkpoint import BackfillCheckpoint
+
+ROWS = 1000
+TABLE = "historical_data"
+
+
+class FakeClient:
+    """
+    Keeps the number of times each row was written. The first 'failing_calls' requests fail,
+    and so does every batch containing a row of 'failing_rows'.
+    """
+
+    def __init__(self, failing_rows=(), failing_calls=0):
+        self.failing_rows = set(failing_rows)
+        self.failing_calls = failing_calls
+        self.writes = Counter()
+        self.batch_sizes = []
+        self.lock = threading.Lock()
+
+    def table(self, name):
+        return FakeQuery(self)
+
+
+class FakeQuery:
+    def __init__(self, client):
+        self.client = client
+        self.batch = []
+
+    def upsert(self, batch, on_conflict):
+        self.batch = batch
+        return self
+
+    def execute(self):
+        with self.client.lock:
+            self.client.batch_sizes.append(len(self.batch))
+            if len(self.client.batch_sizes) <= self.client.failing_calls or any(
+                row["id"] in self.client.failing_rows for row in self.batch
+            ):
+                raise ConnectionError("connection reset")
+            self.client.writes.update(row["id"] for row in self.batch)
+
+
+def make_records():
+    return [{"id": i, "intensity": i % 7} for i in range(ROWS)]
+
+
+def make_writer(client, **kwargs):
+    options = {
+        "max_workers": 2,
+        "max_retries": 1,
+        "backoff_factor": 0,
+        "batch_size": 100,
+        "min_batch_size": 10,
+        "max_batch_size": 100,
+        "target_batch_seconds": 60,
+    }
+    return BulkWriter(client, TABLE, on_conflict="id", **(options | kwargs))
+
+
+def written_ranges(progress_path):
+    with open(progress_path) as f:
+        done = json.load(f)["done"]
+    prefix = f"upsert/{TABLE}/"
+    return sorted(
+        tuple(int(bound) for bound in step[len(prefix) :].split("-"))
+        for step in done
+        if step.startswith(prefix)
+    )
+
+
+def covered_rows(ranges):
+    return {row for start, end in ranges for row in range(start, end)}
+
+
+def test_resume_after_failed_batch_writes_every_row_once(tmp_path):
+    records = make_records()
+    checkpoint = BackfillCheckpoint(tmp_path)
+    client = FakeClient(failing_rows={450})
+    with pytest.raises(ConnectionError):
+        _ = make_writer(client).write(records, checkpoint=checkpoint)
+    assert 450 not in client.writes
+    first_run = dict(client.writes)
+
+    client.failing_rows.clear()
+    _ = make_writer(client).write(records, checkpoint=BackfillCheckpoint(tmp_path))
+
+    assert set(client.writes) == set(range(ROWS))
+    assert set(client.writes.values()) == {1}
+    assert all(client.writes[row] == 1 for row in first_run)
+
+
+def test_progress_records_the_written_ranges(tmp_path):
+    records = make_records()
+    checkpoint = BackfillCheckpoint(tmp_path)
+    client = FakeClient(failing_rows={450})
+    with pytest.raises(ConnectionError):
+        _ = make_writer(client).write(records, checkpoint=checkpoint)
+
+    ranges = written_ranges(checkpoint.progress_path)
+    assert covered_rows(ranges) == set(client.writes)
+    assert 450 not in covered_rows(ranges)
+
+    client.failing_rows.clear()
+    _ = make_writer(client).write(records, checkpoint=BackfillCheckpoint(tmp_path))
+    assert covered_rows(written_ranges(checkpoint.progress_path)) == set(range(ROWS))
+
+
+def test_batch_size_shrinks_on_failure():
+    client = FakeClient(failing_rows=set(range(ROWS)))
+    writer = make_writer(client, max_workers=1, max_retries=2)
+    with pytest.raises(ConnectionError):
+        _ = writer.write(make_records())
+    # three failed attempts of the first batch: 100 -> 50 -> 25 -> 12
+    assert client.batch_sizes == [100, 100, 100]
+    assert writer.batch_size == 12
+    assert not client.writes
+
+
+def test_batch_after_a_failure_is_smaller():
+    client = FakeClient(failing_calls=1)
+    writer = make_writer(client, max_workers=1)
+    _ = writer.write(make_records())
+    # the first batch fails once (100 -> 50), its retry succeeds quickly (50 -> 75)
+    assert client.batch_sizes[:3] == [100, 100, 75]
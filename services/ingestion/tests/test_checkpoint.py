@@ -0,0 +1,135 @@
+"""
+BackfillCheckpoint: resume from the saved chunks, and discard stale, mismatched or corrupt checkpoints.
+"""
+
+import json
+from datetime import date, timedelta
+
+import pandas as pd
+
+from api_fetcher import APIFetcher
+from checkpoint import BackfillCheckpoint
+from config import HISTORY_YEARS
+from weather_store import WeatherStore
+
+COUNTER = "urn:ngsi-ld:EcoCounter:X2H00000001"
+
+
+class FakeHTTPClient:
+    """
+    Answers every request with a one-day timeseries and counts the requests.
+    """
+
+    def __init__(self):
+        self.urls = []
+
+    def get_json(self, url, **kwargs):
+        self.urls.append(url)
+        if "/ecocounter?" in url:
+            return [
+                {
+                    "id": COUNTER,
+                    "location": {"value": {"coordinates": [43.61, 3.87]}},
+                }
+            ]
+        return {
+            "entityId": COUNTER,
+            "index": ["2024-01-01T00:00:00.000Z"],
+            "values": [12],
+        }
+
+
+def fetch_history(checkpoint_dir, tmp_path):
+    http_client = FakeHTTPClient()
+    fetcher = APIFetcher(http_client, weather_store=WeatherStore(tmp_path / "w.sqlite"))
+    fetcher.checkpoint = BackfillCheckpoint(checkpoint_dir)
+    _ = fetcher.fetch_counters().fetch_historical_data()
+    return http_client.urls, fetcher.checkpoint
+
+
+def age_progress(checkpoint, days):
+    with open(checkpoint.progress_path) as f:
+        progress = json.load(f)
+    progress["created"] = str(date.today() - timedelta(days))
+    with open(checkpoint.progress_path, "w") as f:
+        json.dump(progress, f)
+
+
+def test_resume_skips_saved_chunks(tmp_path):
+    first_urls, checkpoint = fetch_history(tmp_path / "backfill", tmp_path)
+    checkpoint.mark_done("best_counters")
+    assert len(first_urls) == 1 + len(HISTORY_YEARS)
+
+    urls, checkpoint = fetch_history(tmp_path / "backfill", tmp_path)
+    assert urls == []
+    assert checkpoint.is_done("best_counters")
+
+
+def test_resume_refetches_only_missing_chunks(tmp_path):
+    _, checkpoint = fetch_history(tmp_path / "backfill", tmp_path)
+    checkpoint._chunk_path(f"timeseries/{COUNTER}/{HISTORY_YEARS[0]}").unlink()
+
+    urls, _ = fetch_history(tmp_path / "backfill", tmp_path)
+    assert len(urls) == 1
+    assert f"fromDate={HISTORY_YEARS[0]}-01-01" in urls[0]
+
+
+def test_frames_are_kept_on_resume(tmp_path):
+    checkpoint = BackfillCheckpoint(tmp_path)
+    checkpoint.save_frame("best_counters", pd.DataFrame({"counter_id": [COUNTER]}))
+
+    frame = BackfillCheckpoint(tmp_path).load_frame("best_counters")
+    assert frame is not None
+    assert frame["counter_id"].tolist() == [COUNTER]
+
+
+def test_recent_checkpoint_is_resumed(tmp_path):
+    checkpoint = BackfillCheckpoint(tmp_path, max_age_days=2)
+    checkpoint.mark_done("best_counters")
+    age_progress(checkpoint, 2)
+
+    assert BackfillCheckpoint(tmp_path, max_age_days=2).is_done("best_counters")
+
+
+def test_stale_checkpoint_is_discarded(tmp_path):
+    checkpoint = BackfillCheckpoint(tmp_path, max_age_days=2)
+    checkpoint.save_chunk("counters", [])
+    checkpoint.mark_done("best_counters")
+    age_progress(checkpoint, 3)
+
+    checkpoint = BackfillCheckpoint(tmp_path, max_age_days=2)
+    assert checkpoint.done == set()
+    assert checkpoint.load_chunk("counters") is None
+    assert checkpoint.created == str(date.today())
+
+
+def test_checkpoint_with_other_parameters_is_discarded(tmp_path):
+    checkpoint = BackfillCheckpoint(tmp_path, parameters={"history_years": ["2024"]})
+    checkpoint.save_chunk("counters", [])
+    checkpoint.mark_done("best_counters")
+
+    checkpoint = BackfillCheckpoint(tmp_path, parameters={"history_years": ["2025"]})
+    assert checkpoint.done == set()
+    assert checkpoint.load_chunk("counters") is None
+
+
+def test_corrupt_progress_file_is_discarded(tmp_path):
+    checkpoint = BackfillCheckpoint(tmp_path)
+    checkpoint.save_chunk("counters", [])
+    checkpoint.mark_done("best_counters")
+    checkpoint.progress_path.write_text('{"created": "2024-')
+
+    checkpoint = BackfillCheckpoint(tmp_path)
+    assert checkpoint.done == set()
+    assert checkpoint.load_chunk("counters") is None
+    with open(checkpoint.progress_path) as f:
+        assert json.load(f)["done"] == []
+
+
+def test_corrupt_chunk_is_fetched_again(tmp_path):
+    _, checkpoint = fetch_history(tmp_path / "backfill", tmp_path)
+    checkpoint._chunk_path("counters").write_text("[{")
+
+    urls, _ = fetch_history(tmp_path / "backfill", tmp_path)
+    assert len(urls) == 1
+    assert "/ecocounter?" in urls[0]
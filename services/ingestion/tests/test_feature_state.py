@@ -0,0 +1,123 @@
+"""
+CounterFeatureState, fed day by day, must give the rolling means and lags of the batch computation
+(common.features.engine) over the whole history.
+"""
+
+import numpy as np
+import pandas as pd
+from common.database.local import LocalClient
+from common.features.engine import compute_counter_features
+from common.features.state import CounterFeatureState, states_from_history
+from common.features.store import FEATURE_NAMES
+
+from data_transformer import DataTransformer
+from db_handler import DBHandler
+
+LONG_COUNTER = "urn:ngsi-ld:EcoCounter:X2H00000001"
+# fewer than 7 days of history
+SHORT_COUNTER = "urn:ngsi-ld:EcoCounter:X2H00000002"
+GAP_DAY = "2024-01-20"
+
+
+def make_history() -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    long_dates = pd.date_range("2024-01-01", periods=45, freq="D")
+    long_dates = long_dates[long_dates != pd.Timestamp(GAP_DAY)]
+    short_dates = pd.date_range("2024-02-10", periods=5, freq="D")
+    return pd.DataFrame(
+        {
+            "counter_id": [LONG_COUNTER] * len(long_dates)
+            + [SHORT_COUNTER] * len(short_dates),
+            "date": long_dates.append(short_dates),
+            "intensity": rng.integers(0, 3000, len(long_dates) + len(short_dates)),
+        }
+    )
+
+
+def batch_features(df: pd.DataFrame) -> pd.DataFrame:
+    features = compute_counter_features(
+        df["counter_id"].to_numpy(), df["date"].to_numpy(), df["intensity"].to_numpy()
+    )
+    return pd.DataFrame(features)[FEATURE_NAMES]
+
+
+def incremental_features(df: pd.DataFrame) -> pd.DataFrame:
+    states: dict[str, CounterFeatureState] = {}
+    rows = []
+    for counter_id, day, intensity in zip(
+        df["counter_id"], df["date"], df["intensity"]
+    ):
+        state = states.setdefault(counter_id, CounterFeatureState())
+        rows.append(state.append(intensity, str(day.date())))
+    return pd.DataFrame.from_records(rows, columns=FEATURE_NAMES)
+
+
+def test_day_by_day_matches_batch():
+    df = make_history()
+    expected = batch_features(df)
+    result = incremental_features(df)
+    for name in FEATURE_NAMES:
+        np.testing.assert_array_equal(
+            result[name].to_numpy(), expected[name].to_numpy(), err_msg=name
+        )
+
+
+def test_short_counter_lags_fall_back_to_rolling_mean():
+    df = make_history()
+    short = df[df["counter_id"] == SHORT_COUNTER].reset_index(drop=True)
+    features = incremental_features(short)
+    assert len(short) < 7
+    for lag in [7, 28]:
+        assert (
+            features[f"lag_{lag}d"] == features[f"rolling_{lag}d"].astype(int)
+        ).all()
+
+
+def test_day_after_gap_reads_previous_rows():
+    df = make_history()
+    long = df[df["counter_id"] == LONG_COUNTER].reset_index(drop=True)
+    features = incremental_features(long)
+    after_gap = long.index[long["date"] > pd.Timestamp(GAP_DAY)][0]
+    # lags count ingested days, not calendar days: the missing day is skipped
+    assert features["lag_7d"][after_gap] == long["intensity"][after_gap - 7]
+
+
+def test_states_resume_the_batch_features():
+    df = make_history()
+    expected = DataTransformer().load_historical_df(df.copy()).add_features().df
+    expected = expected.sort_values(["counter_id", "date"], ignore_index=True)
+
+    cutoff = pd.Timestamp("2024-02-12")
+    history = df[df["date"] < cutoff].assign(date=lambda d: d["date"].astype(str))
+    states = states_from_history(history)
+    result = (
+        DataTransformer()
+        .load_historical_df(df[df["date"] >= cutoff].copy())
+        .add_features_from_state(states)
+        .df
+    )
+    expected = expected[expected["date"] >= cutoff].reset_index(drop=True)
+    pd.testing.assert_frame_equal(
+        result[FEATURE_NAMES], expected[FEATURE_NAMES], check_exact=True
+    )
+
+
+def test_missing_states_are_rebuilt_from_the_history():
+    df = make_history().assign(date=lambda d: d["date"].astype(str))
+    db_handler = DBHandler()
+    db_handler.client = LocalClient()
+    _ = db_handler.upsert(df.to_dict("records"))
+    stored = CounterFeatureState([1, 2, 3], "2024-02-14")
+    _ = db_handler.upsert_feature_states([stored.to_record(SHORT_COUNTER)])
+
+    states = db_handler.select_feature_states(
+        [LONG_COUNTER, SHORT_COUNTER]
+    ).feature_states
+    # the stored state wins, the other one is read from the whole history of its counter
+    assert states[SHORT_COUNTER].to_record(SHORT_COUNTER) == stored.to_record(
+        SHORT_COUNTER
+    )
+    expected = states_from_history(df)[LONG_COUNTER]
+    assert states[LONG_COUNTER].to_record(LONG_COUNTER) == expected.to_record(
+        LONG_COUNTER
+    )
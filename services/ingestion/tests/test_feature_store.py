@@ -0,0 +1,64 @@
+"""
+Forecast features of the online feature view beyond the first week: each forecast day is filled with
+its own lag_7d (seasonal naive), so the last observed week repeats.
+"""
+
+import numpy as np
+from common.features.state import CounterFeatureState
+from common.features.store import OnlineFeatureView
+
+COUNTER = "urn:ngsi-ld:EcoCounter:X2H00000001"
+LAST_DATE = "2024-03-31"
+HORIZON = 16
+
+
+def make_view(tmp_path) -> tuple[OnlineFeatureView, list[int]]:
+    values = np.random.default_rng(5).integers(100, 3000, 40).tolist()
+    view = OnlineFeatureView(tmp_path / "features.json")
+    _ = view.update({COUNTER: CounterFeatureState(values, LAST_DATE)})
+    return view, values[-28:]
+
+
+def test_forecast_repeats_the_last_week(tmp_path):
+    view, values = make_view(tmp_path)
+    rows = view.forecast(COUNTER, HORIZON)
+    last_week = values[-7:]
+
+    assert len(rows) == HORIZON
+    for day, row in enumerate(rows):
+        assert row["lag_7d"] == last_week[day % 7]
+        assert row["rolling_7d"] == round(float(np.mean(last_week)), 2)
+        # observed values 28 days back, for the whole horizon (< 28 days)
+        assert row["lag_28d"] == values[day]
+    # the second week reads the filled first week
+    assert [r["lag_7d"] for r in rows[7:14]] == [r["lag_7d"] for r in rows[:7]]
+
+
+def test_forecast_leaves_the_state_unchanged(tmp_path):
+    view, _ = make_view(tmp_path)
+    before = view.states[COUNTER].to_record(COUNTER)
+    _ = view.forecast(COUNTER, HORIZON)
+    assert view.states[COUNTER].to_record(COUNTER) == before
+    assert view.forecast(COUNTER, 1) == [view.get(COUNTER)]
+
+
+def test_forecast_from_a_later_start_skips_the_missing_days(tmp_path):
+    view, _ = make_view(tmp_path)
+    rows = view.forecast(COUNTER, HORIZON)
+    # two days not ingested yet between the last date and the start
+    later = view.forecast(COUNTER, HORIZON - 2, start="2024-04-03")
+    assert later == rows[2:]
+
+
+def test_forecast_survives_save_and_load(tmp_path):
+    view, _ = make_view(tmp_path)
+    _ = view.save()
+    loaded = OnlineFeatureView.load(view.path)
+    assert loaded.forecast(COUNTER, HORIZON) == view.forecast(COUNTER, HORIZON)
+
+
+def test_unknown_counter_has_nan_features(tmp_path):
+    view, _ = make_view(tmp_path)
+    rows = view.forecast("unknown", HORIZON)
+    assert len(rows) == HORIZON
+    assert all(np.isnan(value) for row in rows for value in row.values())
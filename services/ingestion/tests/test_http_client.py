@@ -0,0 +1,63 @@
+"""
+HTTPClient.get_json raises on error statuses instead of returning their body, and caches successes only.
+"""
+
+import pytest
+import requests
+
+import rate_limiter
+from http_client import HTTPClient
+from mock_server import MockAPI, MockServer
+from response_cache import ResponseCache
+from weather_client import WeatherClient
+
+
+@pytest.fixture
+def server():
+    srv = MockServer(MockAPI(counters=2)).start()
+    yield srv
+    srv.stop()
+
+
+def make_client(tmp_path):
+    return HTTPClient(
+        max_retries=1, backoff_factor=0, cache=ResponseCache(tmp_path / "cache")
+    )
+
+
+def test_error_status_raises_and_is_not_cached(server, tmp_path):
+    http_client = make_client(tmp_path)
+    url = f"{server.url}/unknown"
+    with pytest.raises(requests.HTTPError):
+        _ = http_client.get_json(url)
+    assert http_client.cache.get(url, None) is None
+
+
+def test_server_errors_raise_after_the_retries(server, tmp_path):
+    server.api.error_rate = 1
+    with pytest.raises(requests.HTTPError):
+        _ = make_client(tmp_path).get_json(f"{server.url}/ecocounter?limit=10")
+    # the first request and its retry
+    assert server.api.stats["errors"] == 2
+
+
+def test_success_is_cached(server, tmp_path):
+    http_client = make_client(tmp_path)
+    url = f"{server.url}/ecocounter?limit=10"
+    body = http_client.get_json(url)
+    assert len(body) == 2
+    assert http_client.cache.get(url, None) == body
+
+
+def test_weather_errors_become_error_bodies(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limiter.open_meteo_limiter, "buckets", [])
+    server.api.error_rate = 1
+    weather_client = WeatherClient(make_client(tmp_path))
+    bodies = weather_client.get(
+        f"{server.url}/v1/archive?start_date=2024-01-01&end_date=2024-01-02&hourly=rain",
+        [(43.61, 3.87), (43.62, 3.88)],
+        2,
+        1,
+    )
+    assert len(bodies) == 2
+    assert all(body["error"] for body in bodies)
@@ -0,0 +1,155 @@
+"""
+The Polars lazy engine (polars_transformer.LazyDataTransformer) must return exactly the same frames
+as the pandas DataTransformer for the backfill chain.
+
+    uv run --extra polars pytest
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+_ = pytest.importorskip("polars")
+
+from config import BEST_COUNTERS_COUNT  # noqa: E402
+from counter_quality import score_counters  # noqa: E402
+from data_transformer import DataTransformer  # noqa: E402
+from polars_transformer import LazyDataTransformer  # noqa: E402
+
+DAYS = 60
+SHORT_DAYS = 20
+# distinct counters, then counters with the same series (tied scores), then a counter seen fewer than 28 days
+DISTINCT = 4
+TIED = 8
+SHORT_COUNTER = f"urn:ngsi-ld:EcoCounter:X2H{DISTINCT + TIED:08d}"
+# a counter whose rounded location has no weather at all
+NO_WEATHER_COUNTER = "urn:ngsi-ld:EcoCounter:X2H00000000"
+
+
+def make_inputs():
+    rng = np.random.default_rng(7)
+    ids = [f"urn:ngsi-ld:EcoCounter:X2H{i:08d}" for i in range(DISTINCT + TIED + 1)]
+    coordinates = [
+        (43.6 + i / 100 + 0.001, 3.8 + i / 100 + 0.002) for i in range(len(ids))
+    ]
+    counters_df = pd.DataFrame(
+        {
+            "id": ids,
+            "coordinates": coordinates,
+            "rounded_coordinates": [(round(x, 2), round(y, 2)) for x, y in coordinates],
+        }
+    )
+
+    timestamps = pd.date_range("2024-01-01", periods=DAYS * 4, freq="6h")
+    stamps = timestamps.strftime("%Y-%m-%dT%H:%M:%S.000Z").to_numpy()
+    tied_series = rng.integers(0, 400, len(stamps)) * (rng.random(len(stamps)) > 0.5)
+    frames = []
+    for i, counter_id in enumerate(ids):
+        if i < DISTINCT:
+            intensity = rng.integers(20, 150, len(stamps))
+            counter_stamps = stamps
+        elif counter_id == SHORT_COUNTER:
+            intensity = rng.integers(0, 150, SHORT_DAYS * 4)
+            counter_stamps = stamps[-SHORT_DAYS * 4 :]
+        else:
+            intensity = tied_series
+            counter_stamps = stamps
+        # missing hours
+        kept = np.arange(len(counter_stamps)) % 37 != 5
+        frames.append(
+            pd.DataFrame(
+                {
+                    "id": counter_id,
+                    "datetime": counter_stamps[kept],
+                    "intensity": intensity[kept],
+                }
+            )
+        )
+    historical_data = pd.concat(frames, ignore_index=True)
+    # duplicated rows
+    historical_data = pd.concat(
+        [historical_data, historical_data.iloc[::53]], ignore_index=True
+    )
+
+    locations = list(dict.fromkeys(counters_df["rounded_coordinates"]))[1:]
+    weather_days = pd.date_range("2024-01-01", periods=DAYS, freq="D")
+    weather_data = pd.DataFrame(
+        {
+            "rounded_latitude": np.repeat([x for x, _ in locations], DAYS),
+            "rounded_longitude": np.repeat([y for _, y in locations], DAYS),
+            "date": np.tile(weather_days, len(locations)),
+            "temperature": rng.normal(15, 8, len(locations) * DAYS).astype(np.float32),
+            "rain": (
+                rng.exponential(2, len(locations) * DAYS)
+                * (rng.random(len(locations) * DAYS) < 0.3)
+            ).astype(np.float32),
+        }
+    )
+    # days without weather
+    weather_data = weather_data.drop(index=weather_data.index[3::11]).reset_index(
+        drop=True
+    )
+    return historical_data, counters_df, weather_data
+
+
+def run_chain(transformer, historical_data, counters_df, weather_data):
+    return (
+        transformer.load_historical_df(historical_data.copy())
+        .load_counters_df(counters_df)
+        .add_coordinates()
+        .apply_basic_transformations()
+        .convert_to_daily_values()
+        .add_features()
+        .load_weather_df(weather_data)
+        .add_weather()
+        .clean()
+        .keep_top_counters()
+        .convert_date_to_string()
+    )
+
+
+@pytest.fixture(scope="module")
+def transformers():
+    inputs = make_inputs()
+    expected = run_chain(DataTransformer(), *inputs)
+    result = run_chain(LazyDataTransformer(), *inputs)
+    _ = result.collect()
+    return expected, result
+
+
+def test_daily_frames_match(transformers):
+    expected, result = transformers
+    pd.testing.assert_frame_equal(result.df, expected.df, check_exact=True)
+
+
+def test_counter_aggregates_match(transformers):
+    expected, result = transformers
+    pd.testing.assert_frame_equal(
+        result.counter_aggregates, expected.counter_aggregates, check_exact=True
+    )
+
+
+def test_best_counters_match(transformers):
+    expected, result = transformers
+    pd.testing.assert_frame_equal(
+        result.best_counters, expected.best_counters, check_exact=True
+    )
+
+
+def test_short_counter_is_kept(transformers):
+    expected, _ = transformers
+    short = expected.df[expected.df["counter_id"] == SHORT_COUNTER]
+    assert 0 < len(short) < 28
+
+
+def test_missing_weather_is_filled(transformers):
+    expected, _ = transformers
+    no_weather = expected.df[expected.df["counter_id"] == NO_WEATHER_COUNTER]
+    assert len(no_weather) > 0
+    assert (no_weather["rain"] == 0).all()
+
+
+def test_selection_cuts_through_tied_scores(transformers):
+    expected, _ = transformers
+    scores = score_counters(expected.counter_aggregates)["score"]
+    assert scores[BEST_COUNTERS_COUNT - 1] == scores[BEST_COUNTERS_COUNT]
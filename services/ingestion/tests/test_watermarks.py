@@ -0,0 +1,154 @@
+"""
+Counter watermarks: computed from the watermark table or the history, advanced after each update,
+and moved past the fetched window for counters whose first fetch returns nothing.
+"""
+
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+from common.database.local import LocalClient  # pyright: ignore[reportMissingTypeStubs]
+
+import api_fetcher
+import db_handler
+import forecast_handler
+import rate_limiter
+from config import HISTORY_YEARS
+from mock_server import MockAPI, MockServer
+from pipeline import IngestionPipeline
+from weather_store import WeatherStore
+
+YESTERDAY = str(date.today() - timedelta(1))
+INGESTED = "urn:ngsi-ld:EcoCounter:MOCK000000"
+NEW = "urn:ngsi-ld:EcoCounter:MOCK000001"
+EMPTY = "urn:ngsi-ld:EcoCounter:MOCK000002"
+# answered with an error status
+FAILING = "urn:ngsi-ld:EcoCounter:MOCK000003"
+
+
+@pytest.fixture(scope="module")
+def server():
+    api = MockAPI(counters=4)
+    timeseries = api.timeseries
+
+    def without_empty_counter(counter_id, from_date, to_date):
+        if counter_id == EMPTY:
+            return {"entityId": counter_id, "index": [], "values": []}
+        if counter_id == FAILING:
+            raise ValueError("Unknown counter")
+        return timeseries(counter_id, from_date, to_date)
+
+    api.timeseries = without_empty_counter
+    srv = MockServer(api).start()
+    yield srv
+    srv.stop()
+
+
+@pytest.fixture
+def pipeline(server, tmp_path, monkeypatch):
+    for module in (api_fetcher, forecast_handler):
+        for name in [
+            "ECOCOUNTER_API_URL",
+            "OPEN_METEO_ARCHIVE_URL",
+            "OPEN_METEO_FORECAST_URL",
+        ]:
+            if hasattr(module, name):
+                monkeypatch.setattr(module, name, server.url)
+    monkeypatch.setattr(rate_limiter.open_meteo_limiter, "buckets", [])
+
+    pipeline = IngestionPipeline()
+    pipeline.db_handler.client = LocalClient()
+    pipeline.api_fetcher.weather_store = WeatherStore(tmp_path / "weather.sqlite")
+    pipeline.feature_view.path = tmp_path / "features.json"
+    return pipeline
+
+
+def history(counter_id, days):
+    return [{"counter_id": counter_id, "date": day, "intensity": 100} for day in days]
+
+
+def test_watermarks_fall_back_to_the_history(pipeline):
+    db_handler = pipeline.db_handler
+    _ = db_handler.upsert(
+        history(INGESTED, ["2024-01-01", "2024-01-03"])
+        + history(NEW, ["2024-01-01", "2024-01-02"])
+    )
+    _ = db_handler.upsert_watermarks(
+        [{"counter_id": INGESTED, "last_date": "2024-01-05"}]
+    )
+
+    watermarks = db_handler.select_watermarks([INGESTED, NEW, EMPTY]).watermarks
+    # the watermark table wins over the history, counters without any row have no watermark
+    assert watermarks == {INGESTED: "2024-01-05", NEW: "2024-01-02"}
+
+
+def test_watermarks_of_many_counters_are_read_by_pages(pipeline, monkeypatch):
+    monkeypatch.setattr(db_handler, "PAGE_SIZE", 5)
+    recent = [str(date(2024, 2, 1) + timedelta(day)) for day in range(20)]
+    _ = pipeline.db_handler.upsert(
+        history(INGESTED, recent) + history(NEW, ["2024-01-01", "2024-01-10"])
+    )
+
+    watermarks = pipeline.db_handler.select_watermarks([INGESTED, NEW]).watermarks
+    # the first page holds only rows of the most recent counter
+    assert watermarks == {INGESTED: recent[-1], NEW: "2024-01-10"}
+
+
+def test_advance_watermarks_to_the_last_dates(pipeline):
+    df = pd.DataFrame(history(INGESTED, ["2024-01-01", "2024-01-04"]))
+    df["date"] = pd.to_datetime(df["date"])
+    _ = pipeline.advance_watermarks(df, [INGESTED, EMPTY])
+
+    watermarks = pipeline.db_handler.select_watermarks([INGESTED, EMPTY]).watermarks
+    # a counter with rows keeps its last date even when it was never ingested before
+    assert watermarks == {INGESTED: "2024-01-04", EMPTY: YESTERDAY}
+
+
+def test_update_fetches_new_counters_and_their_weather_from_the_start(
+    pipeline, monkeypatch
+):
+    _ = pipeline.db_handler.upsert_watermarks(
+        [{"counter_id": INGESTED, "last_date": str(date.today() - timedelta(4))}]
+    )
+    weather_starts = []
+    fetch_weather_data = pipeline.api_fetcher.fetch_weather_data
+
+    def record_weather_start(start_date):
+        weather_starts.append(start_date)
+        return fetch_weather_data(start_date=start_date)
+
+    monkeypatch.setattr(
+        pipeline.api_fetcher, "fetch_weather_data", record_weather_start
+    )
+    _ = pipeline.update_historical_data()
+
+    assert weather_starts == [f"{HISTORY_YEARS[0]}-01-01"]
+    watermarks = pipeline.db_handler.select_watermarks(
+        [INGESTED, NEW, EMPTY, FAILING]
+    ).watermarks
+    # the failing counter gets no watermark: the next run fetches it again from the start
+    assert watermarks == {INGESTED: YESTERDAY, NEW: YESTERDAY, EMPTY: YESTERDAY}
+    rows = pipeline.db_handler.client.query(
+        "SELECT counter_id, min(date) AS first, count(*) AS days,"
+        " count(temperature) AS with_weather FROM historical_data GROUP BY counter_id"
+    ).set_index("counter_id")
+    assert str(rows.loc[NEW, "first"])[:10] == f"{HISTORY_YEARS[0]}-01-01"
+    assert rows.loc[NEW, "with_weather"] == rows.loc[NEW, "days"]
+    assert rows.loc[INGESTED, "days"] == 3
+
+
+def test_empty_counter_is_not_fetched_again(pipeline):
+    _ = pipeline.update_historical_data()
+    urls = []
+    get_json = pipeline.http_client.get_json
+
+    def record_url(url, **kwargs):
+        urls.append(url)
+        return get_json(url, **kwargs)
+
+    pipeline.http_client.get_json = record_url
+    _ = pipeline.update_historical_data()
+    # every other watermark is at yesterday
+    timeseries = [url for url in urls if "ecocounter_timeseries" in url]
+    assert len(timeseries) == 1
+    assert FAILING in timeseries[0]
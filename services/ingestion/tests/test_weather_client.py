@@ -0,0 +1,100 @@
+"""
+WeatherClient against the mock server: batches stay within the URL length and the per-request cost,
+and the answers of multi-location requests go back to the right locations.
+"""
+
+from datetime import date
+
+import pytest
+
+import rate_limiter
+from http_client import HTTPClient
+from mock_server import MockAPI, MockServer
+from rate_limiter import open_meteo_cost
+from weather_client import WeatherClient
+
+DATES = (date(2024, 1, 1), date(2024, 12, 30))
+DAYS = 365
+VARIABLES = 2
+MAX_URL_LENGTH = 400
+MAX_COST = 600
+LOCATIONS = [(round(43.5 + i / 997, 6), round(3.8 + i / 991, 6)) for i in range(40)]
+
+
+@pytest.fixture(scope="module")
+def server():
+    srv = MockServer(MockAPI(counters=1)).start()
+    yield srv
+    srv.stop()
+
+
+class RecordingHTTPClient(HTTPClient):
+    def __init__(self):
+        super().__init__(max_retries=0)
+        self.requests = []
+
+    def get_json(self, url, **kwargs):
+        self.requests.append((url, kwargs["cost"]))
+        return super().get_json(url, **kwargs)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(rate_limiter.open_meteo_limiter, "buckets", [])
+    return WeatherClient(
+        RecordingHTTPClient(), max_url_length=MAX_URL_LENGTH, max_cost=MAX_COST
+    )
+
+
+def archive_url(server):
+    return f"{server.url}/v1/archive?start_date={DATES[0]}&end_date={DATES[1]}&hourly=temperature_2m,rain"
+
+
+def test_batches_respect_the_url_length_and_the_cost(server, client):
+    # long enough for the cost, not the URL, to limit a year of two variables
+    client.max_url_length = 2000
+    batches = client.batches(archive_url(server), LOCATIONS, DAYS, VARIABLES)
+
+    assert [location for batch in batches for location in batch] == LOCATIONS
+    assert len(batches) > 1
+    for batch in batches:
+        assert len(client._url(archive_url(server), batch)) <= client.max_url_length
+        assert open_meteo_cost(DAYS, VARIABLES, len(batch)) <= MAX_COST
+    assert max(len(batch) for batch in batches) == MAX_COST // open_meteo_cost(
+        DAYS, VARIABLES
+    )
+
+
+def test_long_coordinates_are_limited_by_the_url_length(server, client):
+    batches = client.batches(archive_url(server), LOCATIONS, 1, VARIABLES)
+    assert max(len(batch) for batch in batches) < client.max_locations
+    for batch in batches:
+        assert len(client._url(archive_url(server), batch)) <= MAX_URL_LENGTH
+
+
+def test_a_location_costing_more_than_the_limit_is_fetched_alone(server, client):
+    batches = client.batches(archive_url(server), LOCATIONS[:3], 20 * 366, 20)
+    assert batches == [[location] for location in LOCATIONS[:3]]
+
+
+def test_requests_stay_within_the_limits(server, client):
+    _ = client.get_all(archive_url(server), LOCATIONS, DAYS, VARIABLES)
+
+    requests = client.http_client.requests
+    assert len(requests) == len(
+        client.batches(archive_url(server), LOCATIONS, DAYS, VARIABLES)
+    )
+    for url, cost in requests:
+        assert len(url) <= MAX_URL_LENGTH
+        assert cost <= MAX_COST
+
+
+def test_answers_map_back_to_their_locations(server, client):
+    responses = client.get_all(archive_url(server), LOCATIONS, DAYS, VARIABLES)
+
+    assert list(responses) == LOCATIONS
+    for (latitude, longitude), body in responses.items():
+        assert (body["latitude"], body["longitude"]) == (latitude, longitude)
+        # the mock weather depends on the location: a mix-up would change the values
+        expected = server.api.archive(latitude, longitude, *DATES, unixtime=False)
+        assert body["hourly"]["temperature_2m"] == expected["hourly"]["temperature_2m"]
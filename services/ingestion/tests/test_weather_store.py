@@ -0,0 +1,71 @@
+"""
+WeatherStore: expiry of forecast and recent archive rows, and archive values replacing forecasts.
+"""
+
+from datetime import date, timedelta
+
+import pandas as pd
+
+from weather_store import WeatherStore
+
+LOCATION = (43.61, 3.87)
+TODAY = date.today()
+
+
+def weather(days, temperature):
+    return pd.DataFrame(
+        {
+            "rounded_latitude": LOCATION[0],
+            "rounded_longitude": LOCATION[1],
+            "date": [str(day) for day in days],
+            "temperature": temperature,
+            "rain": 0.0,
+        }
+    )
+
+
+def temperatures(store, start, end):
+    df = store.get([LOCATION], start, end)
+    return dict(zip(df["date"].dt.date, df["temperature"]))
+
+
+def test_fresh_forecast_is_served(tmp_path):
+    store = WeatherStore(tmp_path / "weather.sqlite", forecast_ttl=3600)
+    days = [TODAY, TODAY + timedelta(1)]
+    store.put(weather(days, 12.0), "forecast")
+
+    assert temperatures(store, *days) == {day: 12.0 for day in days}
+    assert store.covered([LOCATION], *days) == {LOCATION}
+    assert store.covered([LOCATION], *days, archive_only=True) == set()
+
+
+def test_expired_forecast_is_not_served(tmp_path):
+    store = WeatherStore(tmp_path / "weather.sqlite", forecast_ttl=-1)
+    days = [TODAY, TODAY + timedelta(1)]
+    store.put(weather(days, 12.0), "forecast")
+
+    assert temperatures(store, *days) == {}
+    assert store.covered([LOCATION], *days) == set()
+
+
+def test_archive_replaces_the_forecast(tmp_path):
+    store = WeatherStore(tmp_path / "weather.sqlite", forecast_ttl=3600)
+    day = TODAY - timedelta(30)
+    store.put(weather([day], 12.0), "forecast")
+    store.put(weather([day], 9.5), "archive")
+    # a later forecast of the same day does not replace the archive value
+    store.put(weather([day], 14.0), "forecast")
+
+    assert temperatures(store, day, day) == {day: 9.5}
+    assert store.covered([LOCATION], day, day, archive_only=True) == {LOCATION}
+
+
+def test_recent_archive_days_expire_but_are_served(tmp_path):
+    store = WeatherStore(tmp_path / "weather.sqlite", archive_ttl=-1)
+    settled, recent = TODAY - timedelta(30), TODAY - timedelta(1)
+    store.put(weather([settled, recent], 10.0), "archive")
+
+    assert store.covered([LOCATION], settled, settled) == {LOCATION}
+    # the recent day may still be corrected: it is fetched again, and kept until then
+    assert store.covered([LOCATION], recent, recent) == set()
+    assert temperatures(store, settled, recent) == {settled: 10.0, recent: 10.0}
@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from predict import load_model, predict_traffic
-from common.database.database import supabase
+from common.database.database import client
 import datetime
 
 app = FastAPI()
@@ -1,6 +1,8 @@
 import pandas as pd
 import pickle
-from common.database.database import supabase
+from common.database.database import client
+from common.database.reader import read_table
+from common.schema.schema import day_keys_to_datetime, day_keys_to_iso
 import datetime
 
 def load_model():
@@ -12,42 +14,35 @@ def load_model():
 
 
 def fetch_daily_data():
-    """Récupère les données du jour depuis Supabase"""
+    """Récupère les données des jours à prévoir (aujourd'hui et les suivants) depuis Supabase"""
     today = datetime.date.today().isoformat()
     
-    daily_data = supabase.table("forecast_data") \
-        .select("*") \
-        .eq("date", today) \
-        .execute()
-    return daily_data
+    # lecture paginée : une seule requête s'arrête à la limite de lignes du serveur
+    return read_table(client, "forecast_data", since=today)
 
 
-def save_predictions_to_db(predictions, date):
-    """Sauvegarde les prédictions dans la colonne 'prevision' de la table forecast_data"""
+def save_predictions_to_db(predictions):
+    """Sauvegarde les prédictions dans la colonne 'forecast' de la table forecast_data,
+    en une seule requête pour tous les jours de l'horizon (upsert sur counter_id, date)"""
     
-    success_count = 0
-    error_count = 0
+    records = [
+        {
+            "counter_id": pred['counter_id'],
+            "date": pred['date'],
+            "forecast": int(round(pred['prediction'])),
+        }
+        for pred in predictions
+    ]
     
-    for pred in predictions:
-        counter_id = pred['counter_id']
-        forecast_value = int(round(pred['prediction']))
-        
-        try:
-            result = supabase.table("forecast_data") \
-                .update({"forecast": forecast_value}) \
-                .eq("counter_id", counter_id) \
-                .eq("date", date) \
-                .execute()
-            
-            if result.data:
-                success_count += 1
-            else:
-                error_count += 1
-                print(f"Aucune ligne trouvée pour counter_id={counter_id}, date={date}")
-        
-        except Exception as e:
-            error_count += 1
-            print(f"Erreur pour counter_id={counter_id}: {str(e)}")
+    try:
+        result = client.table("forecast_data") \
+            .upsert(records, on_conflict="counter_id,date") \
+            .execute()
+        success_count = len(result.data or [])
+    except Exception as e:
+        success_count = 0
+        print(f"Erreur lors de la sauvegarde des prédictions: {str(e)}")
+    error_count = len(records) - success_count
     
     print(f" {success_count} prédictions sauvegardées, {error_count} erreurs")
     
@@ -57,15 +52,14 @@ def save_predictions_to_db(predictions, date):
 def predict_traffic(model, save_to_db=True):
     """Génère la prédiction du trafic vélo pour la date choisie"""
     
-    daily_data = fetch_daily_data()
-    if not daily_data.data:
+    df = fetch_daily_data()
+    if df.empty:
         print(" Aucune donnée disponible")
         return []
 
-    df = pd.json_normalize(daily_data.data)
-
-    # Suavegarde de counter_id avant conversion
+    # Suavegarde de counter_id et de la date avant conversion
     counter_original = df['counter_id'].copy()
+    date_original = day_keys_to_iso(df['date'])
     print(f"\n📋 Nombre de lignes: {len(df)}")
     print(f"📋 Compteurs: {df['counter_id'].unique()[:3]}...")
     
@@ -73,7 +67,7 @@ def predict_traffic(model, save_to_db=True):
     if 'hour' not in df.columns:
         # Option 1: Si vous avez une colonne datetime
         if 'date' in df.columns:
-            df['date'] = pd.to_datetime(df['date'])
+            df['date'] = day_keys_to_datetime(df['date'])
             df['hour'] = df['date'].dt.hour
         # Option 2: Si vous voulez prédire pour une heure spécifique (ex: midi)
         else:
@@ -100,13 +94,13 @@ def predict_traffic(model, save_to_db=True):
     print(f" Shape de X: {X.shape} (devrait être (n, 5))")
     df["prediction"] = model.predict(X)
     df['counter_id'] = counter_original
+    df['date'] = date_original
 
-    predictions = df[["counter_id", "prediction"]].to_dict(orient="records")
+    predictions = df[["counter_id", "date", "prediction"]].to_dict(orient="records")
     
     # Sauvegarder les prédictions dans la base de données
     if save_to_db and predictions:
-        today = datetime.date.today().isoformat()
-        success, errors = save_predictions_to_db(predictions, today)
+        success, errors = save_predictions_to_db(predictions)
         print(f"Résultat de la sauvegarde: {success} succès, {errors} erreurs")
     
     return predictions
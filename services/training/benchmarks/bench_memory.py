@@ -0,0 +1,116 @@
+"""
+Compare le pic de mémoire résidente et la durée de l'entraînement en mémoire (DataFrame complet,
+XGBRegressor.fit) et par lots (QuantileDMatrix, ExtMemQuantileDMatrix), sur une table historical_data
+synthétique dans une base DuckDB locale. Chaque mode tourne dans son propre processus.
+
+    uv run benchmarks/bench_memory.py --counters 300 --days 1460
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import duckdb
+
+TRAINING_DIR = Path(__file__).resolve().parent.parent
+
+# mêmes modules chargés dans chaque mode, avant de mesurer la mémoire de départ
+PRELUDE = """
+import numpy as np
+import pyarrow.parquet
+from common.database.storage import create_storage_client
+from pipeline.data_loader import load_data_from_supabase
+from pipeline.streaming import peak_rss_mib, train_streaming
+create_storage_client()
+BASE = peak_rss_mib()
+"""
+
+# chemin actuel : tout l'historique dans un DataFrame
+MEMORY = """
+from pipeline.preprocessing import preprocess, split_data
+from pipeline.train import train_model
+X, y = preprocess(load_data_from_supabase())
+X_train, X_val, X_test, y_train, y_val, y_test = split_data(X, y)
+model, rmse = train_model(X_train, y_train)
+preds = model.predict(X_val)
+"""
+
+STREAMING = """
+model, rmse, y_val, preds = train_streaming("table", external={external})
+"""
+
+REPORT = """
+import json
+val_rmse = float(np.sqrt(np.mean((np.asarray(y_val, dtype=float) - preds) ** 2)))
+print("RESULT " + json.dumps({"rows": len(y_val), "rmse": val_rmse, "base": BASE, "peak": peak_rss_mib(), "time": time.perf_counter() - START}))
+"""
+
+
+def make_table(path, counters, days):
+    connection = duckdb.connect(str(path))
+    connection.execute(
+        f"""
+        CREATE TABLE historical_data AS
+        SELECT
+            'urn:ngsi-ld:EcoCounter:X2H' || lpad(c::VARCHAR, 8, '0') AS counter_id,
+            [43.6 + c / 1000, 3.8 + c / 1000] AS coordinates,
+            [round(43.6 + c / 1000, 2), round(3.8 + c / 1000, 2)] AS rounded_coordinates,
+            d::DATE AS date,
+            year(d) AS year, month(d) AS month, day(d) AS day,
+            isodow(d) - 1 AS weekday, (isodow(d) >= 6)::BIGINT AS is_weekend,
+            round(500 + (hash(c, d, 1) % 2000), 2)::DOUBLE AS rolling_7d,
+            round(500 + (hash(c, d, 2) % 2000), 2)::DOUBLE AS rolling_28d,
+            (hash(c, d, 3) % 3000)::BIGINT AS lag_7d,
+            (hash(c, d, 4) % 3000)::BIGINT AS lag_28d,
+            round((hash(c, d, 5) % 3000) / 100, 2)::DOUBLE AS temperature,
+            round((hash(c, d, 6) % 500) / 100, 2)::DOUBLE AS rain,
+            0::BIGINT AS is_rainy,
+            (100 + c * 3 + (isodow(d) < 6)::INT * 800 + hash(c, d) % 400)::BIGINT AS intensity
+        FROM range({counters}) AS t(c),
+            generate_series(DATE '2020-01-01', DATE '2020-01-01' + INTERVAL {days - 1} DAY, INTERVAL 1 DAY) AS s(d)
+        """
+    )
+    rows = connection.execute("SELECT COUNT(*) FROM historical_data").fetchone()[0]
+    connection.close()
+    return rows
+
+
+def run_mode(code, database, workdir):
+    env = {**os.environ, "STORAGE_BACKEND": "local", "LOCAL_DATABASE_PATH": str(database)}
+    script = "import sys, time\nSTART = time.perf_counter()\n" + f"sys.path.insert(0, {str(TRAINING_DIR)!r})\n" + PRELUDE + code + REPORT
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=workdir, env=env, capture_output=True, text=True
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith("RESULT "):
+            return json.loads(line[len("RESULT "):])
+    raise RuntimeError(result.stderr[-2000:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--counters", type=int, default=300)
+    parser.add_argument("--days", type=int, default=1460)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = Path(workdir) / "bench.duckdb"
+        rows = make_table(database, args.counters, args.days)
+        print(f"{rows} lignes ({args.counters} compteurs x {args.days} jours)")
+        print(f"{'mode':>10}{'pic RSS (Mio)':>15}{'dont données':>14}{'durée (s)':>11}{'RMSE val':>10}{'lignes val':>12}")
+        modes = {
+            "memory": MEMORY,
+            "quantile": STREAMING.format(external=False),
+            "external": STREAMING.format(external=True),
+        }
+        for mode, code in modes.items():
+            result = run_mode(code, database, workdir)
+            print(f"{mode:>10}{result['peak']:>15.0f}{result['peak'] - result['base']:>14.0f}{result['time']:>11.1f}{result['rmse']:>10.1f}{result['rows']:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compare la recherche d'hyperparamètres avec un seul processus (XGBoost sur tous les cœurs) et avec
+un pool de processus (cœurs répartis entre eux), sur des données synthétiques. Chaque essai part d'un
+cache vide ; la meilleure configuration doit être la même quel que soit le nombre de processus.
+
+    uv run benchmarks/bench_search.py --rows 50000 --strategy random --workers 1 4 8
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pipeline.search import available_cpus, search_hyperparams  # noqa: E402
+
+
+def make_data(rows):
+    rng = np.random.default_rng(42)
+    X = pd.DataFrame({
+        "counter_id": rng.integers(0, 60, rows).astype(np.int8),
+        "rolling_7d": rng.uniform(0, 3000, rows).astype(np.float32),
+        "rolling_28d": rng.uniform(0, 3000, rows).astype(np.float32),
+        "lag_7d": rng.integers(0, 3000, rows).astype(np.int32),
+        "temperature": rng.uniform(-5, 35, rows).astype(np.float32),
+        "weekday": rng.integers(0, 7, rows).astype(np.int8),
+    })
+    y = (0.6 * X["rolling_7d"] + 0.3 * X["lag_7d"] - 400 * (X["weekday"] >= 5) + rng.normal(0, 150, rows)).astype(np.float32)
+    split = int(rows * 0.8)
+    return X[:split], y[:split], X[split:], y[split:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--strategy", default="random", choices=["grid", "random", "halving"])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, available_cpus()])
+    args = parser.parse_args()
+
+    X_train, y_train, X_val, y_val = make_data(args.rows)
+    print(f"{args.rows} lignes, recherche {args.strategy}, {available_cpus()} cœurs")
+    print(f"{'processus':>10}{'durée (s)':>11}{'RMSE val':>10}  paramètres")
+    best = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as search_dir:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                params = search_hyperparams(
+                    X_train, y_train, X_val, y_val,
+                    strategy=args.strategy, workers=workers, search_dir=Path(search_dir)
+                )
+            elapsed = time.perf_counter() - start
+        rmse = [line for line in output.getvalue().splitlines() if line.startswith("Meilleurs")][0]
+        rmse = rmse.split("RMSE val ")[1].split(")")[0]
+        print(f"{workers:>10}{elapsed:>11.1f}{rmse:>10}  {params}")
+        assert best is None or params == best, "la meilleure configuration dépend du nombre de processus"
+        best = params
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
 DATA_DIR = BASE_DIR / "data/raw"
 MODEL_DIR = BASE_DIR.parent / "models"
 OUTPUT_DIR = BASE_DIR.parent / "outputs"
+# Instantané local de la matrice de features (voir snapshot.py)
+SNAPSHOT_DIR = BASE_DIR.parent / ".cache" / "snapshot"
+# Lots préparés et cache XGBoost de l'entraînement par lots (voir streaming.py)
+STREAMING_DIR = BASE_DIR.parent / ".cache" / "streaming"
 
 # Colonnes et features
 TARGET_COLUMN = "intensity"  
@@ -33,12 +38,22 @@ RANDOM_SEED = 42
 TEST_SIZE = 0.2
 VALIDATION_SIZE = 0.2
 
+# Mode d'entraînement :
+# - "memory" : toutes les lignes dans un DataFrame (XGBRegressor.fit)
+# - "quantile" : QuantileDMatrix construite lot par lot, seules les données quantifiées restent en mémoire
+# - "external" : ExtMemQuantileDMatrix, les pages quantifiées restent sur disque dans STREAMING_DIR
+TRAINING_MODE = os.getenv("TRAINING_MODE", "memory")
+# Source des lots : "table" (lecture paginée de la base) ou "snapshot" (instantané Parquet local)
+TRAINING_SOURCE = os.getenv("TRAINING_SOURCE", "table")
+BATCH_ROWS = 100_000
+
 # XGBoost
 MODEL_TYPE = "XGBoost"
+# Paramètres par défaut, remplacés par ceux de la recherche quand elle est lancée
 XGB_PARAMS = {
-    "n_estimators": 100,
+    "n_estimators": 300,
     "max_depth": 6,
-    "learning_rate": 0.1,
+    "learning_rate": 0.05,
     "subsample": 0.8,
     "colsample_bytree": 0.8,
     "random_state": RANDOM_SEED
@@ -52,3 +67,13 @@ HYPERPARAM_GRID = {
     "subsample": [0.7, 0.8, 1.0],
     "colsample_bytree": [0.7, 0.8, 1.0]
 }
+# Recherche (voir search.py) : "none", "grid" (toute la grille), "random" (SEARCH_TRIALS configurations
+# tirées dans la grille) ou "halving" (successive halving sur toute la grille)
+HYPERPARAM_SEARCH = os.getenv("HYPERPARAM_SEARCH", "none")
+SEARCH_TRIALS = 20
+HALVING_FACTOR = 3  # part des configurations gardées à chaque tour, et facteur d'augmentation des lignes
+HALVING_MIN_ROWS = 1000
+EARLY_STOPPING_ROUNDS = 20
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "0"))  # 0 : un processus par cœur
+# Évaluations déjà faites, pour reprendre une recherche interrompue
+SEARCH_DIR = BASE_DIR.parent / ".cache" / "search"
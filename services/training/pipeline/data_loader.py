@@ -1,28 +1,34 @@
-import os
 from dotenv import load_dotenv
 import pandas as pd
-from supabase import create_client, Client
+from common.database.reader import read_table
+from common.database.storage import create_storage_client
+from common.schema.schema import compact, memory_per_million_rows
 
 
 load_dotenv()
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 TARGET_COLUMN = "intensity"
 
 
-def load_data_from_supabase(table_name="historical_data") -> pd.DataFrame:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+def load_data_from_supabase(table_name="historical_data", since=None, client=None) -> pd.DataFrame:
+    # Supabase ou base DuckDB locale selon STORAGE_BACKEND
+    client = client or create_storage_client()
     
-    response = supabase.table(table_name).select("*").execute()
+    # Lecture paginée : un seul select("*") ne renvoie que la première page (1000 lignes)
+    # avec 'since', seulement les lignes datées de ce jour ou après : un résultat vide est alors normal
+    df = read_table(client, table_name, since=since, typed=False)
     
-    # Vérifier que la réponse contient bien des données
-    if not hasattr(response, "data") or response.data is None:
+    if df.empty:
+        if since is not None:
+            return df
         raise Exception("Erreur lors du chargement des données depuis Supabase")
     
-    df = pd.DataFrame(response.data)
-    
     if TARGET_COLUMN not in df.columns:
         raise KeyError(f"La colonne '{TARGET_COLUMN}' n'existe pas dans la table Supabase")
     
+    # Types compacts partagés entre les services (voir common.schema)
+    raw_memory = memory_per_million_rows(df)
+    df = compact(df)
+    print(f"Mémoire : {memory_per_million_rows(df):.0f} Mo par million de lignes ({raw_memory:.0f} avant compactage)")
+    
     return df
@@ -18,12 +18,17 @@ def evaluate_model(model, X, y, baseline=True, figure_dir="figures"):
         dict: métriques
     """
 
-    os.makedirs(figure_dir, exist_ok=True)
-
-
     # Prédictions du modèle
 
     preds = model.predict(X)
+    return evaluate_predictions(y, preds, baseline=baseline, figure_dir=figure_dir)
+
+def evaluate_predictions(y, preds, baseline=True, figure_dir="figures"):
+    """
+    Métriques et figures de prédictions déjà calculées (voir evaluate_model).
+    """
+
+    os.makedirs(figure_dir, exist_ok=True)
 
     # Filtrer y > 0 pour MAPE
     mask = y > 0
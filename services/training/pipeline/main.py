@@ -1,26 +1,51 @@
-from pipeline.data_loader import load_data_from_supabase
-from pipeline.preprocessing import preprocess, split_data
+from pipeline.config import TRAINING_MODE, TRAINING_SOURCE, HYPERPARAM_SEARCH, XGB_PARAMS
+from pipeline.snapshot import load_features
+from pipeline.preprocessing import split_data
+from pipeline.search import search_hyperparams
+from pipeline.streaming import train_streaming, peak_rss_mib
 from pipeline.train import train_model
-from pipeline.evaluate import evaluate_model
-from pipeline.save import save_model, save_metrics
+from pipeline.evaluate import evaluate_model, evaluate_predictions
+from pipeline.save import save_model, save_metrics, save_params
 
 def main():
-    print("Chargement des données depuis Supabase...")
-    df = load_data_from_supabase()
+    if TRAINING_MODE == "memory":
+        # Seules les lignes postérieures à l'instantané local sont chargées depuis Supabase
+        print("Chargement des features...")
+        X, y = load_features()
 
-    print("Préprocessing...")
-    X, y = preprocess(df)
+        print("Split train/val/test...")
+        X_train, X_val, X_test, y_train, y_val, y_test = split_data(X, y)
 
-    print("Split train/val/test...")
-    X_train, X_val, X_test, y_train, y_val, y_test = split_data(X, y)
+        params = XGB_PARAMS
+        if HYPERPARAM_SEARCH != "none":
+            print(f"Recherche d'hyperparamètres ({HYPERPARAM_SEARCH})...")
+            params = search_hyperparams(X_train, y_train, X_val, y_val)
+            save_params(params)
 
-    print("Entraînement du modèle...")
-    model, rmse = train_model(X_train, y_train)
-    print(f"RMSE train: {rmse:.2f}")
+        print("Entraînement du modèle...")
+        model, rmse = train_model(X_train, y_train, params)
+        print(f"RMSE train: {rmse:.2f}")
 
-    print("Évaluation...")
-    metrics = evaluate_model(model, X_val, y_val)
+        print("Évaluation...")
+        if HYPERPARAM_SEARCH != "none":
+            # la validation a servi à choisir les paramètres : le modèle est évalué sur le test
+            metrics = evaluate_model(model, X_test, y_test)
+        else:
+            metrics = evaluate_model(model, X_val, y_val)
+    elif TRAINING_MODE in ("quantile", "external"):
+        if HYPERPARAM_SEARCH != "none":
+            raise ValueError("La recherche d'hyperparamètres nécessite TRAINING_MODE=memory")
+        # L'historique est lu et quantifié par lots, sans jamais être chargé en entier
+        print(f"Entraînement par lots ({TRAINING_MODE}, source {TRAINING_SOURCE})...")
+        model, rmse, y_val, preds = train_streaming(TRAINING_SOURCE, external=TRAINING_MODE == "external")
+        print(f"RMSE train: {rmse:.2f}")
+
+        print("Évaluation...")
+        metrics = evaluate_predictions(y_val, preds)
+    else:
+        raise ValueError(f"TRAINING_MODE inconnu : {TRAINING_MODE}")
     print(metrics)
+    print(f"Pic de mémoire : {peak_rss_mib():.0f} Mio")
 
     save_model(model)
     save_metrics(metrics)
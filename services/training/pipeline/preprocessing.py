@@ -1,5 +1,6 @@
 import pandas as pd
 from sklearn.model_selection import train_test_split
+from common.schema.schema import compact, day_keys_to_datetime
 from .config import (
     TARGET_COLUMN, FEATURE_COLUMNS, DATE_COLUMN,
     CATEGORICAL_COLUMNS, DATE_FEATURES,
@@ -11,13 +12,17 @@ def extract_date_features(df, date_column=DATE_COLUMN):
     if date_column not in df.columns:
         raise KeyError(f"Colonne {date_column} introuvable dans le dataframe")
     
-    df[date_column] = pd.to_datetime(df[date_column])
+    # Les dates compactes sont des numéros de jour (int32)
+    if pd.api.types.is_integer_dtype(df[date_column]):
+        df[date_column] = day_keys_to_datetime(df[date_column])
+    else:
+        df[date_column] = pd.to_datetime(df[date_column])
     df["year"] = df[date_column].dt.year
     df["month"] = df[date_column].dt.month
     df["day"] = df[date_column].dt.day
     df["hour"] = df[date_column].dt.hour
     df["weekday"] = df[date_column].dt.weekday
-    return df
+    return compact(df)
 
 # Préparation pour XGBoost
 def prepare_features_for_xgboost(X, keep_ids=True):
@@ -50,9 +55,8 @@ def prepare_features_for_xgboost(X, keep_ids=True):
 
     return X
 
-# Préprocessing complet
-def preprocess(df, keep_ids=True):
-    print("Préprocessing des données...")
+# Sélection et typage des features, avant l'encodage pour XGBoost
+def select_features(df):
     df = extract_date_features(df)
 
     # Sélection des features
@@ -68,7 +72,7 @@ def preprocess(df, keep_ids=True):
             X[col] = X[col].astype("category")
 
     # Remplissage des NaN pour colonnes numériques
-    numeric_cols = X.select_dtypes(include=["int64","float64"]).columns
+    numeric_cols = X.select_dtypes(include="number").columns
     X[numeric_cols] = X[numeric_cols].fillna(0)
 
     # Vérification finale
@@ -77,6 +81,12 @@ def preprocess(df, keep_ids=True):
     print("\n=== Types de données après preprocessing ===")
     print(X.dtypes)
     print(f"\nShape: {X.shape}")
+    return X, y
+
+# Préprocessing complet
+def preprocess(df, keep_ids=True):
+    print("Préprocessing des données...")
+    X, y = select_features(df)
 
     # Préparation finale pour XGBoost
     X = prepare_features_for_xgboost(X, keep_ids=keep_ids)
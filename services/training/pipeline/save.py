@@ -16,3 +16,9 @@ def save_metrics(metrics, path="models/metrics.json"):
     with open(path, "w") as f:
         json.dump(metrics, f, indent=4)
     print(f"Métriques sauvegardées dans {path}")
+
+def save_params(params, path="models/best_params.json"):
+    Path(path).parent.mkdir(exist_ok=True, parents=True)
+    with open(path, "w") as f:
+        json.dump(params, f, indent=4)
+    print(f"Paramètres sauvegardés dans {path}")
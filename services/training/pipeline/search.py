@@ -0,0 +1,165 @@
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from .config import (
+    HYPERPARAM_GRID, HYPERPARAM_SEARCH, XGB_PARAMS, RANDOM_SEED,
+    SEARCH_TRIALS, HALVING_FACTOR, HALVING_MIN_ROWS, EARLY_STOPPING_ROUNDS,
+    SEARCH_WORKERS, SEARCH_DIR
+)
+
+# Recherche d'hyperparamètres dans HYPERPARAM_GRID, en parallèle sur un pool de processus.
+# Chaque configuration est entraînée avec arrêt précoce sur la validation : n_estimators est un maximum,
+# le nombre d'arbres retenu est celui de la meilleure itération.
+# Les cœurs sont répartis entre les processus : autant de processus que de configurations à évaluer
+# (au plus un par cœur), chacun avec cœurs / processus threads XGBoost, sans surcharger la machine.
+# Chaque évaluation terminée est ajoutée au cache de SEARCH_DIR (un fichier par jeu de données) :
+# une recherche interrompue reprend sans refaire les évaluations déjà faites.
+
+# Données de chaque processus de la recherche, reçues une seule fois (voir init_worker)
+DATA = {}
+
+
+def init_worker(X_train, y_train, X_val, y_val):
+    DATA.update(X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val)
+    # ordre fixe des lignes pour les budgets partiels du successive halving
+    DATA["order"] = np.random.default_rng(RANDOM_SEED).permutation(len(X_train))
+
+
+def evaluate_config(params, rows, nthread):
+    start = time.perf_counter()
+    X, y = DATA["X_train"], DATA["y_train"]
+    if rows < len(X):
+        index = np.sort(DATA["order"][:rows])
+        X, y = X.iloc[index], y.iloc[index]
+    model = xgb.XGBRegressor(
+        **{**XGB_PARAMS, **params},
+        n_jobs=nthread,
+        early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+        eval_metric="rmse",
+        enable_categorical=True
+    )
+    model.fit(X, y, eval_set=[(DATA["X_val"], DATA["y_val"])], verbose=False)
+    return {
+        "rmse": float(model.best_score),
+        "n_estimators": int(model.best_iteration) + 1,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def grid_configs(grid=HYPERPARAM_GRID):
+    return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def fingerprint(*frames):
+    # empreinte des données : le cache ne sert que pour les mêmes lignes de train et de validation
+    digest = hashlib.sha256()
+    for frame in frames:
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def cache_key(params, rows):
+    return json.dumps({"params": params, "rows": rows, "early_stopping": EARLY_STOPPING_ROUNDS}, sort_keys=True)
+
+
+def load_cache(path):
+    if not path.exists():
+        return {}
+    cache = {}
+    for line in path.read_text().splitlines():
+        # une ligne tronquée par une interruption est ignorée
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        cache[entry["key"]] = entry["result"]
+    return cache
+
+
+def run_round(executor, workers, configs, rows, cache, cache_path):
+    results = {}
+    todo = []
+    for i, params in enumerate(configs):
+        key = cache_key(params, rows)
+        if key in cache:
+            results[i] = cache[key]
+        else:
+            todo.append(i)
+    if todo:
+        # moins de tâches que de processus : les cœurs libres vont aux threads XGBoost
+        nthread = max(1, available_cpus() // min(workers, len(todo)))
+        futures = {executor.submit(evaluate_config, configs[i], rows, nthread): i for i in todo}
+        with open(cache_path, "a") as f:
+            for future in as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                key = cache_key(configs[i], rows)
+                cache[key] = results[i]
+                f.write(json.dumps({"key": key, "result": results[i]}) + "\n")
+                f.flush()
+    return [results[i] for i in range(len(configs))], len(configs) - len(todo)
+
+
+# Successive halving : toutes les configurations sur peu de lignes, puis les meilleures
+# (1 / HALVING_FACTOR) sur HALVING_FACTOR fois plus de lignes, jusqu'à toutes les lignes.
+# Autant de tours que nécessaire pour n'en garder qu'une, mais le premier budget doit rester
+# d'au moins HALVING_MIN_ROWS lignes : chaque tour porte sur strictement plus de lignes que le précédent
+def halving_budgets(rows, candidates):
+    rounds = 0
+    while HALVING_FACTOR ** rounds < candidates and rows // HALVING_FACTOR ** (rounds + 1) >= HALVING_MIN_ROWS:
+        rounds += 1
+    return [rows // HALVING_FACTOR ** (rounds - r) for r in range(rounds + 1)]
+
+
+def search_hyperparams(X_train, y_train, X_val, y_val, strategy=HYPERPARAM_SEARCH, workers=SEARCH_WORKERS, search_dir=SEARCH_DIR, grid=HYPERPARAM_GRID):
+    start = time.perf_counter()
+    candidates = grid_configs(grid)
+    if strategy == "random":
+        candidates = random.Random(RANDOM_SEED).sample(candidates, min(SEARCH_TRIALS, len(candidates)))
+    elif strategy not in ("grid", "halving"):
+        raise ValueError(f"Recherche inconnue : {strategy}")
+
+    rows = len(X_train)
+    budgets = halving_budgets(rows, len(candidates)) if strategy == "halving" else [rows]
+
+    search_dir.mkdir(parents=True, exist_ok=True)
+    cache_path = search_dir / f"{fingerprint(X_train, y_train, X_val, y_val)}.jsonl"
+    cache = load_cache(cache_path)
+    workers = min(workers or available_cpus(), len(candidates))
+    evaluations, cached = 0, 0
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(X_train, y_train, X_val, y_val)) as executor:
+        for r, budget in enumerate(budgets):
+            results, from_cache = run_round(executor, workers, candidates, budget, cache, cache_path)
+            evaluations += len(results)
+            cached += from_cache
+            ranked = sorted(zip(results, candidates), key=lambda pair: pair[0]["rmse"])
+            print(
+                f"Tour {r + 1}/{len(budgets)} : {len(candidates)} configurations sur {budget} lignes "
+                f"({from_cache} en cache), meilleure RMSE val {ranked[0][0]['rmse']:.2f}"
+            )
+            if r < len(budgets) - 1:
+                candidates = [params for _, params in ranked[:math.ceil(len(candidates) / HALVING_FACTOR)]]
+
+    best_result, best_params = ranked[0]
+    params = {**XGB_PARAMS, **best_params, "n_estimators": best_result["n_estimators"]}
+    print(
+        f"Recherche {strategy} : {evaluations} évaluations ({cached} en cache) sur {workers} processus "
+        f"en {time.perf_counter() - start:.1f} s"
+    )
+    print(f"Meilleurs paramètres (RMSE val {best_result['rmse']:.2f}) : {params}")
+    return params
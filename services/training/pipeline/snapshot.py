@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+from common.database.reader import count_rows
+from common.database.storage import create_storage_client
+from common.schema.schema import compact, day_keys_to_iso, to_day_keys
+from .config import (
+    SNAPSHOT_DIR, DATE_COLUMN, TARGET_COLUMN, ID_COLUMNS,
+    FEATURE_COLUMNS, CATEGORICAL_COLUMNS, DATE_FEATURES
+)
+from .data_loader import load_data_from_supabase
+from .preprocessing import select_features, prepare_features_for_xgboost
+
+# À incrémenter quand la préparation des features change : l'instantané est alors reconstruit
+SNAPSHOT_VERSION = 1
+
+# Instantané local de la matrice de features, avant l'encodage pour XGBoost :
+# - features.parquet : features, cible et jour de chaque ligne, triées par (counter_id, date)
+# - snapshot.json : définition des features, nombre de lignes, dernier jour et empreinte du fichier
+# À chaque entraînement, seules les lignes à partir du dernier jour de l'instantané sont relues
+# (ce jour a pu être complété depuis). Le nombre de lignes de la table, compté par le serveur,
+# doit être celui de l'instantané plus les nouvelles lignes : sinon l'historique a été modifié
+# avant ce jour et tout est rechargé.
+
+
+def definition():
+    return {
+        "version": SNAPSHOT_VERSION,
+        "features": FEATURE_COLUMNS,
+        "date_features": DATE_FEATURES,
+        "categorical": CATEGORICAL_COLUMNS,
+    }
+
+
+def checksum(frame):
+    # empreinte des valeurs, indépendante de l'index et des codes des catégories
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return hashlib.sha256(hashes.tobytes()).hexdigest()
+
+
+# Matrice de features de lignes brutes, dans l'ordre et les types de l'instantané
+def build_frame(df):
+    days = to_day_keys(df[DATE_COLUMN])
+    X, y = select_features(df)
+    frame = compact(X.assign(**{DATE_COLUMN: days, TARGET_COLUMN: y}))
+    return sort_frame(frame)
+
+
+def sort_frame(frame):
+    # catégories triées : les codes de counter_id sont ceux d'un chargement complet
+    frame[ID_COLUMNS] = frame[ID_COLUMNS].astype(str).astype("category")
+    frame = frame.sort_values([ID_COLUMNS, DATE_COLUMN], kind="stable")
+    return frame.reset_index(drop=True)
+
+
+def read_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    meta_path = snapshot_dir / "snapshot.json"
+    if not meta_path.exists():
+        return None, None
+    meta = json.loads(meta_path.read_text())
+    if meta.get("definition") != definition():
+        print("Définition des features modifiée : instantané ignoré")
+        return None, None
+    frame = pd.read_parquet(snapshot_dir / "features.parquet")
+    if len(frame) != meta["rows"] or checksum(frame) != meta["checksum"]:
+        print("Instantané altéré : ignoré")
+        return None, None
+    return frame, meta
+
+
+def write_snapshot(frame, snapshot_dir=SNAPSHOT_DIR):
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    meta = {
+        "definition": definition(),
+        "rows": len(frame),
+        "max_date": str(day_keys_to_iso(frame[DATE_COLUMN].max())),
+        "checksum": checksum(frame),
+    }
+    # écriture atomique : un instantané interrompu n'est jamais relu
+    temporary = snapshot_dir / "features.parquet.tmp"
+    frame.to_parquet(temporary, index=False)
+    os.replace(temporary, snapshot_dir / "features.parquet")
+    temporary = snapshot_dir / "snapshot.json.tmp"
+    temporary.write_text(json.dumps(meta, indent=4))
+    os.replace(temporary, snapshot_dir / "snapshot.json")
+    print(f"Instantané sauvegardé : {meta['rows']} lignes jusqu'au {meta['max_date']}")
+
+
+def refresh_frame(client, table_name, snapshot_dir=SNAPSHOT_DIR):
+    frame, meta = read_snapshot(snapshot_dir)
+    if frame is None:
+        print("Aucun instantané valide : chargement complet")
+        frame = build_frame(load_data_from_supabase(table_name, client=client))
+        write_snapshot(frame, snapshot_dir)
+        return frame
+
+    last_day = to_day_keys(pd.Series([meta["max_date"]]))[0]
+    kept = frame[frame[DATE_COLUMN] < last_day]
+    new_rows = load_data_from_supabase(table_name, since=meta["max_date"], client=client)
+    remote_rows = count_rows(client, table_name)
+    if new_rows.empty or (remote_rows is not None and remote_rows != len(kept) + len(new_rows)):
+        print(f"Historique modifié avant le {meta['max_date']} ({remote_rows} lignes en base) : chargement complet")
+        frame = build_frame(load_data_from_supabase(table_name, client=client))
+        write_snapshot(frame, snapshot_dir)
+        return frame
+
+    new_frame = build_frame(new_rows)
+    cached = frame[frame[DATE_COLUMN] >= last_day].reset_index(drop=True)
+    if checksum(new_frame) == checksum(cached):
+        print(f"Données inchangées depuis l'instantané ({len(frame)} lignes) : matrice en cache réutilisée")
+        return frame
+
+    print(f"Instantané complété : {len(kept)} lignes en cache, {len(new_frame)} lignes depuis le {meta['max_date']}")
+    frame = sort_frame(pd.concat([kept, new_frame], ignore_index=True))
+    write_snapshot(frame, snapshot_dir)
+    return frame
+
+
+# Features et cible prêtes pour XGBoost, depuis l'instantané local mis à jour
+def load_features(table_name="historical_data", keep_ids=True, snapshot_dir=SNAPSHOT_DIR):
+    start = time.perf_counter()
+    client = create_storage_client()
+    frame = refresh_frame(client, table_name, snapshot_dir)
+
+    X = frame.drop(columns=[DATE_COLUMN, TARGET_COLUMN])
+    y = frame[TARGET_COLUMN]
+    X = prepare_features_for_xgboost(X, keep_ids=keep_ids)
+    print(f"Features prêtes en {time.perf_counter() - start:.1f} s")
+    return X, y
@@ -0,0 +1,154 @@
+import contextlib
+import io
+import resource
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import xgboost as xgb
+from common.database.reader import iter_table
+from common.database.storage import create_storage_client
+from common.schema.schema import compact
+from .config import (
+    SNAPSHOT_DIR, STREAMING_DIR, BATCH_ROWS, DATE_COLUMN, TARGET_COLUMN, ID_COLUMNS,
+    TEST_SIZE, VALIDATION_SIZE, XGB_PARAMS
+)
+from .snapshot import build_frame
+
+# Entraînement par lots : l'historique n'est jamais chargé en entier.
+# Les lignes sont lues par lots de BATCH_ROWS depuis des fichiers Parquet au format de l'instantané
+# (features, cible et jour), soit l'instantané local, soit des lots préparés page par page depuis la base.
+# XGBoost quantifie chaque lot (QuantileDMatrix) : seules les valeurs quantifiées sont gardées,
+# en mémoire ou sur disque (ExtMemQuantileDMatrix).
+# Le découpage train/val/test ne peut pas tirer les lignes au hasard sur tout l'historique :
+# chaque ligne est affectée selon une empreinte de (counter_id, date), dans les mêmes proportions.
+
+
+def peak_rss_mib():
+    # pic de mémoire résidente du processus (ru_maxrss est en Kio sous Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def split_parts(frame):
+    keys = frame[[ID_COLUMNS, DATE_COLUMN]].astype({ID_COLUMNS: str})
+    bucket = pd.util.hash_pandas_object(keys, index=False).to_numpy() % 100
+    return np.where(
+        bucket < TEST_SIZE * 100, "test",
+        np.where(bucket < (TEST_SIZE + VALIDATION_SIZE) * 100, "val", "train")
+    )
+
+
+def spool_table(client, table_name, spool_dir, batch_rows=BATCH_ROWS):
+    # lots préparés depuis la lecture paginée de la table, un fichier Parquet par lot
+    shutil.rmtree(spool_dir, ignore_errors=True)
+    spool_dir.mkdir(parents=True)
+    paths, pages, rows = [], [], 0
+
+    def write_batch():
+        # les messages de select_features ne sont utiles qu'une fois, pas à chaque lot
+        with contextlib.redirect_stdout(io.StringIO()):
+            frame = build_frame(compact(pd.concat(pages, ignore_index=True)))
+        path = spool_dir / f"batch_{len(paths):05d}.parquet"
+        frame.to_parquet(path, index=False)
+        paths.append(path)
+
+    for page in iter_table(client, table_name):
+        pages.append(page)
+        rows += len(page)
+        if rows >= batch_rows:
+            write_batch()
+            pages, rows = [], 0
+    if pages:
+        write_batch()
+    if not paths:
+        raise Exception("Erreur lors du chargement des données depuis Supabase")
+    print(f"{len(paths)} lots préparés depuis {table_name}")
+    return paths
+
+
+def counter_categories(paths):
+    # catégories triées de counter_id sur tous les lots : mêmes codes qu'un chargement complet
+    ids = set()
+    for path in paths:
+        column = pq.read_table(path, columns=[ID_COLUMNS]).column(ID_COLUMNS).to_pandas()
+        ids.update(column.astype(str).unique())
+    return sorted(ids)
+
+
+def iter_batches(paths, categories, part, batch_rows=BATCH_ROWS):
+    # (X, y) prêts pour XGBoost, lot par lot, limités à une partie du découpage
+    for path in paths:
+        for record_batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+            frame = record_batch.to_pandas()
+            frame = frame[split_parts(frame) == part]
+            if frame.empty:
+                continue
+            X = frame.drop(columns=[DATE_COLUMN, TARGET_COLUMN])
+            X[ID_COLUMNS] = pd.Categorical(X[ID_COLUMNS].astype(str), categories=categories).codes
+            yield X.reset_index(drop=True), frame[TARGET_COLUMN].reset_index(drop=True)
+
+
+class BatchIterator(xgb.DataIter):
+    def __init__(self, paths, categories, part="train", cache_prefix=None):
+        self.paths = paths
+        self.categories = categories
+        self.part = part
+        self.batches = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self.batches is None:
+            self.batches = iter_batches(self.paths, self.categories, self.part)
+        batch = next(self.batches, None)
+        if batch is None:
+            return False
+        X, y = batch
+        input_data(data=X, label=y)
+        return True
+
+    def reset(self):
+        self.batches = None
+
+
+def batch_paths(source, table_name="historical_data"):
+    if source == "snapshot":
+        path = SNAPSHOT_DIR / "features.parquet"
+        if not path.exists():
+            raise FileNotFoundError(f"Aucun instantané dans {SNAPSHOT_DIR} : entraîner une fois en mode memory")
+        # l'instantané est lu tel quel, il est mis à jour par le mode memory (voir snapshot.py)
+        return [path]
+    return spool_table(create_storage_client(), table_name, STREAMING_DIR / "batches")
+
+
+# Entraînement sur une QuantileDMatrix construite par lots, en mémoire ou sur disque (external)
+def train_streaming(source, external=False, table_name="historical_data", params=XGB_PARAMS):
+    paths = batch_paths(source, table_name)
+    categories = counter_categories(paths)
+
+    if external:
+        cache_prefix = str(STREAMING_DIR / "xgb_cache")
+        dtrain = xgb.ExtMemQuantileDMatrix(BatchIterator(paths, categories, cache_prefix=cache_prefix))
+    else:
+        dtrain = xgb.QuantileDMatrix(BatchIterator(paths, categories))
+    print(f"Matrice d'entraînement : {dtrain.num_row()} lignes, {dtrain.num_col()} colonnes")
+
+    model = xgb.XGBRegressor(**params)
+    history = {}
+    booster = xgb.train(
+        model.get_xgb_params(), dtrain,
+        num_boost_round=params["n_estimators"],
+        evals=[(dtrain, "train")], evals_result=history, verbose_eval=False
+    )
+    rmse = history["train"]["rmse"][-1]
+
+    # même objet que le mode memory pour la sauvegarde et le service de prédiction
+    model.load_model(bytearray(booster.save_raw("json")))
+
+    # validation par lots : seules la cible et les prédictions sont gardées
+    y_val, preds = [], []
+    for X, y in iter_batches(paths, categories, "val"):
+        y_val.append(y)
+        preds.append(booster.inplace_predict(X))
+    y_val = pd.concat(y_val, ignore_index=True)
+    return model, rmse, y_val, np.concatenate(preds)
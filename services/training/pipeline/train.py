@@ -1,21 +1,14 @@
 import xgboost as xgb
 from sklearn.metrics import mean_squared_error
 import numpy as np
+from .config import XGB_PARAMS
 
-def train_model(X_train, y_train):
+def train_model(X_train, y_train, params=XGB_PARAMS):
     # convertir object -> category
     for col in X_train.select_dtypes(include="object").columns:
         X_train[col] = X_train[col].astype("category")
     
-    model = xgb.XGBRegressor(
-        n_estimators=300,
-        learning_rate=0.05,
-        max_depth=6,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        random_state=42,
-        enable_categorical=True  
-    )
+    model = xgb.XGBRegressor(**params, enable_categorical=True)
 
     model.fit(X_train, y_train, verbose=False)
     
@@ -0,0 +1,34 @@
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline.snapshot import build_frame
+
+
+# Lignes journalières de historical_data, au format de la base
+def make_rows(counters=5, days=120, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-01-01", periods=days, freq="D").strftime("%Y-%m-%d")
+    df = pd.DataFrame({
+        "counter_id": np.repeat([f"urn:ngsi-ld:EcoCounter:X2H{i:08d}" for i in range(counters)], days),
+        "date": np.tile(dates, counters),
+    })
+    n = len(df)
+    df["temperature"] = rng.normal(15, 6, n)
+    df["rain"] = rng.exponential(1, n) * (rng.random(n) < 0.3)
+    df["rolling_7d"] = rng.normal(800, 100, n)
+    df["rolling_28d"] = rng.normal(800, 80, n)
+    df["lag_7d"] = rng.integers(0, 2000, n)
+    df["lag_28d"] = rng.integers(0, 2000, n)
+    df["intensity"] = (df["rolling_7d"] + 20 * df["temperature"] - 50 * df["rain"] + rng.normal(0, 50, n)).round().astype(int)
+    return df
+
+
+@pytest.fixture
+def frame():
+    # les messages de select_features ne sont pas utiles ici
+    with contextlib.redirect_stdout(io.StringIO()):
+        return build_frame(make_rows())
@@ -0,0 +1,89 @@
+import contextlib
+import io
+import json
+
+import numpy as np
+import pytest
+import xgboost as xgb
+from sklearn.metrics import root_mean_squared_error
+
+from pipeline import search
+from pipeline.config import DATE_COLUMN, HALVING_FACTOR, HALVING_MIN_ROWS, TARGET_COLUMN, XGB_PARAMS
+from pipeline.preprocessing import prepare_features_for_xgboost, split_data
+from pipeline.search import evaluate_config, halving_budgets, init_worker, search_hyperparams
+
+GRID = {"max_depth": [2, 4], "learning_rate": [0.3]}
+
+
+@pytest.fixture
+def data(frame):
+    with contextlib.redirect_stdout(io.StringIO()):
+        X = prepare_features_for_xgboost(frame.drop(columns=[DATE_COLUMN, TARGET_COLUMN]))
+    X_train, X_val, _, y_train, y_val, _ = split_data(X, frame[TARGET_COLUMN])
+    return X_train, y_train, X_val, y_val
+
+
+@pytest.mark.parametrize("rows", [500, 1000, 2999, 3000, 12000, 1_000_000])
+@pytest.mark.parametrize("candidates", [1, 2, 3, 27, 243])
+def test_halving_budgets_strictly_increase(rows, candidates):
+    budgets = halving_budgets(rows, candidates)
+
+    assert budgets[-1] == rows
+    assert all(a < b for a, b in zip(budgets, budgets[1:]))
+    # le premier tour garde au moins HALVING_MIN_ROWS lignes (sauf s'il porte déjà sur toutes)
+    assert len(budgets) == 1 or budgets[0] >= HALVING_MIN_ROWS
+    # pas plus de tours qu'il n'en faut pour ne garder qu'une configuration
+    assert len(budgets) == 1 or HALVING_FACTOR ** (len(budgets) - 2) < candidates
+
+
+def test_n_estimators_is_the_best_iteration(data):
+    X_train, y_train, X_val, y_val = data
+    init_worker(X_train, y_train, X_val, y_val)
+    params = {"max_depth": 4, "learning_rate": 0.3, "n_estimators": 300}
+    result = evaluate_config(params, len(X_train), 1)
+
+    # l'arrêt précoce s'est déclenché avant le maximum d'arbres
+    assert result["n_estimators"] < params["n_estimators"]
+    # autant d'arbres, sans arrêt précoce : la meilleure RMSE de validation
+    model = xgb.XGBRegressor(**{**XGB_PARAMS, **params, "n_estimators": result["n_estimators"]}, n_jobs=1)
+    model.fit(X_train, y_train)
+    assert root_mean_squared_error(y_val, model.predict(X_val)) == pytest.approx(result["rmse"], rel=1e-4)
+
+
+def test_search_returns_the_best_evaluation(data, tmp_path):
+    X_train, y_train, X_val, y_val = data
+    with contextlib.redirect_stdout(io.StringIO()):
+        params = search_hyperparams(X_train, y_train, X_val, y_val, strategy="grid", workers=1, search_dir=tmp_path, grid=GRID)
+
+    (cache_path,) = tmp_path.glob("*.jsonl")
+    results = [json.loads(line)["result"] for line in cache_path.read_text().splitlines()]
+    best = min(results, key=lambda result: result["rmse"])
+    assert len(results) == len(search.grid_configs(GRID))
+    assert params["n_estimators"] == best["n_estimators"]
+    assert params["max_depth"] in GRID["max_depth"]
+
+
+def test_search_resumes_from_the_cache(data, tmp_path):
+    X_train, y_train, X_val, y_val = data
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = search_hyperparams(X_train, y_train, X_val, y_val, strategy="grid", workers=1, search_dir=tmp_path, grid=GRID)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            second = search_hyperparams(X_train, y_train, X_val, y_val, strategy="grid", workers=1, search_dir=tmp_path, grid=GRID)
+
+    assert second == first
+    assert f"({len(search.grid_configs(GRID))} en cache)" in output.getvalue()
+
+
+def test_halving_keeps_the_best_iteration_on_all_rows(data, tmp_path, monkeypatch):
+    X_train, y_train, X_val, y_val = data
+    monkeypatch.setattr(search, "HALVING_MIN_ROWS", 50)
+    with contextlib.redirect_stdout(io.StringIO()):
+        params = search_hyperparams(X_train, y_train, X_val, y_val, strategy="halving", workers=1, search_dir=tmp_path, grid=GRID)
+
+    (cache_path,) = tmp_path.glob("*.jsonl")
+    entries = [json.loads(line) for line in cache_path.read_text().splitlines()]
+    rows = [json.loads(entry["key"])["rows"] for entry in entries]
+    # toutes les configurations sur un tiers des lignes, puis la meilleure sur toutes
+    assert rows == [len(X_train) // HALVING_FACTOR] * 2 + [len(X_train)]
+    assert params["n_estimators"] == entries[-1]["result"]["n_estimators"]
@@ -0,0 +1,55 @@
+import json
+
+import pandas as pd
+
+from pipeline import snapshot
+from pipeline.snapshot import read_snapshot, write_snapshot
+
+
+def test_snapshot_is_read_back(frame, tmp_path):
+    write_snapshot(frame, tmp_path)
+    cached, meta = read_snapshot(tmp_path)
+
+    pd.testing.assert_frame_equal(cached, frame)
+    assert meta["rows"] == len(frame)
+    assert meta["max_date"] == "2024-04-29"
+
+
+def test_missing_snapshot(tmp_path):
+    assert read_snapshot(tmp_path) == (None, None)
+
+
+def test_row_count_mismatch_is_ignored(frame, tmp_path):
+    write_snapshot(frame, tmp_path)
+    # fichier de features d'un autre instantané, plus court
+    frame.iloc[:-10].to_parquet(tmp_path / "features.parquet", index=False)
+
+    assert read_snapshot(tmp_path) == (None, None)
+
+
+def test_checksum_mismatch_is_ignored(frame, tmp_path):
+    write_snapshot(frame, tmp_path)
+    # même nombre de lignes, une valeur modifiée
+    altered = frame.copy()
+    altered.loc[0, "temperature"] += 1
+    altered.to_parquet(tmp_path / "features.parquet", index=False)
+
+    assert read_snapshot(tmp_path) == (None, None)
+
+
+def test_definition_change_is_ignored(frame, tmp_path, monkeypatch):
+    write_snapshot(frame, tmp_path)
+    monkeypatch.setattr(snapshot, "SNAPSHOT_VERSION", snapshot.SNAPSHOT_VERSION + 1)
+
+    assert read_snapshot(tmp_path) == (None, None)
+
+
+def test_checksum_ignores_category_codes(frame, tmp_path):
+    write_snapshot(frame, tmp_path)
+    meta = json.loads((tmp_path / "snapshot.json").read_text())
+    # mêmes valeurs, catégories dans un autre ordre
+    reordered = frame.copy()
+    reordered["counter_id"] = reordered["counter_id"].cat.reorder_categories(
+        reordered["counter_id"].cat.categories[::-1]
+    )
+    assert snapshot.checksum(reordered) == meta["checksum"]
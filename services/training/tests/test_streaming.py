@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from pipeline.config import TEST_SIZE, VALIDATION_SIZE
+from pipeline.streaming import counter_categories, iter_batches, split_parts
+
+
+def test_split_is_deterministic(frame):
+    parts = split_parts(frame)
+    assert (split_parts(frame) == parts).all()
+
+    # la partie d'une ligne ne dépend ni de l'ordre des lignes, ni des autres lignes du lot
+    shuffled = frame.sample(frac=1, random_state=3)
+    assert (split_parts(shuffled) == parts[shuffled.index]).all()
+    assert (split_parts(frame.iloc[:50]) == parts[:50]).all()
+
+    # ni des codes des catégories de counter_id
+    as_strings = frame.astype({"counter_id": str})
+    assert (split_parts(as_strings) == parts).all()
+
+
+def test_split_proportions(frame):
+    parts = pd.Series(split_parts(frame)).value_counts(normalize=True)
+    assert abs(parts["test"] - TEST_SIZE) < 0.05
+    assert abs(parts["val"] - VALIDATION_SIZE) < 0.05
+
+
+def test_batches_cover_every_row_once(frame, tmp_path):
+    paths = []
+    for i, rows in enumerate(np.array_split(np.arange(len(frame)), 3)):
+        path = tmp_path / f"batch_{i:05d}.parquet"
+        frame.iloc[rows].to_parquet(path, index=False)
+        paths.append(path)
+    categories = counter_categories(paths)
+
+    seen = []
+    for part in ["train", "val", "test"]:
+        for X, y in iter_batches(paths, categories, part, batch_rows=64):
+            seen.append(pd.DataFrame({"counter_id": X["counter_id"], "rain": X["rain"], "intensity": y, "part": part}))
+    seen = pd.concat(seen, ignore_index=True)
+
+    assert len(seen) == len(frame)
+    # codes de counter_id identiques à ceux d'un chargement complet
+    assert (np.sort(seen["counter_id"].unique()) == np.arange(frame["counter_id"].nunique())).all()
+    expected = pd.Series(split_parts(frame)).value_counts()
+    assert (seen["part"].value_counts()[expected.index] == expected).all()